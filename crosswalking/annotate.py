@@ -0,0 +1,300 @@
+import argparse
+import os
+from typing import List
+
+import polars as pl
+
+from utils.duckdb import DuckDB
+
+# the crosswalk database, its table, and its ID columns for each level.
+LEVELS = {
+    "school": ("schools", "crosswalk", ["ceeb", "nces", "state_school_id", "lea"]),
+    "university": (
+        "universities",
+        "university_crosswalk",
+        ["ceeb", "ipeds", "nsc"],
+    ),
+}
+
+
+def reader(path: str, column: str | None = None) -> str:
+    """The DuckDB table function for a CSV or Parquet file or glob.
+
+    The key column of a CSV, if given, is read as text so leading zeros
+    survive. DuckDB fails when that column doesn't exist.
+    """
+
+    if path.endswith(".parquet"):
+        return f"read_parquet('{path}')"
+
+    if column is None:
+        return f"read_csv('{path}')"
+
+    return f"read_csv('{path}', types = {{'{column}': 'VARCHAR'}})"
+
+
+def writer(path: str) -> str:
+    if path.endswith(".parquet"):
+        return "(FORMAT parquet, COMPRESSION zstd)"
+
+    return "(FORMAT csv, HEADER)"
+
+
+class RosterAnnotator:
+    """
+    Attach crosswalk IDs to a large file keyed by one of the IDs.
+
+    The input is streamed through DuckDB and joined against the crosswalk,
+    which is small enough to be the hash table, so memory stays flat however
+    large the input is. Rows are written as they are joined, in no particular
+    order, which lets every thread write. Beyond `memory_limit` DuckDB spills
+    to `temp_directory`.
+    """
+
+    def __init__(
+        self,
+        duck: DuckDB,
+        crosswalk_dir: str,
+        level: str = "school",
+        memory_limit: str | None = None,
+        threads: int | None = None,
+        temp_directory: str | None = None,
+    ):
+        """
+        Args:
+            duck (DuckDB): A DuckDB object.
+            crosswalk_dir (str): The directory with `schools.duckdb` and
+                `universities.duckdb`.
+            level (str, optional): "school" or "university". Defaults to
+                "school".
+            memory_limit (str | None, optional): Such as "4GB". Defaults to
+                DuckDB's limit.
+            threads (int | None, optional): Defaults to every core.
+            temp_directory (str | None, optional): Where to spill. Defaults
+                to DuckDB's.
+        """
+
+        if level not in LEVELS:
+            raise ValueError(f"{level} is not a valid level.")
+
+        self.duck = duck
+        self.db, table, self.id_columns = LEVELS[level]
+        self.table = f"{self.db}.{table}"
+
+        self.duck.execute(
+            f"ATTACH IF NOT EXISTS "
+            f"'{os.path.join(crosswalk_dir, self.db + '.duckdb')}' (READ_ONLY)"
+        )
+
+        self.duck.execute("SET preserve_insertion_order = false")
+
+        if memory_limit is not None:
+            self.duck.execute(f"SET memory_limit = '{memory_limit}'")
+        if threads is not None:
+            self.duck.execute(f"SET threads = {threads}")
+        if temp_directory is not None:
+            self.duck.execute(f"SET temp_directory = '{temp_directory}'")
+
+    def mapping(
+        self, source: str, targets: List[str], all_matches: bool
+    ) -> str:
+        """The crosswalk from `source` to the targets as a query.
+
+        Args:
+            source (str): The ID type to join on.
+            targets (List[str]): The ID types to attach.
+            all_matches (bool): Keep every link. Otherwise each source ID has
+                one row, taking the lowest of each target, plus the number of
+                links in `crosswalk_links`.
+
+        Returns:
+            str: A SQL query.
+        """
+
+        if all_matches:
+            return (
+                f"select distinct {source}, {', '.join(targets)} "
+                f"from {self.table} where {source} is not null"
+            )
+
+        return (
+            f"select {source}, "
+            + "".join(f"{t}: min({t}), " for t in targets)
+            + f"crosswalk_links: count(*) "
+            f"from {self.table} where {source} is not null "
+            f"group by {source}"
+        )
+
+    def annotate(
+        self,
+        input_path: str,
+        output_path: str,
+        column: str = "ceeb",
+        source: str = "ceeb",
+        targets: List[str] | None = None,
+        all_matches: bool = False,
+        top: int = 20,
+    ) -> pl.DataFrame:
+        """Write the input with the crosswalk IDs attached.
+
+        Args:
+            input_path (str): A CSV or Parquet file, or a glob of them.
+            output_path (str): A CSV or Parquet file.
+            column (str, optional): The input's ID column. Defaults to "ceeb".
+            source (str, optional): The ID type of that column. Defaults to
+                "ceeb".
+            targets (List[str] | None, optional): The ID types to attach.
+                Defaults to every other ID type.
+            all_matches (bool, optional): Write a row for every link instead
+                of one per input row. Defaults to False.
+            top (int, optional): How many unmatched codes to list. Defaults
+                to 20.
+
+        Returns:
+            pl.DataFrame: The most common unmatched codes and their rows.
+
+        Examples:
+            An input column named `code` doesn't get in the way of the counts.
+
+            >>> import tempfile
+            >>> tmp = tempfile.mkdtemp()
+            >>> with DuckDB(os.path.join(tmp, "universities.duckdb")) as duck:
+            ...     duck.execute(
+            ...         "create table university_crosswalk as select "
+            ...         "ceeb: '0012', ipeds: '100654', nsc: '001002'"
+            ...     )
+            >>> with open(os.path.join(tmp, "roster.csv"), "w") as f:
+            ...     _ = f.write("ceeb,code\\n12,x\\n12,y\\n0099,z\\n")
+            >>> with DuckDB() as duck:
+            ...     annotator = RosterAnnotator(duck, tmp, "university")
+            ...     unmatched = annotator.annotate(
+            ...         os.path.join(tmp, "roster.csv"),
+            ...         os.path.join(tmp, "annotated.csv"),
+            ...     )
+            Rows:      3
+            Matched:   2
+            Unmatched: 1
+            No ceeb:  0
+            >>> unmatched.rows()
+            [('0099', 1)]
+        """
+
+        if source not in self.id_columns:
+            raise ValueError(f"{source} is not an ID in {self.table}.")
+
+        targets = targets or [c for c in self.id_columns if c != source]
+
+        if not set(targets) <= set(self.id_columns) - {source}:
+            raise ValueError(f"The targets must be other IDs in {self.table}.")
+
+        # the header is checked before the key column is typed.
+        input_columns = [
+            name
+            for name, *_ in self.duck.sql(
+                f"describe select * from {reader(input_path)}"
+            ).fetchall()
+        ]
+
+        if column not in input_columns:
+            raise ValueError(f"The input has no {column} column.")
+
+        source_data = reader(input_path, column)
+
+        clashes = set(input_columns) & (set(targets) | {"crosswalk_links"})
+        if clashes:
+            raise ValueError(f"The input already has {', '.join(clashes)}.")
+
+        # integer keys lose their leading zeros, so pad to the crosswalk's.
+        (width,) = self.duck.sql(
+            f"select max(length({source})) from {self.table}"
+        ).fetchone()  # type: ignore
+
+        key = f"lpad(i.{column}::VARCHAR, {width or 0}, '0')"
+
+        mapping = self.mapping(source, targets, all_matches)
+
+        self.duck.execute(
+            "COPY ("
+            f"select i.*, m.* exclude ({source}) "
+            f"from {source_data} i "
+            f"left join ({mapping}) m on {key} = m.{source}"
+            f") TO '{output_path}' {writer(output_path)}"
+        )
+
+        # the codes are counted from the output rather than scanning the
+        # input again, which for Parquet only reads its key column. With
+        # every match, each input row was written once for each of its links.
+        # Grouping by position keeps an input column named `code` from
+        # shadowing the padded key.
+        self.duck.execute(
+            "create or replace temp table roster_codes as "
+            "select code, "
+            "rows: written // greatest(coalesce(links, 0), 1), "
+            "matched: coalesce(links, 0) > 0 "
+            f"from (select code: {key}, written: count(*) "
+            f"from {reader(output_path, column)} i group by 1) "
+            f"left join (select {source}, links: count(*) from ({mapping}) "
+            f"group by {source}) m on code = m.{source}"
+        )
+
+        summary = self.duck.sql(
+            "select "
+            "rows: sum(rows), "
+            "matched: coalesce(sum(rows) filter (matched), 0), "
+            "missing: coalesce(sum(rows) filter (code is null), 0) "
+            "from roster_codes"
+        ).pl()
+
+        unmatched = self.duck.sql(
+            "select code, rows from roster_codes "
+            "where not matched and code is not null "
+            f"order by rows desc, code limit {top}"
+        ).pl()
+
+        rows, matched, missing = summary.row(0)
+
+        print(f"Rows:      {rows:,}")
+        print(f"Matched:   {matched:,}")
+        print(f"Unmatched: {rows - matched - missing:,}")
+        print(f"No {column}:  {missing:,}")
+
+        return unmatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Attach crosswalk IDs to a CSV or Parquet file."
+    )
+    parser.add_argument("input", help="A CSV or Parquet file, or a glob.")
+    parser.add_argument("output", help="A CSV or Parquet file.")
+    parser.add_argument("--level", default="school", choices=list(LEVELS))
+    parser.add_argument("--column", default="ceeb", help="The input ID column.")
+    parser.add_argument("--source", default="ceeb", help="Its ID type.")
+    parser.add_argument("--targets", nargs="+", help="The IDs to attach.")
+    parser.add_argument("--all-matches", action="store_true")
+    parser.add_argument("--crosswalk-dir", default="crosswalking")
+    parser.add_argument("--memory-limit")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--temp-directory")
+    args = parser.parse_args()
+
+    with DuckDB() as duck:
+        annotator = RosterAnnotator(
+            duck,
+            crosswalk_dir=args.crosswalk_dir,
+            level=args.level,
+            memory_limit=args.memory_limit,
+            threads=args.threads,
+            temp_directory=args.temp_directory,
+        )
+
+        unmatched = annotator.annotate(
+            args.input,
+            args.output,
+            column=args.column,
+            source=args.source,
+            targets=args.targets,
+            all_matches=args.all_matches,
+        )
+
+        print(unmatched)
@@ -0,0 +1,474 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Sequence
+
+from crosswalking.export import export_crosswalks
+from crosswalking.schools import SchoolCrosswalk
+from crosswalking.universities import UniversityCrosswalk
+from utils.duckdb import DuckDB
+from utils.memory import peak_rss
+from utils.mirror import MirrorServer, SyntheticArchives, archive_sources
+from utils.synthetic import STATES, SyntheticData
+
+CASES = [
+    "create_school_tables",
+    "iterative_exact_matching",
+    "enrich_geography",
+    "university_process",
+    "export",
+    "download",
+    "extract",
+    "ingest",
+]
+
+# the cases which build the clean data from the files on a mirror.
+ARCHIVE_CASES = ["download", "extract", "ingest"]
+
+# the extensions each clean database needs to be built.
+EXTENSIONS = {"geography": "spatial", "nces": "excel", "nsc": "excel"}
+
+
+def count(duck: DuckDB, tables: Sequence[str]) -> int:
+    return sum(
+        duck.sql(f"select count(*) from {t}").fetchone()[0]  # type: ignore
+        for t in tables
+    )
+
+
+def measure(step: Callable, rows: Callable) -> Dict:
+    setup_rss = peak_rss()
+
+    start = time.perf_counter()
+    step()
+    seconds = time.perf_counter() - start
+
+    return {
+        "rows": rows(),
+        "seconds": seconds,
+        "setup_peak_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss(),
+    }
+
+
+def run_archive_case(case: str, data_dir: str):
+    """Run one of the `ARCHIVE_CASES` and print its result as JSON.
+
+    The build scripts' objects download from the mirror in
+    `CROSSWALK_MIRROR` into `<data_dir>/work`, which is emptied first. The
+    rows are those in the files, and their size is in `megabytes`.
+
+    Args:
+        case (str): One of `ARCHIVE_CASES`.
+        data_dir (str): The synthetic data, with its files in `mirror`.
+    """
+
+    with open(os.path.join(data_dir, "mirror", "archives.json")) as f:
+        files = json.load(f)["files"].values()
+
+    work = os.path.join(data_dir, "work")
+    shutil.rmtree(work, ignore_errors=True)
+
+    for folder in ["raw-data", "extracted-zips", "clean-data"]:
+        os.makedirs(os.path.join(work, folder))
+
+    # the build scripts work relative to the repository.
+    os.chdir(work)
+
+    sources = archive_sources([fips for fips, _, _ in STATES])
+
+    def download():
+        for xs in sources.values():
+            for x in xs:
+                x.download()
+
+    def extract():
+        for xs in sources.values():
+            for x in xs:
+                # the NSC workbook isn't zipped.
+                if hasattr(x, "extract"):
+                    x.extract()
+
+    def ingest():
+        for db, xs in sources.items():
+            with DuckDB(os.path.join("clean-data", db + ".duckdb")) as duck:
+                if db in EXTENSIONS:
+                    duck.install_and_load_extension(EXTENSIONS[db], True)
+
+                for x in xs:
+                    x.append_to_duckdb(duck)
+
+                if db == "ipeds":
+                    xs[0].update_current(duck)
+
+    if case != "download":
+        download()
+
+    if case == "ingest":
+        extract()
+
+    result = measure(
+        {"download": download, "extract": extract, "ingest": ingest}[case],
+        lambda: sum(f["rows"] for f in files),
+    )
+    result["megabytes"] = sum(f["bytes"] for f in files) / 2**20
+
+    print(json.dumps(result))
+
+
+def run_case(case: str, data_dir: str):
+    """Run one benchmark case and print its result as JSON.
+
+    The setup the case needs runs first and isn't timed. The rows are what
+    the step works through, such as the CEEB and NCES records for matching.
+
+    Args:
+        case (str): One of `CASES`.
+        data_dir (str): The synthetic data, used as `clean-data`.
+    """
+
+    if case in ARCHIVE_CASES:
+        return run_archive_case(case, data_dir)
+
+    sql_dir = os.path.join("crosswalking", "sql")
+
+    with DuckDB() as duck, tempfile.TemporaryDirectory() as output_dir:
+        if case == "university_process":
+            university = UniversityCrosswalk(duck, data_dir, sql_dir)
+
+            def step():
+                university.process()
+
+            def rows():
+                return count(duck, ["ceeb_university", "ipeds_hd"])
+
+        elif case == "export":
+            for db in ["schools", "universities"]:
+                duck.attach_db(
+                    os.path.join(data_dir, "truth", db + ".duckdb"),
+                    read_only=True,
+                )
+
+            def step():
+                export_crosswalks(duck, output_dir)
+
+            def rows():
+                return count(
+                    duck,
+                    ["schools.crosswalk", "universities.university_crosswalk"],
+                )
+
+        elif case in CASES:
+            school = SchoolCrosswalk(duck, data_dir, sql_dir)
+            school.attach_dbs()
+
+            if case != "create_school_tables":
+                school.create_school_tables()
+
+            if case == "iterative_exact_matching":
+                school.clear_seed_matches()
+
+            step = {
+                "create_school_tables": school.create_school_tables,
+                "iterative_exact_matching": school.iterative_exact_matching,
+                "enrich_geography": school.enrich_geography,
+            }[case]
+
+            def rows():
+                if case == "enrich_geography":
+                    return count(duck, ["geography_points"])
+
+                return count(duck, ["ceeb", "nces"])
+
+        else:
+            raise ValueError(f"{case} is not a benchmark case.")
+
+        result = measure(step, rows)
+
+    print(json.dumps(result))
+
+
+class Benchmark:
+    """
+    Time the crosswalk stages on synthetic data at several scales.
+
+    The data for each scale is generated once into `<data_dir>/<scale>x`.
+    Each case runs in a fresh interpreter, so its peak memory is its own,
+    and the result is appended to a file of JSON lines along with the commit,
+    so a run can be compared with earlier ones. The change from the last
+    result of the same case and scale is printed as well.
+
+    The `ARCHIVE_CASES` time the build path instead. The synthetic data is
+    also written as the files it stands for, into `<data_dir>/<scale>x/
+    mirror`, and served by a `MirrorServer` with the given bandwidth and
+    latency while the case runs.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "synthetic-data",
+        results_file: str = "benchmark-results.ndjson",
+        scales: Sequence[float] = (1,),
+        cases: Sequence[str] = CASES,
+        noise: float = 0.2,
+        duplicates: float = 0.02,
+        seed: int = 0,
+        bandwidth: float | None = None,
+        latency: float = 0.0,
+    ):
+        """
+        Args:
+            data_dir (str, optional): Where the synthetic data is kept.
+                Defaults to "synthetic-data".
+            results_file (str, optional): Where the results are appended.
+                Defaults to "benchmark-results.ndjson".
+            scales (Sequence[float], optional): Multiples of the national
+                counts. Defaults to (1,).
+            cases (Sequence[str], optional): Defaults to all of `CASES`.
+            noise (float, optional): See `SyntheticData`. Defaults to 0.2.
+            duplicates (float, optional): See `SyntheticData`. Defaults to
+                0.02.
+            seed (int, optional): Defaults to 0.
+            bandwidth (float | None, optional): The mirror's megabytes per
+                second for each connection. Defaults to None, which isn't
+                limited.
+            latency (float, optional): The mirror's seconds before each
+                response. Defaults to 0.0.
+        """
+
+        for case in cases:
+            if case not in CASES:
+                raise ValueError(f"{case} is not a benchmark case.")
+
+        self.data_dir = data_dir
+        self.results_file = results_file
+        self.scales = scales
+        self.cases = cases
+        self.noise = noise
+        self.duplicates = duplicates
+        self.seed = seed
+        self.bandwidth = bandwidth
+        self.latency = latency
+
+        self.root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def prepare(self, scale: float) -> str:
+        """Generate the data for a scale, unless it already exists with the
+        same settings."""
+
+        directory = os.path.join(self.data_dir, f"{scale:g}x")
+        manifest = os.path.join(directory, "manifest.json")
+
+        settings = {
+            "scale": scale,
+            "noise": self.noise,
+            "duplicates": self.duplicates,
+            "seed": self.seed,
+        }
+
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                existing = json.load(f)
+
+            if all(existing.get(k) == v for k, v in settings.items()):
+                self.prepare_mirror(directory)
+
+                return directory
+
+        print(f"Generating {scale:g}x...")
+        SyntheticData(**settings).write(directory)
+
+        shutil.rmtree(os.path.join(directory, "mirror"), ignore_errors=True)
+        self.prepare_mirror(directory)
+
+        return directory
+
+    def prepare_mirror(self, directory: str):
+        mirror = os.path.join(directory, "mirror")
+        wanted = any(c in ARCHIVE_CASES for c in self.cases)
+
+        if wanted and not os.path.exists(os.path.join(mirror, "archives.json")):
+            print(f"Writing the files to {mirror}...")
+            SyntheticArchives(directory).write(mirror)
+
+    def commit(self) -> str | None:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=self.root,
+            capture_output=True,
+            text=True,
+        )
+
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    def previous(self) -> Dict[tuple, Dict]:
+        """The last result of each case and scale."""
+
+        last: Dict[tuple, Dict] = {}
+
+        if os.path.exists(self.results_file):
+            with open(self.results_file) as f:
+                for line in f:
+                    record = json.loads(line)
+                    last[(record["case"], record["scale"])] = record
+
+        return last
+
+    def run_one(self, case: str, directory: str) -> Dict:
+        env = dict(os.environ)
+
+        with contextlib.ExitStack() as stack:
+            if case in ARCHIVE_CASES:
+                server = stack.enter_context(
+                    MirrorServer(
+                        os.path.join(directory, "mirror"),
+                        bandwidth=self.bandwidth,
+                        latency=self.latency,
+                    )
+                )
+                env["CROSSWALK_MIRROR"] = server.url
+
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "from crosswalking.benchmark import run_case; "
+                    f"run_case({case!r}, {os.path.abspath(directory)!r})",
+                ],
+                cwd=self.root,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+
+        if result.returncode != 0:
+            raise RuntimeError(f"{case} failed:\n{result.stderr}")
+
+        # the stages print their progress, and the result comes last.
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run(self) -> List[Dict]:
+        """Run every case at every scale.
+
+        Returns:
+            List[Dict]: The new results.
+        """
+
+        last = self.previous()
+        commit = self.commit()
+        records: List[Dict] = []
+
+        for scale in self.scales:
+            directory = self.prepare(scale)
+
+            for case in self.cases:
+                result = self.run_one(case, directory)
+
+                record = {
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "commit": commit,
+                    "machine": platform.node(),
+                    "cpus": os.cpu_count(),
+                    "case": case,
+                    "scale": scale,
+                    **result,
+                    "rows_per_second": result["rows"] / result["seconds"],
+                }
+
+                if case in ARCHIVE_CASES:
+                    record["bandwidth_mb"] = self.bandwidth
+                    record["latency"] = self.latency
+                    record["mb_per_second"] = (
+                        result["megabytes"] / result["seconds"]
+                    )
+
+                records.append(record)
+
+                with open(self.results_file, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+                change = ""
+                before = last.get((case, scale))
+
+                if before and before["peak_rss_mb"]:
+                    time_change = record["seconds"] / before["seconds"] - 1
+                    memory_change = (
+                        record["peak_rss_mb"] / before["peak_rss_mb"] - 1
+                    )
+
+                    change = (
+                        f"  {time_change:+.0%} time, {memory_change:+.0%} "
+                        f"memory vs {before['commit']}"
+                    )
+
+                print(
+                    f"{scale:>5g}x {case:<26} {result['rows']:>10,} rows "
+                    f"{record['seconds']:>8.2f} s "
+                    f"{record['rows_per_second']:>12,.0f} rows/s "
+                    f"{record['peak_rss_mb']:>8.0f} MB"
+                    + (
+                        f" {record['mb_per_second']:>8.1f} MB/s"
+                        if "mb_per_second" in record
+                        else ""
+                    )
+                    + change
+                )
+
+        return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the crosswalk stages on synthetic data."
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        nargs="+",
+        default=[1],
+        help="multiples of the national counts, such as 1 10 100 (default: 1)",
+    )
+    parser.add_argument(
+        "--case",
+        nargs="+",
+        default=CASES,
+        choices=CASES,
+        help="the cases to run (default: all)",
+    )
+    parser.add_argument("--data-dir", default="synthetic-data")
+    parser.add_argument("--results", default="benchmark-results.ndjson")
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--duplicates", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        help="the mirror's megabytes per second for each connection "
+        "(default: no limit)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="the mirror's seconds before each response (default: 0)",
+    )
+    args = parser.parse_args()
+
+    Benchmark(
+        data_dir=args.data_dir,
+        results_file=args.results,
+        scales=args.scale,
+        cases=args.case,
+        noise=args.noise,
+        duplicates=args.duplicates,
+        seed=args.seed,
+        bandwidth=args.bandwidth,
+        latency=args.latency,
+    ).run()
@@ -0,0 +1,122 @@
+import os
+import shutil
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.duckdb import DuckDB
+
+# the crosswalk tables, the columns they are sorted by, and their ID columns.
+EXPORTS = {
+    "school_crosswalk": (
+        "schools.crosswalk",
+        ["ceeb", "nces"],
+        ["ceeb", "nces", "state_school_id", "lea", "county_geoid", "zcta"],
+    ),
+    "university_crosswalk": (
+        "universities.university_crosswalk",
+        ["ipeds", "ceeb", "nsc"],
+        ["ipeds", "ceeb", "nsc", "nsc_full", "fips"],
+    ),
+}
+
+PARTITION = "state_abbr"
+
+
+def export_crosswalks(duck: "DuckDB", output_dir: str):
+    """Export the crosswalks as Parquet and as a DuckDB file.
+
+    Each crosswalk is written to `<output_dir>/<name>/state_abbr=XX/`, as
+    zstd Parquet sorted by its IDs, so a reader filtering on a state only
+    opens that state's file, and one filtering on an ID skips the row groups
+    whose range can't hold it.
+
+    DuckDB's partitioned `COPY` doesn't keep the rows of each file in order,
+    so the states are copied one at a time from a table sorted by state.
+
+    `<output_dir>/crosswalks.duckdb` has the same tables with an ART index on
+    every ID column, for point lookups. Open it read-only.
+
+    Both are written next to the old ones and then swapped in, so readers
+    never see half an export.
+
+    The crosswalk databases need to be attached as `schools` and
+    `universities`.
+
+    Args:
+        duck (DuckDB): A DuckDB object with the crosswalks attached.
+        output_dir (str): Where to write.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, (table, order, _) in EXPORTS.items():
+        directory = os.path.join(output_dir, name)
+        staging = directory + ".tmp"
+
+        shutil.rmtree(staging, ignore_errors=True)
+
+        duck.execute(
+            f"create or replace temp table sorted_export as "
+            f"from {table} order by {PARTITION}, {', '.join(order)}"
+        )
+
+        states = duck.sql(
+            f"select distinct {PARTITION} from sorted_export order by 1"
+        ).fetchall()
+
+        for (state,) in states:
+            # DuckDB reads a NULL partition back as a missing value.
+            partition = os.path.join(
+                staging, f"{PARTITION}={'NULL' if state is None else state}"
+            )
+            os.makedirs(partition)
+
+            duck.execute(
+                f"COPY (\n"
+                f"    select * exclude ({PARTITION}) from sorted_export\n"
+                f"    where {PARTITION} is not distinct from ?\n"
+                f"    order by {', '.join(order)}\n"
+                f") TO '{os.path.join(partition, 'data_0.parquet')}' "
+                f"(FORMAT parquet, COMPRESSION zstd)",
+                [state],
+            )
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(staging, directory)
+
+    duck.execute("drop table if exists sorted_export")
+
+    bundle = os.path.join(output_dir, "crosswalks.duckdb")
+    staging = bundle + ".tmp"
+
+    if os.path.exists(staging):
+        os.remove(staging)
+
+    duck.execute(f"ATTACH '{staging}' AS bundle")
+
+    for name, (table, order, ids) in EXPORTS.items():
+        duck.execute(
+            f"create table bundle.{name} as "
+            f"from {table} order by {', '.join(order)}"
+        )
+
+        for column in ids:
+            duck.execute(
+                f"create index {name}_{column} on bundle.{name} ({column})"
+            )
+
+    duck.execute("DETACH bundle")
+
+    os.replace(staging, bundle)
+
+
+if __name__ == "__main__":
+    from utils.duckdb import DuckDB
+
+    with DuckDB() as duck:
+        for db in ["schools", "universities"]:
+            duck.attach_db(
+                os.path.join("crosswalking", db + ".duckdb"), read_only=True
+            )
+
+        export_crosswalks(duck, os.path.join("crosswalking", "export"))
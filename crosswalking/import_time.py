@@ -0,0 +1,160 @@
+import argparse
+import os
+import pkgutil
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Set
+
+import crosswalking
+
+# no crosswalk entry point should need the scraper dependencies.
+SCRAPERS = ["selenium", "seleniumwire", "pdfplumber", "bs4", "pandas"]
+
+# the modules that only read compiled files, which shouldn't load DuckDB or
+# the matching dependencies either.
+READERS = {"lookup", "service", "load_test", "typeahead"}
+READER_EXCLUDED = ["duckdb", "polars", "scipy", "rapidfuzz"]
+
+# the cold start budget in milliseconds, with room for a slower machine.
+BUDGETS = {
+    "lookup": 400,
+    "service": 400,
+    "load_test": 400,
+    "typeahead": 400,
+    "annotate": 1000,
+    "temporal": 1000,
+    "schools": 2500,
+    "universities": 2500,
+}
+DEFAULT_BUDGET = 2500
+
+
+class ImportBenchmark:
+    """
+    Time the cold start of each `python -m crosswalking.*` entry point.
+
+    Each module is imported in a fresh interpreter with `-X importtime`, which
+    reports the time to import it and everything it imports, and the median
+    of several runs is compared with its budget. The same report lists every
+    package that got loaded, so a module pulling in a scraper or, for the
+    lookup readers, DuckDB fails regardless of how fast the machine is.
+    """
+
+    def __init__(self, runs: int = 5, scale: float = 1):
+        """
+        Args:
+            runs (int, optional): Fresh imports per module. Defaults to 5.
+            scale (float, optional): Multiplies every budget. Defaults to 1.
+        """
+
+        self.runs = runs
+        self.scale = scale
+
+        self.modules = [
+            m.name
+            for m in pkgutil.iter_modules(crosswalking.__path__)
+            if m.name != "import_time"
+        ]
+
+        self.root = os.path.dirname(os.path.dirname(crosswalking.__file__))
+
+    def import_once(self, module: str):
+        """Import a module in a new interpreter.
+
+        Returns:
+            (float, Set[str]): The cumulative import time in milliseconds and
+                the top-level packages that were imported.
+        """
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=self.root,
+            capture_output=True,
+            text=True,
+        )
+
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+        milliseconds = 0.0
+        packages: Set[str] = set()
+
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+
+            _, cumulative, name = line.split("|")
+
+            if not cumulative.strip().isdigit():
+                continue
+
+            packages.add(name.strip().split(".")[0])
+
+            if name.strip() == module:
+                milliseconds = int(cumulative) / 1000
+
+        return milliseconds, packages
+
+    def run(self) -> List[str]:
+        """Benchmark every module and print a report.
+
+        Returns:
+            List[str]: The failures, which is empty when all pass.
+        """
+
+        failures: List[str] = []
+        results: Dict[str, float] = {}
+
+        for name in self.modules:
+            module = f"crosswalking.{name}"
+            times: List[float] = []
+            packages: Set[str] = set()
+
+            for _ in range(self.runs):
+                milliseconds, loaded = self.import_once(module)
+                times.append(milliseconds)
+                packages |= loaded
+
+            results[name] = statistics.median(times)
+            budget = BUDGETS.get(name, DEFAULT_BUDGET) * self.scale
+
+            if results[name] > budget:
+                failures.append(
+                    f"{module} took {results[name]:.0f} ms, over {budget:.0f} ms"
+                )
+
+            excluded = SCRAPERS + (READER_EXCLUDED if name in READERS else [])
+
+            for package in sorted(packages & set(excluded)):
+                failures.append(f"{module} imports {package}")
+
+            print(
+                f"{module:<28} {results[name]:>7.0f} ms "
+                f"(budget {budget:.0f} ms)"
+            )
+
+        for failure in failures:
+            print("FAIL", failure)
+
+        return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the import time of the crosswalk entry points."
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="fresh imports per module"
+    )
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1,
+        help="multiplies every budget, such as 2 on a slow machine",
+    )
+    args = parser.parse_args()
+
+    failures = ImportBenchmark(runs=args.runs, scale=args.budget_scale).run()
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from crosswalking.lookup import CrosswalkLookup, decode
+
+
+class LoadTest:
+    """
+    Drive the lookup service with concurrent keep-alive clients.
+
+    Each client sends requests back to back for the duration, either a single
+    CEEB to NCES translation or a batch of CEEB codes translated into every
+    other ID type. The IDs are drawn from the compiled crosswalks, with a
+    share of unknown codes.
+    """
+
+    def __init__(
+        self,
+        lookup_dir: str,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        clients: int = 64,
+        duration: float = 10,
+        batch_share: float = 0.1,
+        batch_size: int = 100,
+        unknown_share: float = 0.1,
+    ):
+        self.host = host
+        self.port = port
+        self.clients = clients
+        self.duration = duration
+        self.batch_share = batch_share
+        self.batch_size = batch_size
+        self.unknown_share = unknown_share
+
+        lookup = CrosswalkLookup(lookup_dir)
+        keys, _, _ = lookup.mapping("school", "ceeb", "nces")
+
+        self.ceeb: List[str] = decode(
+            np.asarray(keys), lookup.widths["school"]["ceeb"]
+        ).tolist()
+
+        self.latencies: List[float] = []
+        self.ids = 0
+        self.errors = 0
+
+    def pick(self) -> str:
+        if random.random() < self.unknown_share:
+            return "ZZZZZZ"
+
+        return random.choice(self.ceeb)
+
+    def request(self) -> bytes:
+        if random.random() < self.batch_share:
+            ids = [self.pick() for _ in range(self.batch_size)]
+            body = json.dumps({"source": "ceeb", "ids": ids}).encode()
+
+            self.ids += len(ids)
+
+            return (
+                "POST /translate HTTP/1.1\r\n"
+                f"Host: {self.host}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "\r\n"
+            ).encode() + body
+
+        self.ids += 1
+
+        return (
+            f"GET /translate/school/ceeb/nces/{self.pick()} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            "\r\n"
+        ).encode()
+
+    async def client(self, stop: float):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+
+        try:
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+
+                writer.write(self.request())
+                await writer.drain()
+
+                status = await reader.readline()
+
+                length = 0
+                while (line := await reader.readline()) != b"\r\n":
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+
+                await reader.readexactly(length)
+
+                self.latencies.append(time.perf_counter() - start)
+
+                if b" 200 " not in status:
+                    self.errors += 1
+        finally:
+            writer.close()
+
+    async def run(self):
+        stop = time.perf_counter() + self.duration
+        start = time.perf_counter()
+
+        await asyncio.gather(*[self.client(stop) for _ in range(self.clients)])
+
+        elapsed = time.perf_counter() - start
+        latency = np.asarray(self.latencies) * 1000
+
+        print(f"Requests:   {len(latency):,} ({len(latency) / elapsed:,.0f}/s)")
+        print(f"IDs:        {self.ids:,} ({self.ids / elapsed:,.0f}/s)")
+        print(f"Errors:     {self.errors:,}")
+
+        for p in [50, 90, 99, 99.9]:
+            print(f"p{p:<9} {np.percentile(latency, p):.3f} ms")
+
+        print(f"max        {latency.max():.3f} ms")
+
+
+if __name__ == "__main__":
+    # Start the service first with `python -m crosswalking.service`.
+    clients: int = 64
+    duration: float = 10
+    batch_share: float = 0.1
+
+    test = LoadTest(
+        os.path.join("crosswalking", "lookup"),
+        clients=clients,
+        duration=duration,
+        batch_share=batch_share,
+    )
+
+    asyncio.run(test.run())
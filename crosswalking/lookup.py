@@ -0,0 +1,307 @@
+import json
+import os
+from itertools import permutations
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# only compiling needs DuckDB, so reading the lookups doesn't import it.
+if TYPE_CHECKING:
+    from utils.duckdb import DuckDB
+
+# IDs are read as base 36, so digits and letters both fit, and the widest ID
+# that fits in 64 bits has 12 characters.
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+MAX_WIDTH = 12
+
+DIGITS = np.full(128, 255, dtype=np.uint8)
+for digit, char in enumerate(ALPHABET):
+    DIGITS[ord(char)] = digit
+    DIGITS[ord(char.lower())] = digit
+
+CHARS = np.frombuffer(ALPHABET.encode("utf-32-le"), dtype=np.uint32)
+
+# no ID encodes to this, so it is used for IDs that can't be encoded.
+MISSING = np.iinfo(np.uint64).max
+
+# the crosswalk tables and their ID columns.
+LEVELS = {
+    "school": ("schools.crosswalk", ["ceeb", "nces"]),
+    "university": (
+        "universities.university_crosswalk",
+        ["ceeb", "ipeds", "nsc"],
+    ),
+}
+
+
+def encode(ids: Sequence[object], width: int) -> np.ndarray:
+    """Encode IDs as integers.
+
+    Shorter IDs, such as integers that lost their leading zeros, are padded
+    with zeros to the width.
+
+    Args:
+        ids (Sequence[object]): The IDs.
+        width (int): The width of this type of ID.
+
+    Returns:
+        np.ndarray: The codes, which are `MISSING` for missing IDs, IDs wider
+            than the width, and IDs with characters outside of `ALPHABET`.
+    """
+
+    ids = np.asarray(ids, dtype=object)
+    present = np.not_equal(ids, None)
+
+    text = ids[present].astype(str)
+    text = np.char.zfill(text, width) if len(text) else text.astype(f"<U{width}")
+
+    valid = np.char.str_len(text) == width
+
+    chars = text.astype(f"<U{width}").view(np.uint32).reshape(-1, width)
+    digits = DIGITS[np.minimum(chars, 127)]
+
+    valid &= (chars < 128).all(axis=1) & (digits != 255).all(axis=1)
+
+    code = np.zeros(len(text), dtype=np.uint64)
+    for column in range(width):
+        code = code * np.uint64(36) + digits[:, column].astype(np.uint64)
+
+    codes = np.full(len(ids), MISSING, dtype=np.uint64)
+    codes[np.flatnonzero(present)[valid]] = code[valid]
+
+    return codes
+
+
+def decode(codes: np.ndarray, width: int) -> np.ndarray:
+    """Decode integers back into IDs.
+
+    Args:
+        codes (np.ndarray): The codes.
+        width (int): The width of this type of ID.
+
+    Returns:
+        np.ndarray: The IDs as a fixed-width string array.
+    """
+
+    codes = np.asarray(codes, dtype=np.uint64).copy()
+    chars = np.empty((len(codes), width), dtype=np.uint32)
+
+    for column in reversed(range(width)):
+        chars[:, column] = CHARS[codes % np.uint64(36)]
+        codes //= np.uint64(36)
+
+    return chars.view(f"<U{width}").ravel()
+
+
+# every pair of characters, so single IDs are decoded two at a time.
+PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+
+
+def decode_one(code: int, width: int) -> str:
+    pairs = []
+
+    for _ in range((width + 1) // 2):
+        code, pair = divmod(code, 1296)
+        pairs.append(PAIRS[pair])
+
+    return "".join(reversed(pairs))[-width:]
+
+
+def compile_lookup(duck: "DuckDB", output_dir: str):
+    """Compile the crosswalks into sorted ID arrays.
+
+    For every pair of ID columns in a crosswalk there are three arrays, like
+    a sparse matrix: the sorted distinct source codes, the offset of each
+    source's targets, and the target codes. They are saved as `.npy` files,
+    which `CrosswalkLookup` memory-maps.
+
+    The crosswalk databases need to be attached as `schools` and
+    `universities`.
+
+    Args:
+        duck (DuckDB): A DuckDB object.
+        output_dir (str): The directory for the arrays.
+    """
+
+    manifest: Dict[str, Dict[str, int]] = {}
+
+    for level, (table, columns) in LEVELS.items():
+        os.makedirs(os.path.join(output_dir, level), exist_ok=True)
+
+        ids = duck.sql(
+            f"select {', '.join(columns)} from {table}"
+        ).fetch_arrow_table()
+
+        widths = {}
+
+        for column in columns:
+            # `encode` pads shorter IDs with zeros to the widest.
+            (width,) = duck.sql(
+                f"select coalesce(max(length({column})), 1) from {table}"
+            ).fetchone()  # type: ignore
+
+            if width > MAX_WIDTH:
+                raise ValueError(f"{level} {column} IDs are too wide.")
+
+            widths[column] = width
+
+        codes = {
+            column: encode(
+                ids[column].to_numpy(zero_copy_only=False), widths[column]
+            )
+            for column in columns
+        }
+
+        # an ID that can't be encoded would lose its links without a trace.
+        for column in columns:
+            present = ids[column].is_valid().to_numpy(zero_copy_only=False)
+            invalid = np.flatnonzero(present & (codes[column] == MISSING))
+
+            if len(invalid):
+                examples = ids[column].take(invalid[:5]).to_pylist()
+
+                raise ValueError(
+                    f"{len(invalid)} {level} {column} IDs have characters "
+                    f"outside of 0-9 and A-Z, such as {examples}."
+                )
+
+        for source, target in permutations(columns, 2):
+            keep = (codes[source] != MISSING) & (codes[target] != MISSING)
+
+            pairs = np.unique(
+                np.stack([codes[source][keep], codes[target][keep]], axis=1),
+                axis=0,
+            )
+
+            keys, starts = np.unique(pairs[:, 0], return_index=True)
+            offsets = np.append(starts, len(pairs)).astype(np.int64)
+
+            base = os.path.join(output_dir, level, f"{source}_{target}")
+
+            np.save(base + "_keys.npy", keys)
+            np.save(base + "_offsets.npy", offsets)
+            np.save(base + "_values.npy", pairs[:, 1].copy())
+
+        manifest[level] = widths
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+class CrosswalkLookup:
+    """
+    ID translation over the compiled crosswalk arrays.
+
+    The arrays are memory-mapped read-only, so opening the lookup is instant
+    and any number of processes share the same pages of the OS cache rather
+    than each holding a copy.
+    """
+
+    def __init__(self, lookup_dir: str):
+        """
+        Args:
+            lookup_dir (str): The directory written by `compile_lookup`.
+        """
+
+        self.lookup_dir = lookup_dir
+
+        with open(os.path.join(lookup_dir, "manifest.json")) as f:
+            self.widths: Dict[str, Dict[str, int]] = json.load(f)
+
+        self.arrays: Dict[Tuple[str, str, str], Tuple[np.ndarray, ...]] = {}
+
+    def mapping(self, level: str, source: str, target: str):
+        if (level, source, target) not in self.arrays:
+            if source == target or not {source, target} <= set(
+                self.widths.get(level, {})
+            ):
+                raise ValueError(
+                    f"There is no {level} mapping from {source} to {target}."
+                )
+
+            base = os.path.join(self.lookup_dir, level, f"{source}_{target}")
+
+            # plain array views of the maps skip the memmap subclass overhead.
+            self.arrays[(level, source, target)] = tuple(
+                np.load(base + suffix, mmap_mode="r").view(np.ndarray)
+                for suffix in ["_keys.npy", "_offsets.npy", "_values.npy"]
+            )
+
+        return self.arrays[(level, source, target)]
+
+    def get(self, level: str, source: str, target: str, id: object) -> List[str]:
+        """Translate a single ID.
+
+        Args:
+            level (str): "school" or "university".
+            source (str): The ID type given, such as "ceeb".
+            target (str): The ID type wanted, such as "nces".
+            id (object): The ID. Integers are padded with leading zeros.
+
+        Returns:
+            List[str]: Every matching ID, which is empty if there are none.
+        """
+
+        keys, offsets, values = self.mapping(level, source, target)
+
+        try:
+            code = np.uint64(int(str(id).zfill(self.widths[level][source]), 36))
+        except (ValueError, OverflowError):
+            return []
+
+        i = int(keys.searchsorted(code))
+
+        if i == len(keys) or keys[i] != code:
+            return []
+
+        width = self.widths[level][target]
+        start, end = offsets[i : i + 2].tolist()
+
+        return [decode_one(value, width) for value in values[start:end].tolist()]
+
+    def lookup(
+        self, level: str, source: str, target: str, ids: Sequence[object]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Translate a batch of IDs.
+
+        Args:
+            level (str): "school" or "university".
+            source (str): The ID type given, such as "ceeb".
+            target (str): The ID type wanted, such as "nces".
+            ids (Sequence[object]): The IDs.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Flat arrays of the position of the
+                given ID and each matching ID, ordered by position.
+        """
+
+        keys, offsets, values = self.mapping(level, source, target)
+
+        codes = encode(ids, self.widths[level][source])
+
+        found = np.minimum(keys.searchsorted(codes), max(len(keys) - 1, 0))
+        hit = np.flatnonzero(
+            (keys[found] == codes) if len(keys) else np.zeros(len(codes), bool)
+        )
+
+        start = offsets[found[hit]]
+        count = offsets[found[hit] + 1] - start
+
+        query = np.repeat(hit, count)
+        position = np.repeat(start, count) + (
+            np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        )
+
+        return query, decode(values[position], self.widths[level][target])
+
+
+if __name__ == "__main__":
+    from utils.duckdb import DuckDB
+
+    with DuckDB() as duck:
+        for db in ["schools", "universities"]:
+            duck.attach_db(
+                os.path.join("crosswalking", db + ".duckdb"), read_only=True
+            )
+
+        compile_lookup(duck, os.path.join("crosswalking", "lookup"))
@@ -0,0 +1,257 @@
+import argparse
+import os
+import sys
+
+from utils.memory import print_memory
+from utils.pipeline import File, Pipeline, Stage, Table, print_timeline
+
+CLEAN = "clean-data"
+
+
+def clean(db: str, table: str) -> Table:
+    return Table(os.path.join(CLEAN, db + ".duckdb"), table)
+
+
+def crosswalk(db: str, table: str) -> Table:
+    return Table(os.path.join("crosswalking", db + ".duckdb"), table)
+
+
+GEOGRAPHY = [
+    clean("geography", t)
+    for t in ["state", "county", "school_district", "zcta"]
+]
+SQL = File(os.path.join("crosswalking", "sql"))
+MATCHING = [
+    File(os.path.join("utils", f))
+    for f in [
+        "assignment.py",
+        "similarity.py",
+        "spatial.py",
+        "text_index.py",
+        "duckdb.py",
+    ]
+]
+
+# `data_collection.ceeb` only builds the high school table by default. The
+# college and NCAA tables are toggled on by hand, so they are inputs here
+# rather than outputs.
+STAGES = [
+    Stage(
+        "states",
+        "data_collection.us_census.states",
+        inputs=[File("utils/census.py")],
+        outputs=[GEOGRAPHY[0]],
+        resources={"network": 1},
+    ),
+    Stage(
+        "counties",
+        "data_collection.us_census.counties",
+        inputs=[File("utils/census.py")],
+        outputs=[GEOGRAPHY[1]],
+        resources={"network": 1},
+    ),
+    Stage(
+        "school_districts",
+        "data_collection.us_census.school_districts",
+        inputs=[File("utils/census.py")],
+        outputs=[GEOGRAPHY[2]],
+        resources={"network": 1},
+    ),
+    Stage(
+        "zctas",
+        "data_collection.us_census.zip_codes",
+        inputs=[File("utils/census.py")],
+        outputs=[GEOGRAPHY[3]],
+        resources={"network": 1},
+    ),
+    Stage(
+        "ipeds_hd",
+        "data_collection.hd",
+        inputs=[File("utils/ipeds.py")],
+        outputs=[
+            clean("ipeds", t) for t in ["hd", "hd_current", "hd_history"]
+        ],
+        resources={"network": 1},
+    ),
+    Stage(
+        "nces",
+        "data_collection.nces",
+        inputs=[File("utils/nces.py")],
+        outputs=[
+            clean("nces", t)
+            for t in ["public", "private", "postsecondary", "school"]
+        ],
+        resources={"network": 1, "browser": 1},
+    ),
+    Stage(
+        "nsc",
+        "data_collection.nsc",
+        outputs=[clean("nsc", "nsc_to_ipeds")],
+        resources={"network": 1},
+    ),
+    Stage(
+        "ceeb",
+        "data_collection.ceeb",
+        inputs=[File("utils/ceeb.py")],
+        outputs=[clean("ceeb", "school")],
+        resources={"network": 1, "browser": 1},
+    ),
+    Stage(
+        "schools",
+        "crosswalking.schools",
+        inputs=[
+            clean("ceeb", "school"),
+            clean("ceeb", "ncaa_school"),
+            clean("nces", "public"),
+            clean("nces", "private"),
+            clean("nces", "school"),
+            *GEOGRAPHY,
+            SQL,
+            *MATCHING,
+        ],
+        outputs=[crosswalk("schools", "crosswalk")],
+        resources={"cpu": 2},
+    ),
+    Stage(
+        "universities",
+        "crosswalking.universities",
+        inputs=[
+            clean("ceeb", "university"),
+            clean("ipeds", "hd_current"),
+            clean("nsc", "nsc_to_ipeds"),
+            GEOGRAPHY[0],
+            SQL,
+            *MATCHING,
+        ],
+        outputs=[crosswalk("universities", "university_crosswalk")],
+        resources={"cpu": 2},
+    ),
+    Stage(
+        "temporal",
+        "crosswalking.temporal",
+        inputs=[
+            clean("ipeds", "hd_history"),
+            clean("nces", "public"),
+            clean("nces", "private"),
+            crosswalk("schools", "crosswalk"),
+            crosswalk("universities", "university_crosswalk"),
+            SQL,
+            File("utils/interval_index.py"),
+        ],
+        outputs=[
+            crosswalk("temporal", "university_intervals"),
+            crosswalk("temporal", "school_intervals"),
+        ],
+    ),
+    Stage(
+        "lookup",
+        "crosswalking.lookup",
+        inputs=[
+            crosswalk("schools", "crosswalk"),
+            crosswalk("universities", "university_crosswalk"),
+        ],
+        outputs=[File(os.path.join("crosswalking", "lookup"))],
+    ),
+    Stage(
+        "export",
+        "crosswalking.export",
+        inputs=[
+            crosswalk("schools", "crosswalk"),
+            crosswalk("universities", "university_crosswalk"),
+        ],
+        outputs=[File(os.path.join("crosswalking", "export"))],
+    ),
+    Stage(
+        "typeahead",
+        "crosswalking.typeahead",
+        inputs=[
+            clean("ceeb", "school"),
+            clean("ceeb", "university"),
+            clean("nces", "public"),
+            clean("nces", "private"),
+            clean("nces", "school"),
+            clean("ipeds", "hd_current"),
+            clean("nsc", "nsc_to_ipeds"),
+            *GEOGRAPHY,
+            SQL,
+        ],
+        outputs=[File(os.path.join("crosswalking", "typeahead"))],
+    ),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the data and crosswalks that are out of date."
+    )
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help="the stages to bring up to date, with what they depend on "
+        f"(default: all of {', '.join(s.name for s in STAGES)})",
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="run a stage even when it is up to date, can be repeated",
+    )
+    parser.add_argument(
+        "--force-all", action="store_true", help="run every stage"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report which stages are out of date and why",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="stages to run at once (default: 4)",
+    )
+    parser.add_argument(
+        "--cpu",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="cores shared by the crosswalk stages (default: all)",
+    )
+    parser.add_argument(
+        "--network",
+        type=int,
+        default=4,
+        help="downloading stages to run at once (default: 4)",
+    )
+    parser.add_argument(
+        "--browser",
+        type=int,
+        default=1,
+        help="Selenium scrapers to run at once (default: 1)",
+    )
+    args = parser.parse_args()
+
+    pipeline = Pipeline(
+        STAGES,
+        jobs=args.jobs,
+        limits={
+            "cpu": args.cpu,
+            "network": args.network,
+            "browser": args.browser,
+        },
+    )
+
+    timeline = pipeline.run(
+        targets=args.targets or None,
+        force=[s.name for s in STAGES] if args.force_all else args.force,
+        dry_run=args.dry_run,
+    )
+
+    print_timeline(timeline)
+    print_memory(
+        pipeline.memory, [e["stage"] for e in timeline if "memory_log" in e]
+    )
+
+    sys.exit(
+        1 if any(e["status"] in ("failed", "blocked") for e in timeline) else 0
+    )
@@ -1,10 +1,45 @@
+import argparse
+import glob
+import hashlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import polars as pl
+import pyarrow as pa
+from rapidfuzz import fuzz
 
+from utils.assignment import resolve_one_to_one
 from utils.duckdb import DuckDB
+from utils.similarity import pairwise_similarity
+from utils.spatial import PointIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the code the matches depend on, so changing it forces a full build.
+MATCHING_FILES = [
+    os.path.join("crosswalking", "schools.py"),
+    os.path.join("crosswalking", "sql", "*.sql"),
+    os.path.join("utils", "assignment.py"),
+    os.path.join("utils", "similarity.py"),
+    os.path.join("utils", "spatial.py"),
+]
+
+
+def matching_version() -> str:
+    """A hash of the `MATCHING_FILES`."""
+
+    digest = hashlib.sha256()
+
+    for pattern in MATCHING_FILES:
+        for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+            digest.update(os.path.relpath(path, ROOT).encode())
+
+            with open(path, "rb") as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
 
 
 class SchoolCrosswalk:
@@ -32,6 +67,14 @@ class SchoolCrosswalk:
         # the tables to be created.
         self.table_names = ["ceeb", "nces", "cb_match"]
 
+        # the geography tables used for enrichment, each from its SQL file.
+        self.geography_table_names = [
+            "state",
+            "county",
+            "school_district",
+            "zcta",
+        ]
+
         # the required DuckDB files.
         self.db_names = ["ceeb", "geography", "nces"]
 
@@ -40,9 +83,43 @@ class SchoolCrosswalk:
             for db in self.db_names
         ]
 
+    def process(self, incremental: bool = False):
+        """Build the crosswalk.
+
+        Args:
+            incremental (bool, optional): Keep the previous crosswalk and only
+                re-match the records that changed since the last run. Falls
+                back to a full build when there is no previous run, or when
+                the matching code changed since it. Defaults to False.
+        """
+
+        print("Initialization...")
+        self.attach_dbs()
+        self.create_school_tables()
+
+        rematch = incremental and self.has_previous_run()
+
+        if rematch:
+            print("Finding Changed Records...")
+            self.find_source_changes()
+            self.create_rematch_pool()
+        else:
+            self.clear_seed_matches()
+
+        print("Matching...")
+        self.iterative_exact_matching(create_unmatched=not rematch)
+        self.fuzzy_matching()
+        self.spatial_candidates()
+        self.spatial_matching()
+
+        print("Writing Crosswalk...")
+        self.enrich_geography()
+        self.build_crosswalk()
+        self.save_fingerprints()
+
     def attach_dbs(self):
         for path in self.db_paths:
-            self.duck.attach_db(path)
+            self.duck.attach_db(path, read_only=True)
 
     def create_school_tables(self):
         def tighten(string: str) -> str:
@@ -65,9 +142,188 @@ class SchoolCrosswalk:
         for file, name in zip(self.sql_files, self.table_names):
             self.duck.create_table_file(name, file)
 
-    def iterative_exact_matching(self, return_sql: bool = False):
+    def has_previous_run(self) -> bool:
+        """Whether the last run's matches can be kept, which needs its
+        crosswalk and fingerprints, and the same matching code."""
+
+        if not all(
+            self.duck.table_exists(name)
+            for name in [
+                "crosswalk",
+                "ceeb_fingerprint",
+                "nces_fingerprint",
+                "matching_fingerprint",
+            ]
+        ):
+            return False
+
+        (previous,) = self.duck.sql(
+            "select version from matching_fingerprint"
+        ).fetchone()  # type: ignore
+
+        if previous != matching_version():
+            print("The matching changed since the last run, so rebuilding...")
+            return False
+
+        return True
+
+    def save_fingerprints(self):
+        """
+        Store a fingerprint of every CEEB and NCES record for the next
+        incremental update.
+
+        The blocking keys are kept alongside the fingerprint so the old version
+        of a changed record can still invalidate the matches around it. A hash
+        of the matching code is kept as well, so a change to it forces a full
+        build.
+        """
+
+        self.duck.create_table_query(
+            "matching_fingerprint", f"select version: '{matching_version()}'"
+        )
+
+        for id in ["ceeb", "nces"]:
+            self.duck.create_table_query(
+                f"{id}_fingerprint",
+                (
+                    f"select {id}, name, city, state_abbr, zip, "
+                    f"fingerprint: hash(t) from {id} t"
+                ),
+            )
+
+    def find_source_changes(self):
+        """
+        Compare the CEEB and NCES records to the fingerprints of the last run.
+
+        This creates `ceeb_changes` and `nces_changes` with every record that
+        was added, removed, or changed.
+        """
+
+        for id in ["ceeb", "nces"]:
+            self.duck.create_table_query(
+                f"{id}_changes",
+                (
+                    "select\n"
+                    f"    {id}: coalesce(new.{id}, old.{id}),\n"
+                    "    change: case\n"
+                    f"        when old.{id} is null then 'added'\n"
+                    f"        when new.{id} is null then 'removed'\n"
+                    "        else 'changed'\n"
+                    "    end\n"
+                    f"from (select {id}, fingerprint: hash(t) from {id} t) new\n"
+                    f"full join {id}_fingerprint old on new.{id} = old.{id}\n"
+                    "where new.fingerprint is distinct from old.fingerprint"
+                ),
+            )
+
+    def create_rematch_pool(self):
+        """
+        Keep the previous matches that no change can affect and collect the
+        records that need to be matched again.
+
+        A record is touched when it changed, or when it shares a state and a
+        ZIP code, city, or name with the old or new version of a changed
+        record. Those are the keys every matching round blocks on, so a
+        change can only alter the matches of touched records. Previous
+        matches between untouched records are kept as `seed_matches`. Both
+        sides of every other previous match go back into
+        `cb_unmatched_ceeb` and `cb_unmatched_nces` along with the touched
+        records.
+        """
+
+        def changed_keys(id: str):
+            return (
+                f"(select name, city, state_abbr, zip from {id}\n"
+                f"semi join {id}_changes using ({id}))\n"
+                "union all\n"
+                f"(select name, city, state_abbr, zip from {id}_fingerprint\n"
+                f"semi join {id}_changes using ({id}))"
+            )
+
+        self.duck.create_table_query(
+            "rematch_keys",
+            (
+                "with changed as (\n"
+                f"    {changed_keys('ceeb')}\n"
+                "    union all\n"
+                f"    {changed_keys('nces')}\n"
+                ")\n"
+                "select distinct state_abbr, key_type: 'zip', key: zip\n"
+                "from changed where zip is not null\n"
+                "union\n"
+                "select distinct state_abbr, key_type: 'city', key: city\n"
+                "from changed where city is not null\n"
+                "union\n"
+                "select distinct state_abbr, key_type: 'name', key: name\n"
+                "from changed where name is not null"
+            ),
+        )
+
+        def touched(id: str):
+            def by_key(key: str):
+                return (
+                    f"select {id} from {id} r\n"
+                    "semi join rematch_keys k\n"
+                    f"on k.key_type = '{key}'\n"
+                    "and r.state_abbr = k.state_abbr\n"
+                    f"and r.{key} = k.key"
+                )
+
+            return (
+                f"select {id} from {id}_changes\n"
+                f"union\n{by_key('zip')}\n"
+                f"union\n{by_key('city')}\n"
+                f"union\n{by_key('name')}"
+            )
+
+        self.duck.create_table_query(
+            "seed_matches",
+            (
+                "with\n"
+                f"  touched_ceeb as ({touched('ceeb')}),\n"
+                f"  touched_nces as ({touched('nces')})\n"
+                "select ceeb, nces\n"
+                "from crosswalk\n"
+                "semi join ceeb using (ceeb)\n"
+                "semi join nces using (nces)\n"
+                "anti join touched_ceeb using (ceeb)\n"
+                "anti join touched_nces using (nces)\n"
+                "anti join cb_match using (ceeb)\n"
+                "anti join cb_match using (nces)"
+            ),
+        )
+
+        for id in ["ceeb", "nces"]:
+            self.duck.create_table_query(
+                f"cb_unmatched_{id}",
+                (
+                    "with\n"
+                    f"  touched as ({touched(id)}),\n"
+                    "  invalidated as (\n"
+                    f"    select {id} from crosswalk\n"
+                    f"    anti join seed_matches using ({id})\n"
+                    "  )\n"
+                    f"from {id}\n"
+                    f"semi join (from touched union from invalidated) using ({id})\n"
+                    f"anti join cb_match using ({id})\n"
+                    f"anti join seed_matches using ({id})"
+                ),
+            )
+
+    def clear_seed_matches(self):
+        self.duck.create_table_query(
+            "seed_matches", "select ceeb, nces from cb_match limit 0"
+        )
+
+    def iterative_exact_matching(
+        self, return_sql: bool = False, create_unmatched: bool = True
+    ):
         """
         This builds out a large SQL query for exact matching with no duplicates.
+
+        The rounds start from `cb_unmatched_ceeb` and `cb_unmatched_nces`.
+        These are created here unless `create_unmatched` is false, which is
+        how the incremental update supplies its own records to re-match.
         """
 
         def non_matching(
@@ -120,15 +376,16 @@ class SchoolCrosswalk:
 
         # first, create the non-matched CEEB and NCES records based on the
         # College Board's matches.
-        self.duck.create_table_query(
-            table_name="cb_unmatched_ceeb",
-            query="from ceeb anti join cb_match using (ceeb)",
-        )
+        if create_unmatched:
+            self.duck.create_table_query(
+                table_name="cb_unmatched_ceeb",
+                query="from ceeb anti join cb_match using (ceeb)",
+            )
 
-        self.duck.create_table_query(
-            table_name="cb_unmatched_nces",
-            query="from nces anti join cb_match using (nces)",
-        )
+            self.duck.create_table_query(
+                table_name="cb_unmatched_nces",
+                query="from nces anti join cb_match using (nces)",
+            )
 
         round_1 = iterate(
             "1",
@@ -219,6 +476,464 @@ class SchoolCrosswalk:
 
             return self.duck.sql("from unique_exact_matches").pl()
 
+    def fuzzy_matching(
+        self,
+        name_cutoff: float = 90,
+        address_cutoff: float = 90,
+        minimum_name: float = 75,
+        workers: int = -1,
+    ):
+        """
+        Fuzzy matching of the records left over after exact matching.
+
+        Candidate pairs are blocked by state and either ZIP code or city, so
+        only schools that plausibly share a location are compared. The name
+        and address of every candidate pair are scored in one batch with
+        `rapidfuzz` across all cores.
+
+        A pair is kept when the names are close enough on their own, or when
+        the names are somewhat close and the addresses agree. The kept pairs
+        are resolved to the one-to-one matches with the largest total score,
+        see `utils.assignment.resolve_one_to_one`.
+
+        Args:
+            name_cutoff (float, optional): Name score that is enough on its
+                own. Defaults to 90.
+            address_cutoff (float, optional): Address score needed when the
+                name score is below `name_cutoff`. Defaults to 90.
+            minimum_name (float, optional): The lowest name score that can be
+                rescued by the address. Defaults to 75.
+            workers (int, optional): Threads used for scoring, `-1` for all
+                cores. Defaults to -1.
+        """
+
+        def block(key: str):
+            return (
+                "select\n"
+                "    ceeb,\n"
+                "    nces,\n"
+                "    ceeb_match_name: a.name,\n"
+                "    nces_match_name: b.name,\n"
+                "    ceeb_match_address: a.address,\n"
+                "    nces_match_address: b.address\n"
+                "from residual_ceeb a\n"
+                "inner join residual_nces b\n"
+                f"on a.state_abbr = b.state_abbr and a.{key} = b.{key}"
+            )
+
+        self.duck.create_table_query(
+            "fuzzy_candidates",
+            (
+                "with\n"
+                "  residual_ceeb as (\n"
+                "    from cb_unmatched_ceeb\n"
+                "    anti join unique_exact_matches using (ceeb)\n"
+                "  ),\n"
+                "  residual_nces as (\n"
+                "    from cb_unmatched_nces\n"
+                "    anti join unique_exact_matches using (nces)\n"
+                "  )\n"
+                f"{block('zip')}\n"
+                "union\n"
+                f"{block('city')}"
+            ),
+        )
+
+        candidates = self.duck.table("fuzzy_candidates").fetch_arrow_table()
+
+        name_score = pairwise_similarity(
+            candidates["ceeb_match_name"].to_pylist(),
+            candidates["nces_match_name"].to_pylist(),
+            scorer=fuzz.token_sort_ratio,
+            workers=workers,
+        )
+
+        address_score = pairwise_similarity(
+            candidates["ceeb_match_address"].to_pylist(),
+            candidates["nces_match_address"].to_pylist(),
+            scorer=fuzz.ratio,
+            workers=workers,
+        )
+
+        self.duck.create_table_arrow(
+            "fuzzy_scores",
+            candidates.select(["ceeb", "nces"])
+            .append_column("name_score", pa.array(name_score))
+            .append_column("address_score", pa.array(address_score)),
+        )
+
+        self.duck.execute(
+            "CREATE OR REPLACE TABLE fuzzy_pairs AS (\n"
+            "select *, score: (name_score + address_score) / 2\n"
+            "from fuzzy_scores\n"
+            "where name_score >= $name_cutoff\n"
+            "or (\n"
+            "    name_score >= $minimum_name\n"
+            "    and address_score >= $address_cutoff\n"
+            ")\n"
+            ")",
+            parameters={
+                "name_cutoff": name_cutoff,
+                "address_cutoff": address_cutoff,
+                "minimum_name": minimum_name,
+            },
+        )
+
+        resolve_one_to_one(self.duck, "fuzzy_pairs", "fuzzy_assigned")
+
+        self.duck.create_table_query(
+            "fuzzy_matches",
+            (
+                "select\n"
+                "    strength: '(fuzzy) name, address',\n"
+                "    ceeb,\n"
+                "    nces,\n"
+                "    a.ceeb_name,\n"
+                "    b.nces_name,\n"
+                "    a.address,\n"
+                "    a.city,\n"
+                "    a.state_abbr,\n"
+                "    b.fips,\n"
+                "    a.zip,\n"
+                "    latitude: coalesce(a.latitude, b.latitude),\n"
+                "    longitude: coalesce(a.longitude, b.longitude),\n"
+                "    name_score,\n"
+                "    address_score,\n"
+                "    score\n"
+                "from fuzzy_assigned\n"
+                "inner join ceeb a using (ceeb)\n"
+                "inner join nces b using (nces)\n"
+                "order by ceeb"
+            ),
+        )
+
+        return self.duck.sql("from fuzzy_matches").pl()
+
+    def spatial_candidates(
+        self,
+        k: int = 5,
+        radius_km: float = 1.0,
+        workers: int = -1,
+    ):
+        """
+        Find the nearest NCES schools for each unmatched CEEB school.
+
+        The NCES schools left after exact and fuzzy matching are put in a
+        KD-tree over their coordinates. This always covers every unmatched
+        school, since the neighbours of a changed school don't share a
+        blocking key that the incremental update could follow. Every
+        unmatched CEEB school with coordinates gets up to `k` neighbours
+        within `radius_km`, along with the name similarity of each pair.
+
+        Args:
+            k (int, optional): Neighbours per CEEB school. Defaults to 5.
+            radius_km (float, optional): Search radius in kilometers.
+                Defaults to 1.0.
+            workers (int, optional): Threads used, `-1` for all cores.
+                Defaults to -1.
+        """
+
+        def residual(id: str):
+            return (
+                f"select {id}, name, latitude, longitude\n"
+                f"from {id}\n"
+                f"anti join cb_match using ({id})\n"
+                f"anti join seed_matches using ({id})\n"
+                f"anti join unique_exact_matches using ({id})\n"
+                f"anti join fuzzy_matches using ({id})\n"
+                "where latitude is not null and longitude is not null"
+            )
+
+        ceeb = self.duck.sql(residual("ceeb")).fetch_arrow_table()
+        nces = self.duck.sql(residual("nces")).fetch_arrow_table()
+
+        index = PointIndex(
+            nces["latitude"].to_numpy(), nces["longitude"].to_numpy()
+        )
+
+        query, found, distance = index.query(
+            ceeb["latitude"].to_numpy(),
+            ceeb["longitude"].to_numpy(),
+            k=k,
+            radius_km=radius_km,
+            workers=workers,
+        )
+
+        ceeb_ids = ceeb["ceeb"].take(query)
+        nces_ids = nces["nces"].take(found)
+
+        name_score = pairwise_similarity(
+            ceeb["name"].take(query).to_pylist(),
+            nces["name"].take(found).to_pylist(),
+            scorer=fuzz.token_sort_ratio,
+            workers=workers,
+        )
+
+        self.duck.create_table_arrow(
+            "spatial_candidates",
+            pa.table(
+                {
+                    "ceeb": ceeb_ids,
+                    "nces": nces_ids,
+                    "distance_km": distance,
+                    "name_score": name_score,
+                }
+            ),
+            query=(
+                "select *, rank: row_number() over ("
+                "partition by ceeb order by distance_km"
+                ") from {data}"
+            ),
+        )
+
+        return self.duck.sql("from spatial_candidates").pl()
+
+    def spatial_matching(self, name_cutoff: float = 80):
+        """
+        Match the nearby candidates from `spatial_candidates` by name.
+
+        A pair needs a name score of at least `name_cutoff`. The pairs are
+        resolved to the one-to-one matches with the largest total score,
+        preferring the higher name score and then the shorter distance.
+
+        Args:
+            name_cutoff (float, optional): The lowest name score for a match.
+                Defaults to 80.
+        """
+
+        # the distance is scaled below one point of name score, so it only
+        # breaks ties between names.
+        self.duck.execute(
+            "CREATE OR REPLACE TABLE spatial_pairs AS (\n"
+            "select\n"
+            "    *,\n"
+            "    score: name_score\n"
+            "        - distance_km / (max(distance_km) over () + 1)\n"
+            "from spatial_candidates\n"
+            "where name_score >= $name_cutoff\n"
+            ")",
+            parameters={"name_cutoff": name_cutoff},
+        )
+
+        resolve_one_to_one(self.duck, "spatial_pairs", "spatial_assigned")
+
+        self.duck.create_table_query(
+            "spatial_matches",
+            (
+                "select\n"
+                "    strength: '(spatial) name, location',\n"
+                "    ceeb,\n"
+                "    nces,\n"
+                "    a.ceeb_name,\n"
+                "    b.nces_name,\n"
+                "    a.address,\n"
+                "    a.city,\n"
+                "    a.state_abbr,\n"
+                "    b.fips,\n"
+                "    a.zip,\n"
+                "    a.latitude,\n"
+                "    a.longitude,\n"
+                "    name_score,\n"
+                "    distance_km\n"
+                "from spatial_assigned\n"
+                "inner join ceeb a using (ceeb)\n"
+                "inner join nces b using (nces)\n"
+                "order by ceeb"
+            ),
+        )
+
+        return self.duck.sql("from spatial_matches").pl()
+
+    def create_geography_tables(self):
+        """
+        Create the geography tables with an R-tree index on each geometry.
+
+        The tables persist in the database file, and `geography_fingerprint`
+        keeps a hash of each one's source rows and SQL file, so a table is
+        only copied and indexed again when either of them changed.
+        """
+
+        self.duck.install_and_load_extension("spatial", use_https=True)
+
+        self.duck.execute(
+            "CREATE TABLE IF NOT EXISTS geography_fingerprint "
+            "(table_name VARCHAR, fingerprint VARCHAR)"
+        )
+
+        for name in self.geography_table_names:
+            path = os.path.join(self.crosswalk_sql_dir, name + ".sql")
+
+            with open(path, "rb") as f:
+                query_hash = hashlib.sha256(f.read()).hexdigest()
+
+            rows, total = self.duck.sql(
+                f"select count(*), sum(hash(t)) from geography.{name} t"
+            ).fetchone()  # type: ignore
+
+            fingerprint = f"{rows}:{total}:{query_hash}"
+
+            previous = self.duck.sql(
+                "select fingerprint from geography_fingerprint "
+                "where table_name = $name",
+                params={"name": name},
+            ).fetchall()
+
+            if previous == [(fingerprint,)]:
+                continue
+
+            self.duck.create_table_file(name, path)
+
+            self.duck.execute(
+                f"CREATE INDEX {name}_geom_idx ON {name} USING RTREE (geom)"
+            )
+
+            self.duck.execute(
+                "DELETE FROM geography_fingerprint WHERE table_name = $name",
+                parameters={"name": name},
+            )
+            self.duck.execute(
+                "INSERT INTO geography_fingerprint "
+                "VALUES ($name, $fingerprint)",
+                parameters={"name": name, "fingerprint": fingerprint},
+            )
+
+    def enrich_geography(self, threads: int | None = None):
+        """
+        Assign a school district, county, and ZCTA to every school location.
+
+        The distinct coordinates of the CEEB and NCES schools are processed
+        one state at a time, with the states running in parallel. Districts
+        and counties are limited to the state itself. ZCTAs don't carry a
+        state, so they are prefiltered with the bounding box of the state's
+        schools, which is answered by the R-tree index. The point-in-polygon
+        tests are spatial joins that DuckDB runs against an R-tree rather than
+        a cross product.
+
+        Args:
+            threads (int | None, optional): States processed at once. Defaults
+                to the number of cores.
+        """
+
+        self.create_geography_tables()
+
+        self.duck.create_table_query(
+            "geography_points",
+            (
+                "select distinct state_abbr, latitude, longitude\n"
+                "from (\n"
+                "    (select state_abbr, latitude, longitude from ceeb)\n"
+                "    union all\n"
+                "    (select state_abbr, latitude, longitude from nces)\n"
+                ")\n"
+                "where latitude is not null and longitude is not null"
+            ),
+        )
+
+        self.duck.execute(
+            "CREATE OR REPLACE TABLE school_geography ("
+            "state_abbr VARCHAR, "
+            "latitude DOUBLE, "
+            "longitude DOUBLE, "
+            "lea VARCHAR, "
+            "county_geoid VARCHAR, "
+            "zcta VARCHAR"
+            ")"
+        )
+
+        extents = self.duck.sql(
+            "select\n"
+            "    state_abbr,\n"
+            "    state_fips,\n"
+            "    min(longitude),\n"
+            "    min(latitude),\n"
+            "    max(longitude),\n"
+            "    max(latitude)\n"
+            "from geography_points\n"
+            "inner join state using (state_abbr)\n"
+            "group by all"
+        ).fetchall()
+
+        def contains(table: str, column: str):
+            return (
+                "select\n"
+                "    latitude,\n"
+                "    longitude,\n"
+                f"    {column}: arg_max(g.{column}, g.edition)\n"
+                "from points p\n"
+                f"inner join {table} g\n"
+                "on st_contains(g.geom, p.point)\n"
+                "group by all"
+            )
+
+        def enrich_state(
+            state_abbr: str,
+            state_fips: str,
+            xmin: float,
+            ymin: float,
+            xmax: float,
+            ymax: float,
+        ):
+            # the envelope is written out so the R-tree index scan can use it.
+            envelope = (
+                f"st_makeenvelope({float(xmin)}, {float(ymin)}, "
+                f"{float(xmax)}, {float(ymax)})"
+            )
+
+            sql = (
+                "with\n"
+                "  points as (\n"
+                "    select\n"
+                "        latitude,\n"
+                "        longitude,\n"
+                "        point: st_point(longitude, latitude)\n"
+                "    from geography_points\n"
+                "    where state_abbr = $state_abbr\n"
+                "  ),\n"
+                "  districts as (\n"
+                "    select lea, edition, geom from school_district\n"
+                "    where state_fips = $state_fips\n"
+                "  ),\n"
+                "  counties as (\n"
+                "    select county_geoid: fips, edition, geom from county\n"
+                "    where state_fips = $state_fips\n"
+                "  ),\n"
+                "  zctas as (\n"
+                "    select zcta, edition, geom from zcta\n"
+                f"    where st_intersects(geom, {envelope})\n"
+                "  ),\n"
+                f"  point_lea as ({contains('districts', 'lea')}),\n"
+                f"  point_county as ({contains('counties', 'county_geoid')}),\n"
+                f"  point_zcta as ({contains('zctas', 'zcta')})\n"
+                "select\n"
+                "    state_abbr: $state_abbr,\n"
+                "    latitude,\n"
+                "    longitude,\n"
+                "    lea,\n"
+                "    county_geoid,\n"
+                "    zcta\n"
+                "from points\n"
+                "left join point_lea using (latitude, longitude)\n"
+                "left join point_county using (latitude, longitude)\n"
+                "left join point_zcta using (latitude, longitude)"
+            )
+
+            # each thread needs its own cursor on the connection.
+            with self.duck.duck.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO school_geography {sql}",
+                    {"state_abbr": state_abbr, "state_fips": state_fips},
+                )
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [
+                executor.submit(enrich_state, *extent) for extent in extents
+            ]
+
+            for future in futures:
+                future.result()
+
+        return self.duck.sql("from school_geography").pl()
+
     def build_crosswalk(self):
         self.duck.create_table_file(
             "crosswalk",
@@ -231,14 +946,13 @@ class SchoolCrosswalk:
         csv: bool = True,
         csv_file: str = "crosswalk.csv",
     ) -> pl.DataFrame | None:
-        data = self.duck.table("crosswalk").pl()
-
+        # DuckDB writes the file itself, so the crosswalk is only pulled into
+        # polars when it is asked for.
         if csv:
-            with open(csv_file, "w", encoding="utf8") as f:
-                data.write_csv(f)
+            self.duck.execute(f"COPY crosswalk TO '{csv_file}' (HEADER)")
 
         if polars:
-            return data
+            return self.duck.table("crosswalk").pl()
         else:
             return None
 
@@ -354,31 +1068,44 @@ class SchoolCrosswalk:
 
             return ", ".join(names)
 
-        def distinct(val: str, by: str):
-            return f"distinct_{val}: count(distinct {val}) over (partition by {by})"
+        def enforce_one_to_one(query: str, table_name: str):
+            # schools that share a name and location are told apart by their
+            # addresses. Every pair scores at least 1, so a pair that isn't
+            # ambiguous is always kept.
+            self.duck.create_table_query(f"{table_name}_candidates", query)
 
-        def enforce_one_to_one(query: str):
-            dist_a = distinct("nces", "ceeb")
-            dist_b = distinct("ceeb", "nces")
+            candidates = self.duck.table(
+                f"{table_name}_candidates"
+            ).fetch_arrow_table()
 
-            n = f"select {dist_a}, {dist_b}, * from matches"
+            address_score = pairwise_similarity(
+                candidates["ceeb_address"].to_pylist(),
+                candidates["nces_address"].to_pylist(),
+            )
 
-            return (
-                f"with matches as ({query}), n as ({n})"
-                "select * exclude(distinct_nces, distinct_ceeb) "
-                "from n where distinct_nces = 1 and distinct_ceeb = 1"
+            self.duck.create_table_arrow(
+                f"{table_name}_candidates",
+                candidates.append_column(
+                    "address_score", pa.array(address_score + 1)
+                ),
+            )
+
+            resolve_one_to_one(
+                self.duck,
+                f"{table_name}_candidates",
+                table_name,
+                score="address_score",
             )
 
         # round 1, exact by name and zip, one-to-one relationship
-        exact_name_zip = enforce_one_to_one(
+        enforce_one_to_one(
             f"select {cols('exact name+zip')} "
             "from ceeb a "
             "inner join nces b using (name, zip) "
-            "order by ceeb"
+            "order by ceeb",
+            "exact_name_zip",
         )
 
-        self.duck.create_table_query("exact_name_zip", exact_name_zip)
-
         # get non-matching from round 1
         r1_non_exact_ceeb = "from ceeb anti join nces using (name, zip)"
         r1_non_exact_nces = "from nces anti join ceeb using (name, zip)"
@@ -388,15 +1115,14 @@ class SchoolCrosswalk:
 
         # round 2
         # matches with name and state, one-to-one relationship
-        exact_name_state = enforce_one_to_one(
+        enforce_one_to_one(
             f"select {cols('exact name+state')} "
             "from r1_non_exact_ceeb a "
             "inner join r1_non_exact_nces b using (name, state) "
-            "order by ceeb"
+            "order by ceeb",
+            "exact_name_state",
         )
 
-        self.duck.create_table_query("exact_name_state", exact_name_state)
-
         # remaining unmatched records
         r2_non_exact_ceeb = (
             "from ceeb "
@@ -416,17 +1142,22 @@ class SchoolCrosswalk:
 
 
 if __name__ == "__main__":
-    with DuckDB(os.path.join("crosswalking", "schools.duckdb")) as duck:
+    parser = argparse.ArgumentParser(description="Build the school crosswalk.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-match the records that changed since the last build",
+    )
+    args = parser.parse_args()
 
+    with DuckDB(os.path.join("crosswalking", "schools.duckdb")) as duck:
         school = SchoolCrosswalk(
             duck=duck,
             clean_data_dir="clean-data",
             crosswalk_sql_dir=os.path.join("crosswalking", "sql"),
         )
 
-        school.attach_dbs()
-
-        school.create_school_tables()
-        school.iterative_exact_matching()
-        school.build_crosswalk()
-        school.save_crosswalk(csv_file="crosswalking\\school_crosswalk.csv")
+        school.process(incremental=args.incremental)
+        school.save_crosswalk(
+            csv_file=os.path.join("crosswalking", "school_crosswalk.csv")
+        )
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from crosswalking.lookup import CrosswalkLookup
+
+# the upper bounds of the latency buckets, in seconds.
+LATENCY_BUCKETS = [
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+]
+
+# the upper bounds of the batch size buckets, in IDs.
+BATCH_BUCKETS = [1, 4, 16, 64, 256, 1024, 4096, 16384]
+
+STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+
+
+class Histogram:
+    """A cumulative histogram in the Prometheus text format."""
+
+    def __init__(self, name: str, buckets: List[float]):
+        self.name = name
+        self.buckets = buckets
+        self.counts: Dict[str, List[int]] = defaultdict(
+            lambda: [0] * (len(buckets) + 1)
+        )
+        self.sums: Dict[str, float] = defaultdict(float)
+
+    def observe(self, label: str, value: float):
+        self.counts[label][bisect_left(self.buckets, value)] += 1
+        self.sums[label] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} histogram"]
+
+        for label, counts in sorted(self.counts.items()):
+            total = 0
+
+            for bound, count in zip(self.buckets + ["+Inf"], counts):
+                total += count
+                lines.append(
+                    f'{self.name}_bucket{{route="{label}",le="{bound}"}} {total}'
+                )
+
+            lines.append(f'{self.name}_sum{{route="{label}"}} {self.sums[label]}')
+            lines.append(f'{self.name}_count{{route="{label}"}} {total}')
+
+        return lines
+
+
+class Coalescer:
+    """
+    Collects the IDs of concurrent requests into one vectorized lookup.
+
+    Requests queue their IDs by mapping. The queue is flushed once the event
+    loop has handled everything that is ready, so requests that arrive
+    together share a lookup without waiting on a timer. A queue that reaches
+    `max_batch` IDs is flushed right away.
+    """
+
+    def __init__(
+        self, lookup: CrosswalkLookup, batches: Histogram, max_batch: int = 16384
+    ):
+        self.lookup = lookup
+        self.batches = batches
+        self.max_batch = max_batch
+
+        self.pending: Dict[
+            Tuple[str, str, str], List[Tuple[List[object], asyncio.Future]]
+        ] = defaultdict(list)
+        self.sizes: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.scheduled = False
+
+    def translate(
+        self, level: str, source: str, target: str, ids: List[object]
+    ) -> asyncio.Future:
+        """Queue IDs for translation.
+
+        Raises:
+            ValueError: There is no such mapping.
+
+        Returns:
+            asyncio.Future: The matches of each ID, once flushed.
+        """
+
+        key = (level, source, target)
+
+        # fail before queueing so one bad request can't spoil a batch.
+        self.lookup.mapping(*key)
+
+        future = asyncio.get_running_loop().create_future()
+
+        self.pending[key].append((ids, future))
+        self.sizes[key] += len(ids)
+
+        if self.sizes[key] >= self.max_batch:
+            self.flush_one(key)
+        elif not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+        return future
+
+    def flush(self):
+        self.scheduled = False
+
+        for key in list(self.pending):
+            self.flush_one(key)
+
+    def flush_one(self, key: Tuple[str, str, str]):
+        requests = self.pending.pop(key, [])
+        self.sizes.pop(key, None)
+
+        if not requests:
+            return
+
+        ids = [id for request_ids, _ in requests for id in request_ids]
+
+        self.batches.observe("/".join(key), len(ids))
+
+        try:
+            query, values = self.lookup.lookup(*key, ids)
+        except Exception as e:
+            for _, future in requests:
+                if not future.cancelled():
+                    future.set_exception(e)
+            return
+
+        # the matches of each ID are a run of `values`.
+        bounds = np.searchsorted(query, np.arange(len(ids) + 1)).tolist()
+        values = values.tolist()
+
+        position = 0
+
+        for request_ids, future in requests:
+            if not future.cancelled():
+                future.set_result(
+                    [
+                        values[bounds[i] : bounds[i + 1]]
+                        for i in range(position, position + len(request_ids))
+                    ]
+                )
+
+            position += len(request_ids)
+
+
+class LookupService:
+    """
+    A local HTTP service for translating IDs with the compiled crosswalks.
+
+    - `GET /translate/<level>/<source>/<target>/<id>` translates one ID.
+    - `POST /translate` with `{"source": "ceeb", "ids": [...]}` translates a
+      batch into every other ID type. `level` and `targets` narrow it down.
+    - `GET /metrics` has the latency and batch size histograms.
+    - `GET /health` is for readiness checks.
+
+    Connections are kept alive, and the crosswalks are loaded once at start.
+    """
+
+    def __init__(self, lookup_dir: str, max_batch: int = 16384):
+        self.lookup = CrosswalkLookup(lookup_dir)
+
+        self.latency = Histogram("lookup_request_seconds", LATENCY_BUCKETS)
+        self.batches = Histogram("lookup_batch_ids", BATCH_BUCKETS)
+
+        self.coalescer = Coalescer(self.lookup, self.batches, max_batch)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        server = await asyncio.start_server(self.handle, host, port)
+
+        print(f"Serving on http://{host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                start = time.perf_counter()
+
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(
+                        " ", 2
+                    )
+                except ValueError:
+                    await self.bad_request(writer, "Malformed request line.")
+                    break
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n"):
+                    if not line:
+                        return
+
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self.bad_request(writer, "Malformed Content-Length.")
+                    break
+
+                body = await reader.readexactly(length)
+
+                route, status, content_type, payload = await self.respond(
+                    method, path, body
+                )
+
+                await self.write(writer, status, content_type, payload)
+
+                self.latency.observe(route, time.perf_counter() - start)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def write(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        content_type: str,
+        payload: bytes,
+        close: bool = False,
+    ):
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                + ("Connection: close\r\n" if close else "")
+                + "\r\n"
+            ).encode("latin-1")
+            + payload
+        )
+        await writer.drain()
+
+    async def bad_request(self, writer: asyncio.StreamWriter, error: str):
+        """Answer a request that can't be parsed, after which the connection
+        is closed since where the next request starts is unknown."""
+
+        await self.write(writer, 400, *self.json({"error": error}), close=True)
+
+    async def respond(
+        self, method: str, path: str, body: bytes
+    ) -> Tuple[str, int, str, bytes]:
+        parts = path.split("?")[0].strip("/").split("/")
+
+        try:
+            if method == "GET" and parts[0] == "translate" and len(parts) == 5:
+                _, level, source, target, id = parts
+                (matches,) = await self.coalescer.translate(
+                    level, source, target, [id]
+                )
+
+                return "single", 200, *self.json({"id": id, target: matches})
+
+            if method == "POST" and parts == ["translate"]:
+                return "batch", 200, *self.json(await self.translate(body))
+
+            if method == "GET" and parts == ["metrics"]:
+                return "metrics", 200, "text/plain", self.metrics()
+
+            if method == "GET" and parts == ["health"]:
+                return "health", 200, *self.json({"status": "ok"})
+        except (ValueError, KeyError, TypeError) as e:
+            return "error", 400, *self.json({"error": str(e)})
+
+        return "error", 404, *self.json({"error": "Not found."})
+
+    async def translate(self, body: bytes) -> Dict[str, List[Dict[str, object]]]:
+        request = json.loads(body)
+
+        source = request["source"]
+        ids = list(request["ids"])
+
+        levels = [request["level"]] if "level" in request else self.lookup.widths
+
+        mappings = [
+            (level, target)
+            for level in levels
+            for target in self.lookup.widths[level]
+            if source in self.lookup.widths[level]
+            and target != source
+            and target in request.get("targets", [target])
+        ]
+
+        if not mappings:
+            raise ValueError(f"There is nothing to translate {source} into.")
+
+        found = await asyncio.gather(
+            *[
+                self.coalescer.translate(level, source, target, ids)
+                for level, target in mappings
+            ]
+        )
+
+        results: List[Dict[str, object]] = [{"id": id} for id in ids]
+
+        for (_, target), matches in zip(mappings, found):
+            for result, match in zip(results, matches):
+                result.setdefault(target, []).extend(match)  # type: ignore
+
+        return {"results": results}
+
+    def metrics(self) -> bytes:
+        lines = self.latency.render() + self.batches.render()
+
+        return ("\n".join(lines) + "\n").encode()
+
+    @staticmethod
+    def json(data: object) -> Tuple[str, bytes]:
+        return "application/json", json.dumps(data).encode()
+
+
+if __name__ == "__main__":
+    host = "127.0.0.1"
+    port = 8080
+
+    service = LookupService(os.path.join("crosswalking", "lookup"))
+
+    asyncio.run(service.serve(host, port))
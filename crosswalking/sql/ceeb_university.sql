@@ -1,3 +1,10 @@
+SELECT
+    *,
+    -- the exact match key, shared with hd.sql
+    name_key: CASE WHEN name IS NOT NULL AND state IS NOT NULL
+        THEN hash(lower(name), state)
+    END
+FROM (
 SELECT
     ceeb: ceeb_code,
     ceeb_name: name,
@@ -78,3 +85,4 @@ regexp_matches(
     'Educational Talent Search'
   )
 )
+)
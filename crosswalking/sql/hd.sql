@@ -41,7 +41,8 @@ WITH a AS (
         fips: lpad(countycd::VARCHAR, 5, '0'),
         latitude: TRY_CAST(latitude AS DOUBLE),
         longitude: TRY_CAST(longitud AS DOUBLE)
-    FROM ipeds.hd
+    -- one row per institution, each column from its latest edition.
+    FROM ipeds.hd_current
     where sector != 0
 ),
 states AS (
@@ -50,7 +51,12 @@ states AS (
       state: name
     FROM geography.state
 )
-SELECT DISTINCT arg_max(columns(*), edition) OVER (PARTITION BY ipeds)
+SELECT
+    *,
+    -- the exact match key, shared with ceeb_university.sql
+    name_key: CASE WHEN name IS NOT NULL AND state IS NOT NULL
+        THEN hash(lower(name), state)
+    END
 FROM a
 LEFT JOIN states USING (state_abbr)
 ORDER BY ipeds
@@ -3,12 +3,16 @@ WITH public AS (
         * RENAME(ncessch AS nces), 
         public_private: 'public'
     FROM nces.public
+    -- only schools still open in the latest edition are matched. The older
+    -- editions only date the links, in school_intervals.sql.
+    WHERE edition = (SELECT max(edition) FROM nces.public)
 ), private AS (
     SELECT 
         * EXCLUDE(ppin), 
         nces: '0000' || ppin, 
         public_private: 'private'
     FROM nces.private
+    WHERE edition = (SELECT max(edition) FROM nces.private)
 ),
 nces_nation AS (
     SELECT 
@@ -1,30 +1,51 @@
-SELECT 
-    ceeb,
-    nces,
-    state_school_id,
-    ceeb_name,
-    nces_name,
-    low_grade,
-    high_grade,
-    address: coalesce(ceeb_address, nces_address),
-    city: coalesce(ceeb_city, nces_city),
-    state_abbr: coalesce(ceeb.state_abbr, nces.state_abbr),
-    zip: coalesce(ceeb.zip, nces.zip),
-    fips,
-    latitude: coalesce(ceeb.latitude, nces.latitude),
-    longitude: coalesce(ceeb.longitude, nces.longitude),
-    public_private,
-    congressional_district,
-    cbsa,
-    state_legislature_lower,
-    state_legislature_upper
-FROM (
-  FROM cb_match 
-  UNION ALL BY NAME (
-    SELECT ceeb, nces
-    FROM unique_exact_matches
+WITH matches AS (
+  SELECT 
+      ceeb,
+      nces,
+      state_school_id,
+      ceeb_name,
+      nces_name,
+      low_grade,
+      high_grade,
+      address: coalesce(ceeb_address, nces_address),
+      city: coalesce(ceeb_city, nces_city),
+      state_abbr: coalesce(ceeb.state_abbr, nces.state_abbr),
+      zip: coalesce(ceeb.zip, nces.zip),
+      fips,
+      latitude: coalesce(ceeb.latitude, nces.latitude),
+      longitude: coalesce(ceeb.longitude, nces.longitude),
+      public_private,
+      congressional_district,
+      cbsa,
+      state_legislature_lower,
+      state_legislature_upper
+  FROM (
+    FROM cb_match 
+    UNION ALL BY NAME (
+      SELECT ceeb, nces
+      FROM unique_exact_matches
+    )
+    UNION ALL BY NAME (
+      SELECT ceeb, nces
+      FROM fuzzy_matches
+    )
+    UNION ALL BY NAME (
+      SELECT ceeb, nces
+      FROM spatial_matches
+    )
+    UNION ALL BY NAME (
+      SELECT ceeb, nces
+      FROM seed_matches
+    )
   )
+  LEFT JOIN ceeb USING (ceeb)
+  LEFT JOIN nces USING (nces)
 )
-LEFT JOIN ceeb USING (ceeb)
-LEFT JOIN nces USING (nces)
+SELECT 
+    matches.*,
+    lea,
+    county_geoid,
+    zcta
+FROM matches
+LEFT JOIN school_geography USING (state_abbr, latitude, longitude)
 ORDER BY ceeb
@@ -0,0 +1,37 @@
+WITH nces_editions AS (
+    SELECT nces: ncessch, edition FROM nces.public
+    UNION ALL
+    SELECT nces: '0000' || ppin, edition FROM nces.private
+),
+editions AS (
+    SELECT 
+        first_edition: min(edition), 
+        last_edition: max(edition)
+    FROM nces_editions
+),
+nces AS (
+    SELECT 
+        nces,
+        first_edition: min(edition),
+        last_edition: max(edition)
+    FROM nces_editions
+    GROUP BY nces
+)
+SELECT 
+    ceeb,
+    nces,
+    state_school_id,
+    nces.first_edition,
+    nces.last_edition,
+    -- a school in the first or last edition loaded may have been open before
+    -- or after it, so those ends are left open.
+    valid_from: CASE WHEN nces.first_edition > editions.first_edition 
+        THEN nces.first_edition 
+    END,
+    valid_to: CASE WHEN nces.last_edition < editions.last_edition 
+        THEN nces.last_edition 
+    END
+FROM schools.crosswalk
+LEFT JOIN nces USING (nces)
+CROSS JOIN editions
+ORDER BY nces, ceeb
@@ -0,0 +1,34 @@
+WITH editions AS (
+    SELECT 
+        first_edition: min(edition), 
+        last_edition: max(edition)
+    FROM ipeds.hd_history
+),
+ipeds AS (
+    SELECT 
+        ipeds: unitid::VARCHAR,
+        first_edition: min(edition),
+        last_edition: max(edition)
+    FROM ipeds.hd_history
+    GROUP BY unitid
+)
+SELECT 
+    ceeb,
+    ipeds,
+    nsc,
+    nsc_full,
+    method,
+    ipeds.first_edition,
+    ipeds.last_edition,
+    -- an institution in the first or last edition loaded may have been open
+    -- before or after it, so those ends are left open.
+    valid_from: CASE WHEN ipeds.first_edition > editions.first_edition 
+        THEN ipeds.first_edition 
+    END,
+    valid_to: CASE WHEN ipeds.last_edition < editions.last_edition 
+        THEN ipeds.last_edition 
+    END
+FROM universities.university_crosswalk
+LEFT JOIN ipeds USING (ipeds)
+CROSS JOIN editions
+ORDER BY ipeds, ceeb
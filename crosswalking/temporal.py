@@ -0,0 +1,178 @@
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from utils.duckdb import DuckDB
+from utils.interval_index import IntervalIndex
+
+
+class TemporalCrosswalk:
+    """
+    The crosswalks with the years each link is valid for.
+
+    A university link is valid while its IPEDS institution appears in the HD
+    editions and a school link while its NCES school appears in the NCES
+    editions. Records from a given year can then be resolved as of that year,
+    including institutions and schools that have since closed.
+    """
+
+    def __init__(
+        self,
+        duck: DuckDB,
+        clean_data_dir: str,
+        crosswalk_dir: str,
+        crosswalk_sql_dir: str,
+    ):
+        self.duck = duck
+
+        # the required SQL files
+        self.sql_file_names = ["university_intervals", "school_intervals"]
+        self.sql_files = [
+            os.path.join(crosswalk_sql_dir, file + ".sql")
+            for file in self.sql_file_names
+        ]
+
+        # the tables to be created.
+        self.table_names = ["university_intervals", "school_intervals"]
+
+        # the required DuckDB files, the sources and the built crosswalks.
+        self.db_paths = [
+            os.path.join(clean_data_dir, db + ".duckdb")
+            for db in ["ipeds", "nces"]
+        ] + [
+            os.path.join(crosswalk_dir, db + ".duckdb")
+            for db in ["universities", "schools"]
+        ]
+
+        # the interval indexes, by table and key column.
+        self.indexes: Dict[Tuple[str, str], IntervalIndex] = {}
+        self.intervals: Dict[Tuple[str, str], pa.Table] = {}
+
+    def process(self):
+        print("Initialization...")
+        self.attach_dbs()
+
+        print("Building Intervals...")
+        self.create_interval_tables()
+
+    def attach_dbs(self):
+        for path in self.db_paths:
+            self.duck.attach_db(path, read_only=True)
+
+    def create_interval_tables(self):
+        for file, name in zip(self.sql_files, self.table_names):
+            self.duck.create_table_file(name, file)
+
+        self.indexes.clear()
+        self.intervals.clear()
+
+    def interval_index(self, table: str, key: str) -> IntervalIndex:
+        """The interval index of a table by one of its ID columns.
+
+        It is built on first use and reused after that.
+
+        Args:
+            table (str): "university_intervals" or "school_intervals".
+            key (str): The ID column, such as "ipeds" or "ceeb".
+
+        Returns:
+            IntervalIndex: The index, whose positions refer to
+                `self.intervals[(table, key)]`.
+        """
+
+        if (table, key) not in self.indexes:
+            intervals = self.duck.sql(
+                f"from {table} where {key} is not null"
+            ).fetch_arrow_table()
+
+            self.indexes[(table, key)] = IntervalIndex(
+                intervals[key],
+                intervals["valid_from"].to_numpy(zero_copy_only=False),
+                intervals["valid_to"].to_numpy(zero_copy_only=False),
+            )
+            self.intervals[(table, key)] = intervals
+
+        return self.indexes[(table, key)]
+
+    def as_of(
+        self,
+        input_table: str,
+        output_table: str,
+        table: str,
+        key: str,
+        year: str = "year",
+    ):
+        """Resolve a table of (ID, year) records as of each year.
+
+        Every record is kept. A record whose ID isn't valid in its year gets
+        missing links, and one with several valid links appears once for
+        each.
+
+        Args:
+            input_table (str): The records, with an ID and a year column.
+            output_table (str): The table to be created.
+            table (str): "university_intervals" or "school_intervals".
+            key (str): The ID column, named as in `table`.
+            year (str, optional): The year column. Defaults to "year".
+        """
+
+        index = self.interval_index(table, key)
+        intervals = self.intervals[(table, key)]
+
+        records = self.duck.sql(f"from {input_table}").fetch_arrow_table()
+
+        query, row = index.lookup(
+            records[key],
+            records[year].to_numpy(zero_copy_only=False),
+        )
+
+        # records without a valid link take a missing row.
+        matched = np.zeros(records.num_rows, dtype=bool)
+        matched[query] = True
+        unmatched = np.flatnonzero(~matched)
+
+        position = np.concatenate([query, unmatched])
+        order = np.argsort(position, kind="stable")
+
+        rows = pa.array(
+            np.concatenate([row, np.zeros(len(unmatched), dtype=np.int64)]),
+            mask=np.concatenate(
+                [np.zeros(len(row), bool), np.ones(len(unmatched), bool)]
+            ),
+        ).take(pa.array(order))
+
+        resolved = records.take(pa.array(position[order]))
+
+        for name in intervals.column_names:
+            if name not in records.column_names:
+                resolved = resolved.append_column(
+                    name, intervals[name].take(rows)
+                )
+
+        self.duck.create_table_arrow(output_table, resolved)
+
+
+if __name__ == "__main__":
+    with DuckDB(os.path.join("crosswalking", "temporal.duckdb")) as duck:
+        temporal = TemporalCrosswalk(
+            duck=duck,
+            clean_data_dir="clean-data",
+            crosswalk_dir="crosswalking",
+            crosswalk_sql_dir=os.path.join("crosswalking", "sql"),
+        )
+
+        temporal.process()
+
+        print(
+            duck.sql(
+                "select link: 'university', count(*), "
+                "closed: count(*) filter(valid_to is not null) "
+                "from university_intervals "
+                "union all "
+                "select link: 'school', count(*), "
+                "closed: count(*) filter(valid_to is not null) "
+                "from school_intervals"
+            )
+        )
@@ -0,0 +1,425 @@
+import json
+import os
+import re
+import unicodedata
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+# only building needs DuckDB and the crosswalks, so searching doesn't import
+# them.
+if TYPE_CHECKING:
+    from utils.duckdb import DuckDB
+
+# unlike the FTS tokens, numbers are kept since they tell schools apart.
+TOKEN_SEPARATOR = re.compile(r"[^a-z0-9]+")
+
+# the tables made by the crosswalk SQL files, as (ID, name, display name,
+# city, state).
+SOURCES = {
+    "ceeb": "select ceeb, name, ceeb_name, ceeb_city, state_abbr from ceeb",
+    "nces": "select nces, name, nces_name, nces_city, state_abbr from nces",
+    "ipeds": "select ipeds, name, ipeds_name, city, state_abbr from ipeds_hd",
+}
+
+ARRAYS = [
+    "tokens",
+    "token_offsets",
+    "postings",
+    "dense_ranges",
+    "bitmaps",
+    "lead_tokens",
+    "sources",
+    "ids",
+    "state_codes",
+    "states",
+    "city_codes",
+    "cities",
+    "text",
+    "text_offsets",
+]
+
+
+def tokenize(text: str | None) -> List[str]:
+    if text is None:
+        return []
+
+    stripped = "".join(
+        c
+        for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
+
+    return [t for t in TOKEN_SEPARATOR.split(stripped.lower()) if t]
+
+
+def build_typeahead(duck: "DuckDB", output_dir: str):
+    """Build the typeahead index from the crosswalk tables.
+
+    Every record is indexed by the words of both its normalized name and its
+    original name, so "st" and "saint" both find it. Records are stored in
+    their static rank, names with fewer words first, so earlier records win
+    ties.
+
+    The words are sorted, so any prefix is a range of them and of their
+    postings. Ranges holding at least 1/32 of the records, which are the short
+    prefixes and the common words, are also stored as bitmaps, which are then
+    no bigger than their postings.
+
+    The `ceeb`, `nces`, and `ipeds_hd` tables need to exist, as created by
+    `SchoolCrosswalk.create_school_tables` and
+    `UniversityCrosswalk.create_university_tables`.
+
+    Args:
+        duck (DuckDB): A DuckDB object.
+        output_dir (str): The directory for the index.
+    """
+
+    records = []
+
+    for code, (source, query) in enumerate(SOURCES.items()):
+        for id, name, display, city, state in duck.sql(
+            f"{query} where {source} is not null"
+        ).fetchall():
+            name_tokens = tokenize(name) or tokenize(display)
+
+            if not name_tokens:
+                continue
+
+            records.append(
+                (
+                    len(name_tokens),
+                    len(display or name),
+                    code,
+                    str(id),
+                    display or name,
+                    city or "",
+                    state or "",
+                    name_tokens[0],
+                    sorted(set(name_tokens + tokenize(display))),
+                )
+            )
+
+    records.sort(key=lambda r: r[:4])
+
+    vocabulary = sorted({t for r in records for t in r[8]})
+    token_id = {t: i for i, t in enumerate(vocabulary)}
+    tokens = np.array([t.encode() for t in vocabulary], dtype=bytes)
+
+    record_tokens = [token_id[t] for r in records for t in r[8]]
+    token_record = np.repeat(
+        np.arange(len(records)), [len(r[8]) for r in records]
+    )
+
+    order = np.lexsort((token_record, record_tokens))
+    postings = token_record[order].astype(np.int32)
+    offsets = np.cumsum(
+        np.append(0, np.bincount(record_tokens, minlength=len(vocabulary)))
+    )
+
+    # the token range of every prefix of every word, and of every word alone.
+    prefixes = np.array(
+        sorted({t[:i] for t in tokens for i in range(1, len(t) + 1)}),
+        dtype=bytes,
+    )
+    ranges = np.unique(
+        np.concatenate(
+            [
+                np.stack(
+                    [
+                        tokens.searchsorted(prefixes, "left"),
+                        tokens.searchsorted(prefixes + b"\xff", "right"),
+                    ],
+                    axis=1,
+                ),
+                np.stack(
+                    [np.arange(len(tokens)), np.arange(len(tokens)) + 1],
+                    axis=1,
+                ),
+            ]
+        ),
+        axis=0,
+    )
+
+    dense = ranges[
+        offsets[ranges[:, 1]] - offsets[ranges[:, 0]] >= len(records) / 32
+    ]
+
+    bitmaps = np.zeros((len(dense), (len(records) + 7) // 8), dtype=np.uint8)
+
+    for i, (low, high) in enumerate(dense):
+        mask = np.zeros(len(records), dtype=bool)
+        mask[postings[offsets[low] : offsets[high]]] = True
+        bitmaps[i] = np.packbits(mask)
+
+    states = sorted({r[6] for r in records})
+    state_code = {s: i for i, s in enumerate(states)}
+
+    cities = sorted({r[5].lower() for r in records if r[5]})
+    city_code = {c: i for i, c in enumerate(cities)}
+
+    text = [s.encode() for r in records for s in (r[4], r[5])]
+
+    arrays = {
+        "tokens": tokens,
+        "token_offsets": offsets.astype(np.int64),
+        "postings": postings,
+        "dense_ranges": (dense[:, 0] * (len(tokens) + 1) + dense[:, 1]).astype(
+            np.int64
+        ),
+        "bitmaps": bitmaps,
+        "lead_tokens": np.array([token_id[r[7]] for r in records], np.int32),
+        "sources": np.array([r[2] for r in records], dtype=np.uint8),
+        "ids": np.array([r[3].encode() for r in records], dtype=bytes),
+        "state_codes": np.array(
+            [state_code[r[6]] for r in records], dtype=np.uint8
+        ),
+        "states": np.array([s.encode() for s in states], dtype=bytes),
+        "city_codes": np.array(
+            [city_code.get(r[5].lower(), -1) for r in records], dtype=np.int32
+        ),
+        "cities": np.array([c.encode() for c in cities], dtype=bytes),
+        "text": np.frombuffer(b"".join(text), dtype=np.uint8),
+        "text_offsets": np.cumsum([0] + [len(t) for t in text]).astype(
+            np.int64
+        ),
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, name + ".npy"), array)
+
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump({"sources": list(SOURCES), "records": len(records)}, f)
+
+
+class Typeahead:
+    """
+    Ranked name search over the memory-mapped typeahead index.
+
+    Every word of the query matches by prefix, so a partly typed name already
+    finds its records, and a record has to match all of them. Each word's
+    records are a mask over every record, unpacked from a bitmap for common
+    prefixes or set from a short run of postings otherwise, so a query costs
+    a few passes over contiguous arrays however many records match.
+
+    Records with more exactly matched words rank first, then those whose
+    name starts with the first word, then the static rank.
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Args:
+            index_dir (str): The directory written by `build_typeahead`.
+        """
+
+        with open(os.path.join(index_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        self.sources: List[str] = manifest["sources"]
+        self.size: int = manifest["records"]
+
+        arrays = {
+            name: np.load(
+                os.path.join(index_dir, name + ".npy"), mmap_mode="r"
+            ).view(np.ndarray)
+            for name in ARRAYS
+        }
+
+        self.tokens = arrays["tokens"]
+        self.token_offsets = arrays["token_offsets"]
+        self.postings = arrays["postings"]
+        self.dense_ranges = arrays["dense_ranges"]
+        self.bitmaps = arrays["bitmaps"]
+        self.lead_tokens = arrays["lead_tokens"]
+        self.source_codes = arrays["sources"]
+        self.ids = arrays["ids"]
+        self.state_codes = arrays["state_codes"]
+        self.states = arrays["states"]
+        self.city_codes = arrays["city_codes"]
+        self.cities = arrays["cities"]
+        self.text = arrays["text"]
+        self.text_offsets = arrays["text_offsets"]
+
+    def token_range(self, token: str, prefix: bool = True):
+        encoded = token.encode()
+        end = encoded + b"\xff" if prefix else encoded
+
+        return (
+            int(self.tokens.searchsorted(encoded, "left")),
+            int(self.tokens.searchsorted(end, "right")),
+        )
+
+    def members(self, low: int, high: int) -> np.ndarray:
+        """Whether each record has one of the tokens from `low` up to `high`."""
+
+        key = low * (len(self.tokens) + 1) + high
+        dense = int(self.dense_ranges.searchsorted(key))
+
+        if dense < len(self.dense_ranges) and self.dense_ranges[dense] == key:
+            return np.unpackbits(self.bitmaps[dense], count=self.size).view(
+                bool
+            )
+
+        mask = np.zeros(self.size, dtype=bool)
+        mask[
+            self.postings[self.token_offsets[low] : self.token_offsets[high]]
+        ] = True
+
+        return mask
+
+    @staticmethod
+    def code(dictionary: np.ndarray, value: str) -> int:
+        """The position of `value` in a sorted dictionary, or -1."""
+
+        encoded = value.encode()
+        position = int(dictionary.searchsorted(encoded))
+
+        if position < len(dictionary) and dictionary[position] == encoded:
+            return position
+
+        return -1
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        state: str | None = None,
+        city: str | None = None,
+        sources: List[str] | None = None,
+    ) -> List[Dict[str, str]]:
+        """Find the best matching records for a partly typed name.
+
+        Args:
+            query (str): The name so far.
+            k (int, optional): Records to return. Defaults to 10.
+            state (str | None, optional): Only this state abbreviation.
+                Defaults to None.
+            city (str | None, optional): Only this city. Defaults to None.
+            sources (List[str] | None, optional): Only these ID types, such as
+                ["nces"]. Defaults to all of them.
+
+        Returns:
+            List[Dict[str, str]]: The source, ID, name, city, and state of
+                each record, best first.
+        """
+
+        # the scores are int8, which holds up to 62 words.
+        words = list(dict.fromkeys(tokenize(query)))[:62]
+
+        if not words:
+            return []
+
+        ranges = [self.token_range(w) for w in words]
+
+        if any(low == high for low, high in ranges):
+            return []
+
+        # unmatched records end with a score of 0 and the rest from 1 up,
+        # all in place, since numpy is much slower mixing types.
+        matched = np.ones(self.size, dtype=bool)
+        score = np.ones(self.size, dtype=np.int8)
+
+        for word, (low, high) in zip(words, ranges):
+            matched &= self.members(low, high)
+
+            exact = self.token_range(word, prefix=False)
+
+            # when the word is a whole token and nothing longer, every match
+            # is exact, which changes no ranks.
+            if exact[0] < exact[1] and exact != (low, high):
+                exact_matched = self.members(*exact).view(np.int8)
+                score += exact_matched
+                score += exact_matched
+
+        if state is not None:
+            matched &= self.state_codes == self.code(
+                self.states, state.upper()
+            )
+
+        if city is not None:
+            matched &= self.city_codes == self.code(self.cities, city.lower())
+
+        if sources is not None:
+            allowed = np.zeros(self.size, dtype=bool)
+
+            for source in sources:
+                allowed |= self.source_codes == self.sources.index(source)
+
+            matched &= allowed
+
+        low, high = ranges[0]
+        score += ((self.lead_tokens >= low) & (self.lead_tokens < high)).view(
+            np.int8
+        )
+        score *= matched.view(np.int8)
+
+        best: List[int] = []
+
+        for tier in range(int(score.max()), 0, -1):
+            best += self.first(score == tier, k - len(best))
+
+            if len(best) == k:
+                break
+
+        return [self.record(r) for r in best]
+
+    @staticmethod
+    def first(mask: np.ndarray, n: int) -> List[int]:
+        """The first `n` positions of a mask.
+
+        Only as much of the mask is read as should hold `n` of them, going by
+        how dense it is, since listing every position is the slow part.
+        """
+
+        count = int(np.count_nonzero(mask))
+
+        if count == 0:
+            return []
+
+        end = len(mask) if count <= n else 2 * n * len(mask) // count + 64
+
+        while True:
+            found = np.flatnonzero(mask[:end])
+
+            if len(found) >= n or end >= len(mask):
+                return found[:n].tolist()
+
+            end *= 2
+
+    def record(self, position: int) -> Dict[str, str]:
+        def text(i: int) -> str:
+            return bytes(
+                self.text[self.text_offsets[i] : self.text_offsets[i + 1]]
+            ).decode()
+
+        return {
+            "source": self.sources[self.source_codes[position]],
+            "id": self.ids[position].decode(),
+            "name": text(2 * position),
+            "city": text(2 * position + 1),
+            "state": self.states[self.state_codes[position]].decode(),
+        }
+
+
+if __name__ == "__main__":
+    from crosswalking.schools import SchoolCrosswalk
+    from crosswalking.universities import UniversityCrosswalk
+    from utils.duckdb import DuckDB
+
+    index_dir = os.path.join("crosswalking", "typeahead")
+    sql_dir = os.path.join("crosswalking", "sql")
+
+    with DuckDB() as duck:
+        school = SchoolCrosswalk(duck, "clean-data", sql_dir)
+        school.attach_dbs()
+        school.create_school_tables()
+
+        university = UniversityCrosswalk(duck, "clean-data", sql_dir)
+        university.attach_dbs()
+        university.create_university_tables()
+
+        build_typeahead(duck, index_dir)
+
+    print(Typeahead(index_dir).search("lincoln high", state="NE"))
@@ -1,12 +1,17 @@
+import argparse
 import os
-from typing import Any, List
 
-import duckdb
-import Levenshtein
+import numpy as np
 import polars as pl
-from thefuzz import fuzz  # type: ignore
+import pyarrow as pa
+import pyarrow.compute as pc
+from rapidfuzz import fuzz
+from rapidfuzz.distance import Indel
+from rapidfuzz.utils import default_process
 
 from utils.duckdb import DuckDB
+from utils.similarity import ascii_only, pairwise_similarity
+from utils.text_index import TextIndex
 
 
 class UniversityCrosswalk:
@@ -40,7 +45,14 @@ class UniversityCrosswalk:
             for db in self.db_names
         ]
 
-    def process(self):
+    def process(self, use_fts: bool = False):
+        """Build the crosswalk.
+
+        Args:
+            use_fts (bool, optional): Search with the DuckDB FTS index instead
+                of the in-memory `TextIndex`. Defaults to False.
+        """
+
         print("Initialization...")
         self.attach_dbs()
         self.create_university_tables()
@@ -55,8 +67,11 @@ class UniversityCrosswalk:
         self.create_non_exact_multicampus()
 
         print("Searching Index...")
-        self.build_index()
-        self.iterate_searching()
+        if use_fts:
+            self.build_index()
+            self.batch_searching()
+        else:
+            self.sparse_searching()
         self.fuzzy_distance()
 
         print("Writing Crosswalk")
@@ -64,93 +79,265 @@ class UniversityCrosswalk:
 
     def attach_dbs(self):
         for path in self.db_paths:
-            self.duck.attach_db(path)
+            self.duck.attach_db(path, read_only=True)
 
     def create_university_tables(self):
         for file, name in zip(self.sql_files, self.table_names):
             self.duck.create_table_file(name, file)
 
     def build_index(self):
-        self.duck.create_fts_index(
-            input_table="non_exact_multicampus",
-            input_id="ipeds",
-            input_values=["name", "city"],
-            stemmer="none",
-            stopwords="none",
-            overwrite=1,
+        """
+        Build one FTS index per state over `non_exact_multicampus`.
+
+        Each state's names and cities go into their own table, such as
+        `fts_tx`, with the index `fts_main_fts_tx`. Records without a state
+        go into `fts_no_state`, which is never searched but still counts
+        toward the term statistics. A fingerprint of every state's rows is
+        kept in `fts_state_index`, so the indexes persist in the database
+        file and only the states whose rows changed since the last run are
+        rebuilt. Indexes of states that no longer have any rows are dropped.
+        """
+
+        self.duck.execute(
+            "CREATE TABLE IF NOT EXISTS fts_state_index "
+            "(state VARCHAR, table_name VARCHAR, fingerprint UBIGINT)"
         )
 
-    def search_index(
-        self,
-        search_string: str,
-        search_state: str,
-        search_ceeb: str,
-        limit: int = 5,
-    ) -> pl.DataFrame:
-        sql = (
-            "SELECT * "
-            "FROM ("
-            "    SELECT "
-            "        *, "
-            "        fts_main_non_exact_multicampus.match_bm25("
-            "            ipeds, "
-            "            $search_string"
-            "        ) AS match_score "
-            # "    FROM ipeds_hd"
-            "    FROM non_exact_multicampus"
-            ")"
-            "WHERE match_score IS NOT NULL "
-            "AND lower(state) = lower($search_state)"
-            "ORDER BY match_score DESC "
-            "LIMIT $limit"
+        self.duck.create_table_query(
+            "fts_state_index_current",
+            (
+                "select\n"
+                "    state,\n"
+                "    table_name: 'fts_' || if(\n"
+                "        state is null, 'no_state', lower(any_value(state_abbr))\n"
+                "    ),\n"
+                "    fingerprint: bit_xor(hash(ipeds, name, city))\n"
+                "from non_exact_multicampus\n"
+                "group by state"
+            ),
         )
 
-        params: dict[str, str | int] = {
-            "search_string": search_string,
-            "search_state": search_state,
-            "limit": limit,
-        }
-
-        search_results = (
-            self.duck.sql(sql, params=params)
-            .pl()
-            .with_columns(
-                search_name=pl.lit(search_string),
-                search_state=pl.lit(search_state),
-                ceeb=pl.lit(search_ceeb),
+        removed = self.duck.sql(
+            "select table_name from fts_state_index "
+            "anti join fts_state_index_current using (table_name)"
+        ).fetchall()
+
+        for (table_name,) in removed:
+            self.duck.execute(f"PRAGMA drop_fts_index({table_name})")
+            self.duck.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+        # the table name stands in for the state, which can be null.
+        changed = self.duck.sql(
+            "select state, table_name from fts_state_index_current "
+            "anti join fts_state_index using (table_name, fingerprint) "
+            "order by table_name"
+        ).fetchall()
+
+        for state, table_name in changed:
+            self.duck.execute(
+                f"CREATE OR REPLACE TABLE {table_name} AS ("
+                "select ipeds, name, city from non_exact_multicampus "
+                "where state is not distinct from $state)",
+                parameters={"state": state},
             )
+
+            self.duck.create_fts_index(
+                input_table=table_name,
+                input_id="ipeds",
+                input_values=["name", "city"],
+                stemmer="none",
+                stopwords="none",
+                overwrite=1,
+            )
+
+        self.duck.create_table_query(
+            "fts_state_index", "from fts_state_index_current"
         )
 
-        return search_results
-
-    def iterate_searching(self):
-        result: List[pl.DataFrame] = []
-
-        for row in self.realize_non_exact_ceeb().iter_rows(named=True):
-            result.append(
-                self.search_index(
-                    search_string=row["name"],
-                    search_state=row["state"],
-                    search_ceeb=row["ceeb"],
-                    limit=10,
-                ).select(
-                    "match_score",
-                    "ceeb",
-                    "search_name",
-                    "ipeds",
-                    "name",
-                    "city",
-                    "state",
-                    "edition",
-                )
+        print(f"Rebuilt {len(changed)} of the state indexes.")
+
+    def batch_searching(self, limit: int = 10, k: float = 1.2, b: float = 0.75):
+        """
+        Search the state indexes for every non-exact CEEB record in one query.
+
+        This scores the same BM25 as `match_bm25`, but as a join of every
+        query's terms against the tables of its state's index instead of one
+        full scan of an index per CEEB record. Each CEEB record only touches
+        its own state's index, only documents that share a term with the
+        query are scored, and the top `limit` are kept for each CEEB record.
+
+        The document frequencies, document count and average length are
+        summed over every state's index, so the scores are the same as one
+        index over all of `non_exact_multicampus`, which the `fuzzy_distance`
+        thresholds were tuned on.
+
+        Args:
+            limit (int, optional): Results per CEEB record. Defaults to 10.
+            k (float, optional): BM25 term frequency saturation. Defaults to
+                1.2, the same as `match_bm25`.
+            b (float, optional): BM25 length normalization. Defaults to 0.75,
+                the same as `match_bm25`.
+        """
+
+        def state_scores(state: str, table_name: str):
+            fts = f"fts_main_{table_name}"
+            search_state = state.lower().replace("'", "''")
+
+            return (
+                "select query, ipeds, match_score: sum(idf * weight)\n"
+                "from (\n"
+                "    select distinct\n"
+                "        query,\n"
+                "        termid,\n"
+                "        idf: log(\n"
+                "            (stats.num_docs - g.df + 0.5) / (g.df + 0.5) + 1\n"
+                "        )\n"
+                "    from (\n"
+                "        select\n"
+                "            query,\n"
+                f"            term: stem(unnest({fts}.tokenize(search_name)), 'none')\n"
+                "        from queries\n"
+                f"        where search_state = '{search_state}'\n"
+                "    )\n"
+                f"    inner join {fts}.dict using (term)\n"
+                "    inner join global_dict g using (term)\n"
+                "    cross join global_stats stats\n"
+                ") query_terms\n"
+                "inner join (\n"
+                # the saturated term frequency of each document.
+                "    select\n"
+                "        termid,\n"
+                "        ipeds: docs.name,\n"
+                "        weight: (tf * ($k + 1))\n"
+                "            / (tf + $k * (1 - $b + $b * (docs.len / stats.avgdl)))\n"
+                "    from (\n"
+                "        select docid, termid, tf: count(*)\n"
+                f"        from {fts}.terms\n"
+                "        group by docid, termid\n"
+                "    )\n"
+                f"    inner join {fts}.docs docs using (docid)\n"
+                "    cross join global_stats stats\n"
+                ") doc_terms using (termid)\n"
+                "group by query, ipeds"
             )
 
-        self.bm25_matches = (
-            pl.concat(result).sort("match_score", descending=True).sort("name")
+        indexes = self.duck.sql(
+            "select state, table_name from fts_state_index order by table_name"
+        ).fetchall()
+
+        global_dict = "\n    union all\n".join(
+            f"    select term, df from fts_main_{table_name}.dict"
+            for _, table_name in indexes
+        )
+
+        global_stats = "\n    union all\n".join(
+            f"    select num_docs, avgdl from fts_main_{table_name}.stats"
+            for _, table_name in indexes
+        )
+
+        # records without a state are only in the statistics.
+        scores = "\nunion all\n".join(
+            state_scores(state, table_name)
+            for state, table_name in indexes
+            if state is not None
+        )
+
+        sql = (
+            "with\n"
+            "  queries as (\n"
+            "    select\n"
+            "        query: row_number() over (),\n"
+            "        ceeb,\n"
+            "        search_name: name,\n"
+            "        search_state: lower(state)\n"
+            "    from non_exact_ceeb\n"
+            "  ),\n"
+            "  global_dict as (\n"
+            f"    select term, df: sum(df) from (\n{global_dict}\n    )\n"
+            "    group by term\n"
+            "  ),\n"
+            "  global_stats as (\n"
+            "    select\n"
+            "        num_docs: sum(num_docs),\n"
+            "        avgdl: sum(num_docs * avgdl) / sum(num_docs)\n"
+            f"    from (\n{global_stats}\n    )\n"
+            "  ),\n"
+            f"  scores as (\n{scores}\n)\n"
+            "select\n"
+            "    match_score,\n"
+            "    ceeb,\n"
+            "    search_name,\n"
+            "    ipeds,\n"
+            "    name,\n"
+            "    city,\n"
+            "    state,\n"
+            "    edition\n"
+            "from scores\n"
+            "inner join queries using (query)\n"
+            "inner join non_exact_multicampus using (ipeds)\n"
+            "qualify row_number() over (\n"
+            "    partition by query order by match_score desc, ipeds\n"
+            ") <= $limit"
+        )
+
+        self.duck.execute(
+            f"CREATE OR REPLACE TABLE bm25_matches AS ({sql})",
+            parameters={"limit": limit, "k": k, "b": b},
+        )
+
+        self.bm25_matches = self.duck.table("bm25_matches")
+
+    def sparse_searching(self, limit: int = 10):
+        """
+        Search the IPEDS names for every non-exact CEEB record in memory.
+
+        The names and cities of `non_exact_multicampus` go into a `TextIndex`
+        partitioned by state, and all CEEB names are scored with one sparse
+        matrix product per state. The term statistics are taken over every
+        state, so the scores are the same BM25 as one FTS index over the whole
+        table, without building any index in the database.
+
+        Args:
+            limit (int, optional): Results per CEEB record. Defaults to 10.
+        """
+
+        docs = self.duck.sql(
+            "from non_exact_multicampus order by ipeds"
+        ).fetch_arrow_table()
+        queries = self.duck.table("non_exact_ceeb").fetch_arrow_table()
+
+        index = TextIndex(
+            [docs["name"].to_pylist(), docs["city"].to_pylist()],
+            partitions=pc.utf8_lower(docs["state"]).to_pylist(),
+        )
+
+        query, found, score = index.search(
+            queries["name"].to_pylist(),
+            partitions=pc.utf8_lower(queries["state"]).to_pylist(),
+            k=limit,
         )
 
+        self.duck.create_table_arrow(
+            "bm25_matches",
+            pa.table(
+                {
+                    "match_score": score,
+                    "ceeb": queries["ceeb"].take(query),
+                    "search_name": queries["name"].take(query),
+                    "ipeds": docs["ipeds"].take(found),
+                    "name": docs["name"].take(found),
+                    "city": docs["city"].take(found),
+                    "state": docs["state"].take(found),
+                    "edition": docs["edition"].take(found),
+                }
+            ),
+        )
+
+        self.bm25_matches = self.duck.table("bm25_matches")
+
     def find_exact_matches(self):
-        self.exact_matches = self.duck.sql(
+        self.duck.create_table_query(
+            "exact_matches",
             """
             select 
                 method: 'exact',
@@ -171,148 +358,153 @@ class UniversityCrosswalk:
                 longitude 
             from ipeds_hd a 
             inner join ceeb_university b 
-            on (lower(a.name) = lower(b.name) and a.state = b.state)
-            """
+            on a.name_key = b.name_key
+            -- so a collision of the hashes can't match.
+            and a.state = b.state
+            and lower(a.name) = lower(b.name)
+            """,
         )
 
-    def realize_exact_matches(self):
-        if not hasattr(self, "exact_matches_pl"):
-            self.exact_matches_pl = self.exact_matches.pl()
-
-        return self.exact_matches_pl
+        self.exact_matches = self.duck.table("exact_matches")
 
-    def exact_match_quality(self):
-        n_ipeds = len(self.duck.sql("from ipeds_hd").pl())
-        n_ceebs = len(self.duck.sql("from ceeb_university").pl())
-        n_exact = len(self.exact_matches.pl())
+    def exact_match_quality(self) -> float:
+        return self.duck.sql(
+            "select (from exact_matches select count(*)) / least("
+            "(from ipeds_hd select count(*)), "
+            "(from ceeb_university select count(*))"
+            ")"
+        ).fetchall()[0][0]
 
-        coverage = n_exact / min(n_ipeds, n_ceebs)
+    def find_non_exact_ceeb(self):
+        self.duck.create_table_query(
+            "non_exact_ceeb",
+            "from ceeb_university "
+            "anti join ("
+            "from exact_matches where multicampus or multicampus is null"
+            ") using (ceeb)",
+        )
 
-        return coverage
+        self.non_exact_ceeb = self.duck.table("non_exact_ceeb")
 
-    def find_non_exact_ceeb(self):
-        self.non_exact_ceeb = self.duck.table("ceeb_university").join(
-            self.exact_matches.filter("multicampus or multicampus is null"),
-            condition="ceeb",
-            how="anti",
+    def create_non_exact_multicampus(self):
+        self.duck.create_table_query(
+            "non_exact_multicampus",
+            "from ipeds_hd "
+            "anti join ("
+            "from exact_matches where multicampus or multicampus is null"
+            ") using (ipeds)",
         )
 
-    def realize_non_exact_ceeb(self) -> pl.DataFrame:
-        if not hasattr(self, "non_exact_ceeb_pl"):
-            self.non_exact_ceeb_pl = self.non_exact_ceeb.pl()
+    def name_city_combinations(self, data: pl.DataFrame, ascii: bool = False):
+        """
+        The four pairs of the two names with and without the city appended.
 
-        return self.non_exact_ceeb_pl
+        Args:
+            data (pl.DataFrame): The BM25 matches.
+            ascii (bool, optional): Drop the characters that `thefuzz` drops.
+                Defaults to False.
+        """
 
-    def create_non_exact_multicampus(self):
-        query = (
-            self.duck.table("ipeds_hd")
-            .join(
-                self.exact_matches.filter(
-                    "multicampus or multicampus is null"
-                ),
-                condition="ipeds",
-                how="anti",
-            )
-            .sql_query()
+        def clean(expr: pl.Expr) -> pl.Expr:
+            return ascii_only(expr) if ascii else expr
+
+        strings = data.select(
+            clean(pl.col("search_name")).alias("search_name"),
+            clean(pl.col("name")).alias("name"),
+            clean(pl.col("search_name") + " " + pl.col("city")).alias(
+                "search_name_city"
+            ),
+            clean(pl.col("name") + " " + pl.col("city")).alias("name_city"),
         )
 
-        self.duck.create_table_query("non_exact_multicampus", query)
+        search_name = strings["search_name"].to_list()
+        name = strings["name"].to_list()
+        search_name_city = strings["search_name_city"].to_list()
+        name_city = strings["name_city"].to_list()
 
-    def levenshtein_ratio(self, row: dict[str, Any]) -> float:
+        return [
+            (search_name, name),
+            (search_name, name_city),
+            (search_name_city, name),
+            (search_name_city, name_city),
+        ]
+
+    def levenshtein_ratio(self, data: pl.DataFrame) -> np.ndarray:
         """
         Levenshtein ratio by searching over the four combinations of the two
         names and appending or not appending the city, taking the maximum
         ratio.
+
+        Every row is scored at once across all cores. The ratio is the
+        normalized Indel similarity, which is what `Levenshtein.ratio` is.
         """
 
-        name_name = Levenshtein.ratio(row["search_name"], row["name"])
-        name_city = Levenshtein.ratio(row["search_name"], row["name_city"])
-        city_name = Levenshtein.ratio(row["search_name_city"], row["name"])
-        city_city = Levenshtein.ratio(
-            row["search_name_city"], row["name_city"]
-        )
+        scores = [
+            pairwise_similarity(left, right, scorer=Indel.normalized_similarity)
+            for left, right in self.name_city_combinations(data)
+        ]
 
-        return max(name_name, name_city, city_name, city_city)
+        return np.max(scores, axis=0, initial=0)
 
-    def fuzz_ratio(self, row: dict[str, Any]) -> float:
+    def fuzz_ratio(self, data: pl.DataFrame) -> np.ndarray:
         """
         Fuzz ratio by searching over the four combinations of the two
         names and appending or not appending the city, taking the maximum
         ratio.
-        """
-
-        name_name = fuzz.token_sort_ratio(  # type: ignore
-            row["search_name"], row["name"]
-        )
-        name_city = fuzz.token_sort_ratio(  # type: ignore
-            row["search_name"], row["name_city"]
-        )
-        city_name = fuzz.token_sort_ratio(  # type: ignore
-            row["search_name_city"], row["name"]
-        )
-        city_city = fuzz.token_sort_ratio(  # type: ignore
-            row["search_name_city"], row["name_city"]
-        )
 
-        return max(name_name, name_city, city_name, city_city) / 100
+        Every row is scored at once across all cores. The strings are
+        processed and the scores rounded the same way as
+        `thefuzz.fuzz.token_sort_ratio`.
+        """
 
-    def fuzzy_distance(self):
-        fuzzy_matches = (  # noqa: F841 # type: ignore
-            self.bm25_matches.with_columns(
-                search_name_city=pl.col("search_name") + " " + pl.col("city"),
-                name_city=pl.col("name") + " " + pl.col("city"),
-            )
-            .with_columns(
-                similarity_ratio=pl.struct(pl.all()).map_elements(
-                    self.levenshtein_ratio,
-                    return_dtype=pl.Float64,
-                ),
-                fuzz_ratio=pl.struct(pl.all()).map_elements(
-                    self.fuzz_ratio, return_dtype=pl.Float64
-                ),
-            )
-            .sort("similarity_ratio")
-            .drop("search_name_city", "name_city")
-            .filter(
-                (
-                    (pl.col("match_score") > 8)
-                    | (pl.col("similarity_ratio") > 0.9)
-                    | (pl.col("fuzz_ratio") > 0.95)
+        scores = [
+            np.round(
+                pairwise_similarity(
+                    left,
+                    right,
+                    scorer=fuzz.token_sort_ratio,
+                    processor=default_process,
                 )
-                & (pl.col("match_score") > 4)
             )
-            .sort(
-                by=["ipeds", "match_score", "similarity_ratio"],
-                descending=[False, True, True],
-            )
-            .group_by("ipeds")
-            .first()
-        )
+            for left, right in self.name_city_combinations(data, ascii=True)
+        ]
 
-        self.duck.execute(
-            "create or replace table fuzzy_matches as (from fuzzy_matches)"
+        return np.max(scores, axis=0, initial=0) / 100
+
+    def fuzzy_distance(self):
+        matches = self.bm25_matches.fetch_arrow_table()
+        data = pl.from_arrow(matches)
+
+        scored = matches.append_column(
+            "similarity_ratio", pa.array(self.levenshtein_ratio(data))
+        ).append_column("fuzz_ratio", pa.array(self.fuzz_ratio(data)))
+
+        # keep the best candidate for each IPEDS record.
+        self.duck.create_table_arrow(
+            "fuzzy_matches",
+            scored,
+            query=(
+                "from {data}\n"
+                "where (\n"
+                "    match_score > 8\n"
+                "    or similarity_ratio > 0.9\n"
+                "    or fuzz_ratio > 0.95\n"
+                ")\n"
+                "and match_score > 4\n"
+                "qualify row_number() over (\n"
+                "    partition by ipeds\n"
+                "    order by match_score desc, similarity_ratio desc, ceeb\n"
+                ") = 1"
+            ),
         )
 
         self.fuzzy_matches = self.duck.table("fuzzy_matches")
 
     def write_crosswalk(self):
-        def cols(const: str):
-            return [
-                duckdb.ColumnExpression("ceeb"),
-                duckdb.ColumnExpression("ipeds"),
-                duckdb.ColumnExpression("state"),
-                duckdb.ConstantExpression(const).alias("method"),
-            ]
-
-        # these are all used implicitly
-        exact = self.exact_matches.select(*cols("exact"))  # type: ignore  # noqa: F841
-        fuzzy = self.fuzzy_matches.select(*cols("fuzzy"))  # type: ignore  # noqa: F841
-
-        ceeb = self.duck.table("ceeb_university")  # type: ignore  # noqa: F841
-        hd = self.duck.table("ipeds_hd")  # type: ignore  # noqa: F841
-        nsc = self.duck.table("nsc_university")  # type: ignore  # noqa: F841
-
-        crosswalk = """
+        def cols(table: str, method: str):
+            return f"select ceeb, ipeds, state, method: '{method}' from {table}"
+
+        crosswalk = f"""
             SELECT 
                 method: COALESCE(method, 'no-ceeb-match'),
                 ceeb,
@@ -333,17 +525,17 @@ class UniversityCrosswalk:
                 fips,
                 latitude,
                 longitude
-            FROM ((FROM fuzzy) UNION ALL BY NAME (FROM exact))
-            FULL JOIN ceeb USING (ceeb, state)
-            FULL JOIN hd h USING (ipeds, state)
-            FULL JOIN nsc n USING (ipeds)
+            FROM (
+                ({cols("fuzzy_matches", "fuzzy")})
+                UNION ALL BY NAME
+                ({cols("exact_matches", "exact")})
+            )
+            FULL JOIN ceeb_university USING (ceeb, state)
+            FULL JOIN ipeds_hd h USING (ipeds, state)
+            FULL JOIN nsc_university n USING (ipeds)
         """
 
-        # Calling the relations inside the function wrapper doesn't work. It's
-        # a scope issue, so you have to call the underlying function directly.
-        self.duck.duck.execute(
-            f"create or replace table university_crosswalk as ({crosswalk})"
-        )
+        self.duck.create_table_query("university_crosswalk", crosswalk)
 
     def report_coverage(self):
         view_name = "university_coverage"
@@ -355,6 +547,16 @@ class UniversityCrosswalk:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the university crosswalk."
+    )
+    parser.add_argument(
+        "--fts",
+        action="store_true",
+        help="search with the DuckDB FTS index instead of the in-memory one",
+    )
+    args = parser.parse_args()
+
     with DuckDB(os.path.join("crosswalking", "universities.duckdb")) as duck:
         univ = UniversityCrosswalk(
             duck=duck,
@@ -362,6 +564,6 @@ if __name__ == "__main__":
             crosswalk_sql_dir=os.path.join("crosswalking", "sql"),
         )
 
-        univ.process()
+        univ.process(use_fts=args.fts)
 
         print(univ.report_coverage())
@@ -1,5 +1,6 @@
 from utils.ceeb import CEEB_NCAA, CEEBCollege, CEEBHighSchool
 from utils.duckdb import DuckDB
+from utils.telemetry import Telemetry
 
 # The CEEB codes for colleges/universities are four digits. The only place I
 # could find them is in a PDF from the College Board.
@@ -58,14 +59,14 @@ if __name__ == "__main__":
             + f" in {len(ceeb_codes_split)} chunks of {chunk_length} each."
         )
 
-        for i, ceeb_code_segment in enumerate(ceeb_codes_split):
-            print(i)
+        # one telemetry for the whole sweep, so the ETA covers every chunk.
+        with Telemetry("ceeb_ncaa", total=len(ceeb_codes)) as telemetry:
+            for ceeb_code_segment in ceeb_codes_split:
+                ceeb = CEEB_NCAA()
+                ceeb.iterate(ceeb_code_segment, telemetry)
+                ceeb.combine_data()
+                ceeb.write_ndjson()
 
-            ceeb = CEEB_NCAA()
-            ceeb.iterate(ceeb_code_segment)
-            ceeb.combine_data()
-            ceeb.write_ndjson()
-
-            if overwrite_duckdb:
-                with DuckDB("clean-data/ceeb.duckdb") as duck:
-                    ceeb.append_to_duckdb(duck, quiet=True)
+                if overwrite_duckdb:
+                    with DuckDB("clean-data/ceeb.duckdb") as duck:
+                        ceeb.append_to_duckdb(duck, quiet=True)
@@ -59,6 +59,61 @@ class HD:
 
         return None
 
+    def update_current(self, duck: DuckDB, rebuild: bool = False) -> None:
+        """Fold New Editions Into the Current Institution Snapshot
+
+        `hd_current` has one row per UNITID. Each column holds the value from
+        the latest edition where it isn't missing, which is what
+        `arg_max(columns(*), edition)` over every edition gives. Because that
+        is associative, only the editions in `hd` that aren't in `hd_history`
+        yet are read and combined with the existing snapshot, instead of
+        windowing over every year again.
+
+        `hd_history` keeps a few identifying columns of every edition, which
+        is enough to tell when an institution opened, closed or moved.
+
+        Args:
+            duck (DuckDB): A DuckDB object.
+            rebuild (bool, optional): Rebuild both tables from every edition,
+                for when a past edition was revised. Defaults to False.
+        """
+
+        if rebuild or not duck.table_exists("hd_current"):
+            duck.create_table_query("hd_current", "from hd limit 0")
+
+        if rebuild or not duck.table_exists("hd_history"):
+            duck.create_table_query(
+                "hd_history",
+                "select unitid, edition, opeid, instnm, city, stabbr, sector "
+                "from hd limit 0",
+            )
+
+        duck.create_table_query(
+            "hd_new_editions",
+            "select distinct edition from hd "
+            "anti join (select distinct edition from hd_history) using (edition)",
+        )
+
+        new_rows = "from hd semi join hd_new_editions using (edition)"
+
+        duck.execute(
+            "insert into hd_history "
+            "select unitid, edition, opeid, instnm, city, stabbr, sector "
+            f"from ({new_rows})"
+        )
+
+        duck.create_table_query(
+            "hd_current",
+            "select arg_max(columns(*), edition) "
+            f"from ((from hd_current) union all by name ({new_rows})) "
+            "group by unitid "
+            "order by unitid",
+        )
+
+        duck.execute("drop table hd_new_editions")
+
+        return None
+
 
 if __name__ == "__main__":
     years = list(range(2009, 2024 + 1))
@@ -70,3 +125,4 @@ if __name__ == "__main__":
 
     with DuckDB("clean-data/ipeds.duckdb") as duck:
         hd.append_to_duckdb(duck)
+        hd.update_current(duck)
@@ -6,11 +6,15 @@ from utils.nces import NCES, NeoNCES
 # antiquated webpage that was kind of hard to find.
 
 if __name__ == "__main__":
-    year = 2023
+    # Each year is kept as an edition. The crosswalk matches the schools in the
+    # latest edition, and the earlier editions date when a school was open.
+    years = range(2019, 2024)
 
     school_types = ["public", "private", "postsecondary"]
 
-    schools = [NCES(year, school) for school in school_types]
+    schools = [
+        NCES(year, school) for year in years for school in school_types
+    ]
 
     with DuckDB("clean-data/nces.duckdb") as duck:
         duck.install_and_load_extension("excel", use_https=True)
@@ -2,6 +2,7 @@ import os
 
 from utils.conditionals import conditional_download
 from utils.duckdb import DuckDB
+from utils.sources import source_url
 
 # The National Student Clearinghouse provides a fairly recent crosswalk between
 # NSC codes and the UNITIDs used in IPEDS data.
@@ -13,14 +14,7 @@ class NSC:
     def __init__(self):
         self.file_name = "NSC_SCHOOL_CODE_TO_IPEDS_UNIT_ID_XWALK_APR-2023.xlsx"
 
-        self.url = "/".join(
-            [
-                "https://nscresearchcenter.org",
-                "wp-content",
-                "uploads",
-                self.file_name,
-            ]
-        )
+        self.url = source_url("nsc", "wp-content", "uploads", self.file_name)
 
         self.raw_file_loc = os.path.join("raw-data", self.file_name)
 
@@ -48,7 +42,7 @@ class NSC:
 
 
 if __name__ == "__main__":
-    with DuckDB("clean-data/ncs.duckdb") as duck:
+    with DuckDB("clean-data/nsc.duckdb") as duck:
         duck.install_and_load_extension("excel", use_https=True)
 
         nsc = NSC()
@@ -20,9 +20,12 @@ if __name__ == "__main__":
 
     county = CountyData(year)
 
+    # download first, so the database is only open while appending and the
+    # other geography builds can run at the same time.
+    county.download()
+    county.extract()
+
     with DuckDB("clean-data/geography.duckdb") as duck:
         duck.install_and_load_extension("spatial", True)
 
-        county.download()
-        county.extract()
         county.append_to_duckdb(duck)
@@ -13,33 +13,34 @@ class SchoolData(Census):
 
 
 if __name__ == "__main__":
-    import ftplib
     import re
 
-    year = 2024
-
-    # probe the FTP server for all of the state school district files.
-    with ftplib.FTP("ftp2.census.gov") as ftp:
-        ftp.login(user="anonymous")
+    import requests
 
-        ftp.cwd(f"geo/tiger/TIGER{year}/UNSD")
+    year = 2024
 
-        files = ftp.nlst()
+    # probe the directory listing for all of the state school district files.
+    # it is served over HTTPS as well as FTP, and a mirror can serve it too.
+    listing = requests.get(SchoolData(year, "us").base_url)
+    listing.raise_for_status()
 
     # extract the FIPS values.
-    state_fips = [
-        re.search(r"tl_\d{4}_(\d{2})_unsd.zip", f).group(1)  # type: ignore
-        for f in files
-    ]
+    state_fips = sorted(
+        set(re.findall(rf"tl_{year}_(\d{{2}})_unsd\.zip", listing.text))
+    )
 
     states = [SchoolData(year, fips) for fips in state_fips]
 
+    # download first, so the database is only open while appending and the
+    # other geography builds can run at the same time.
+    for x in states:
+        print(x.state)
+
+        x.download()
+        x.extract()
+
     with DuckDB("clean-data/geography.duckdb") as duck:
         duck.install_and_load_extension("spatial", True)
 
         for x in states:
-            print(x.state)
-
-            x.download()
-            x.extract()
             x.append_to_duckdb(duck)
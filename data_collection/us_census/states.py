@@ -16,9 +16,12 @@ if __name__ == "__main__":
 
     state = StateData(year)
 
+    # download first, so the database is only open while appending and the
+    # other geography builds can run at the same time.
+    state.download()
+    state.extract()
+
     with DuckDB("clean-data/geography.duckdb") as duck:
         duck.install_and_load_extension("spatial", True)
 
-        state.download()
-        state.extract()
         state.append_to_duckdb(duck)
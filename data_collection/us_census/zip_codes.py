@@ -16,9 +16,12 @@ if __name__ == "__main__":
 
     zips = ZIPCodeData(year)
 
+    # download first, so the database is only open while appending and the
+    # other geography builds can run at the same time.
+    zips.download()
+    zips.extract()
+
     with DuckDB("clean-data/geography.duckdb") as duck:
         duck.install_and_load_extension("spatial", True)
 
-        zips.download()
-        zips.extract()
         zips.append_to_duckdb(duck)
@@ -0,0 +1,229 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+import pyarrow as pa
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils.duckdb import DuckDB
+
+# components with a dense matrix larger than this are assigned greedily.
+MAX_COMPONENT_SIZE = 4_000_000
+
+# components with at least this many pairs are solved in worker processes.
+PARALLEL_COMPONENT_PAIRS = 5_000
+
+
+def greedy_assignment(score: np.ndarray, left: np.ndarray, right: np.ndarray):
+    """One-to-one assignment by taking the highest scores first.
+
+    The total score is at least half of the optimum.
+
+    Args:
+        score (np.ndarray): The score of each pair.
+        left (np.ndarray): Integer codes of the left side of each pair.
+        right (np.ndarray): Integer codes of the right side of each pair.
+
+    Returns:
+        np.ndarray: The positions of the chosen pairs.
+    """
+
+    used_left: set[int] = set()
+    used_right: set[int] = set()
+    chosen: List[int] = []
+
+    for i in np.argsort(-score, kind="stable"):
+        a, b = int(left[i]), int(right[i])
+
+        if a not in used_left and b not in used_right:
+            used_left.add(a)
+            used_right.add(b)
+            chosen.append(int(i))
+
+    return np.asarray(chosen, dtype=np.int64)
+
+
+def optimal_assignment(score: np.ndarray, left: np.ndarray, right: np.ndarray):
+    """Maximum-weight one-to-one assignment of one connected component.
+
+    Args:
+        score (np.ndarray): The score of each pair, all positive.
+        left (np.ndarray): Integer codes of the left side of each pair.
+        right (np.ndarray): Integer codes of the right side of each pair.
+
+    Returns:
+        np.ndarray: The positions of the chosen pairs.
+    """
+
+    rows, row_codes = np.unique(left, return_inverse=True)
+    cols, col_codes = np.unique(right, return_inverse=True)
+
+    # missing pairs are worth nothing, so they are never worth choosing over
+    # a real pair and are dropped afterwards.
+    weights = np.zeros((len(rows), len(cols)), dtype=np.float64)
+    position = np.full((len(rows), len(cols)), -1, dtype=np.int64)
+
+    weights[row_codes, col_codes] = score
+    position[row_codes, col_codes] = np.arange(len(score))
+
+    row_ind, col_ind = linear_sum_assignment(weights, maximize=True)
+
+    chosen = position[row_ind, col_ind]
+
+    return chosen[chosen >= 0]
+
+
+def solve_component(score: np.ndarray, left: np.ndarray, right: np.ndarray):
+    """Assign one connected component, exactly if it is small enough.
+
+    Args:
+        score (np.ndarray): The score of each pair.
+        left (np.ndarray): Integer codes of the left side of each pair.
+        right (np.ndarray): Integer codes of the right side of each pair.
+
+    Returns:
+        np.ndarray: The positions of the chosen pairs.
+    """
+
+    if len(np.unique(left)) * len(np.unique(right)) > MAX_COMPONENT_SIZE:
+        return greedy_assignment(score, left, right)
+
+    return optimal_assignment(score, left, right)
+
+
+def resolve_assignment(
+    left: np.ndarray,
+    right: np.ndarray,
+    score: np.ndarray,
+    workers: int | None = None,
+) -> np.ndarray:
+    """Choose a one-to-one set of pairs with the largest total score.
+
+    The pairs are split into connected components, since an assignment in
+    one component can't affect another. A component with a single pair is
+    kept as is. The rest are solved exactly with the Hungarian algorithm,
+    except for components whose dense matrix would exceed
+    `MAX_COMPONENT_SIZE` cells, which fall back to the greedy assignment.
+
+    The solver holds the GIL, so large components are spread over worker
+    processes. Small ones are solved in place, where they are cheaper than
+    the hand-off.
+
+    Args:
+        left (np.ndarray): The left ID of each pair.
+        right (np.ndarray): The right ID of each pair.
+        score (np.ndarray): The score of each pair. Higher is better.
+        workers (int | None, optional): Processes used for the large
+            components. Defaults to the number of cores.
+
+    Returns:
+        np.ndarray: A boolean mask of the chosen pairs.
+    """
+
+    keep = np.zeros(len(score), dtype=bool)
+
+    if len(score) == 0:
+        return keep
+
+    score = np.asarray(score, dtype=np.float64)
+
+    _, left_codes = np.unique(np.asarray(left), return_inverse=True)
+    _, right_codes = np.unique(np.asarray(right), return_inverse=True)
+
+    n_left = int(left_codes.max()) + 1
+    n_right = int(right_codes.max()) + 1
+
+    # the bipartite graph, with the right side numbered after the left.
+    graph = coo_matrix(
+        (
+            np.ones(len(score), dtype=np.int8),
+            (left_codes, right_codes + n_left),
+        ),
+        shape=(n_left + n_right, n_left + n_right),
+    )
+
+    _, labels = connected_components(graph, directed=False)
+
+    component = labels[left_codes]
+
+    order = np.argsort(component, kind="stable")
+    bounds = np.flatnonzero(np.diff(component[order])) + 1
+    groups = np.split(order, bounds)
+
+    small: List[np.ndarray] = []
+    large: List[np.ndarray] = []
+
+    for group in groups:
+        if len(group) == 1:
+            # a single pair needs no solving.
+            keep[group] = True
+        elif len(group) < PARALLEL_COMPONENT_PAIRS:
+            small.append(group)
+        else:
+            large.append(group)
+
+    def arguments(group: np.ndarray):
+        return score[group], left_codes[group], right_codes[group]
+
+    if len(large) > 1 and workers != 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = [
+                (group, executor.submit(solve_component, *arguments(group)))
+                for group in large
+            ]
+
+            for group in small:
+                keep[group[solve_component(*arguments(group))]] = True
+
+            for group, future in futures:
+                keep[group[future.result()]] = True
+    else:
+        for group in small + large:
+            keep[group[solve_component(*arguments(group))]] = True
+
+    return keep
+
+
+def resolve_one_to_one(
+    duck: DuckDB,
+    input_table: str,
+    output_table: str,
+    left: str = "ceeb",
+    right: str = "nces",
+    score: str = "score",
+    workers: int | None = None,
+):
+    """Resolve a table of scored candidate pairs to one-to-one matches.
+
+    Every column of `input_table` is kept for the chosen pairs. Pairs with a
+    missing ID or a score that isn't positive are never chosen.
+
+    Args:
+        duck (DuckDB): A DuckDB object.
+        input_table (str): The table of candidate pairs.
+        output_table (str): The table to be created.
+        left (str, optional): The left ID column. Defaults to "ceeb".
+        right (str, optional): The right ID column. Defaults to "nces".
+        score (str, optional): The score column. Defaults to "score".
+        workers (int | None, optional): See `resolve_assignment`.
+    """
+
+    candidates = duck.sql(
+        f"from {input_table} "
+        f"where {left} is not null and {right} is not null and {score} > 0"
+    ).fetch_arrow_table()
+
+    keep = resolve_assignment(
+        candidates[left].to_numpy(zero_copy_only=False),
+        candidates[right].to_numpy(zero_copy_only=False),
+        candidates[score].to_numpy(zero_copy_only=False),
+        workers=workers,
+    )
+
+    duck.create_table_arrow(output_table, candidates.filter(pa.array(keep)))
@@ -0,0 +1,33 @@
+import functools
+from types import SimpleNamespace
+
+
+@functools.cache
+def selenium() -> SimpleNamespace:
+    """The parts of selenium the scrapers use.
+
+    They are imported on the first call, so importing a scraper module
+    doesn't load selenium, or need it installed.
+
+    Returns:
+        SimpleNamespace: `webdriver`, `ActionChains`, `By`, `EC`, `Select`,
+            `WebDriverWait` and `NoSuchElementException`.
+    """
+
+    from selenium import webdriver
+    from selenium.common.exceptions import NoSuchElementException
+    from selenium.webdriver import ActionChains
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import Select
+    from selenium.webdriver.support.wait import WebDriverWait
+
+    return SimpleNamespace(
+        webdriver=webdriver,
+        ActionChains=ActionChains,
+        By=By,
+        EC=EC,
+        Select=Select,
+        WebDriverWait=WebDriverWait,
+        NoSuchElementException=NoSuchElementException,
+    )
@@ -1,22 +1,19 @@
+import contextlib
 import json
 import os
 import re
 import time
 from typing import Any, List
 
-import pdfplumber
 import polars as pl
-from bs4 import BeautifulSoup
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.wait import WebDriverWait
-from seleniumwire import webdriver
 
+# the browser and PDF libraries are imported where they are used, so that
+# importing this module doesn't load them, or need them installed.
+from utils.browser import selenium
 from utils.conditionals import conditional_download
 from utils.duckdb import DuckDB
+from utils.sources import source_url
+from utils.telemetry import Telemetry
 
 os.environ["DC_STATEHOOD"] = "1"
 import us  # type: ignore
@@ -24,7 +21,7 @@ import us  # type: ignore
 
 class CEEBCollege:
     def __init__(self):
-        self.base_url = "https://satsuite.collegeboard.org/media/pdf/"
+        self.base_url = source_url("collegeboard", "media", "pdf", "")
         self.base_name = "sat-score-sends-code-list.pdf"
         self.url = self.base_url + self.base_name
 
@@ -43,6 +40,8 @@ class CEEBCollege:
         conditional_download(self.url, self.loc)
 
     def process(self):
+        import pdfplumber
+
         pdf = pdfplumber.open(self.loc)
 
         # Using text flow here helps get the word wrapping in the right order.
@@ -106,11 +105,11 @@ class CEEBCollege:
 class CEEBHighSchool:
     def __init__(self, duck: DuckDB, timeout_limit: int = 20):
         # initial URL of the page
-        self.url = (
-            "https://satsuite.collegeboard.org/"
-            "k12-educators/"
-            "tools-resources/"
-            "k12-school-code-search"
+        self.url = source_url(
+            "collegeboard",
+            "k12-educators",
+            "tools-resources",
+            "k12-school-code-search",
         )
 
         self.timeout_limit = timeout_limit
@@ -126,10 +125,14 @@ class CEEBHighSchool:
         self.duck = duck
 
     def __enter__(self):
+        from seleniumwire import webdriver
+
+        web = selenium()
+
         self.driver = webdriver.Chrome()
         self.driver.get(self.url)
 
-        self.wait = WebDriverWait(
+        self.wait = web.WebDriverWait(
             self.driver,
             timeout=self.timeout_limit,
             poll_frequency=1,
@@ -138,7 +141,9 @@ class CEEBHighSchool:
 
         # dismiss the cookies popup
         cookies_reject = self.wait.until(
-            EC.element_to_be_clickable((By.ID, "onetrust-reject-all-handler"))
+            web.EC.element_to_be_clickable(
+                (web.By.ID, "onetrust-reject-all-handler")
+            )
         )
         cookies_reject.click()
 
@@ -152,7 +157,9 @@ class CEEBHighSchool:
         self.driver.quit()
 
     def select_dropdown(self):
-        wait = WebDriverWait(
+        web = selenium()
+
+        wait = web.WebDriverWait(
             self.driver,
             timeout=self.timeout_limit,
             poll_frequency=1,
@@ -160,23 +167,34 @@ class CEEBHighSchool:
         )
 
         dropdown_menu = wait.until(
-            EC.presence_of_element_located((By.ID, "apricot_select_4"))
+            web.EC.presence_of_element_located(
+                (web.By.ID, "apricot_select_4")
+            )
         )
 
-        self.select = Select(dropdown_menu)
+        self.select = web.Select(dropdown_menu)
 
     def choose_next_state(self):
         self.state_index += 1
         self.select.select_by_index(self.state_index)
 
-        print(f"choosing index: {self.state_index=}")
-
         self.state_name = self.select.first_selected_option.text
 
     def click_submit(self):
-        self.driver.find_element(By.CLASS_NAME, "cb-btn-primary").click()
+        web = selenium()
+
+        self.driver.find_element(web.By.CLASS_NAME, "cb-btn-primary").click()
+
+    def pull_json(self) -> int | None:
+        """Save the search results of the chosen state as JSON.
+
+        Returns:
+            int | None: The number of results, or None when the state was
+                already saved or skipped.
+        """
+
+        web = selenium()
 
-    def pull_json(self):
         self.file_path = os.path.join(
             self.storage_path, self.state_name + ".json"
         )
@@ -185,12 +203,12 @@ class CEEBHighSchool:
         # error. Skip that case.
 
         if self.state_name == "Marshall Islands":
-            return
+            return None
 
         if not os.path.exists(self.file_path):
             self.click_submit()
 
-            wait = WebDriverWait(
+            wait = web.WebDriverWait(
                 self.driver,
                 timeout=self.timeout_limit,  # the larger states take longer.
                 poll_frequency=1,
@@ -200,13 +218,15 @@ class CEEBHighSchool:
             # just to make the process wait for it to finish loading.
             result_wait = wait.until(
                 # EC.presence_of_element_located((By.CLASS_NAME, "col-xs-6"))
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "ul.cb-text-list.cb-text-list-feature")
+                web.EC.presence_of_element_located(
+                    (
+                        web.By.CSS_SELECTOR,
+                        "ul.cb-text-list.cb-text-list-feature",
+                    )
                 )
             )
 
             result_number = int(result_wait.get_property("childElementCount"))  # type: ignore
-            print(result_number)
 
             # gather the responses as JSON
             responses: List[dict[str, Any]] = []
@@ -229,6 +249,10 @@ class CEEBHighSchool:
             with open(self.file_path, "w") as f:
                 json.dump(responses, f, indent=2)
 
+            return result_number
+
+        return None
+
     def collect_data(self) -> pl.DataFrame:
         # convert build the table from JSON with DuckDB
         sql = (
@@ -266,17 +290,26 @@ class CEEBHighSchool:
         return self.data
 
     def process(self):
-        while self.state_index < self.n_states:
-            print(f"while loop: {self.state_index=}")
-            self.select_dropdown()
+        with Telemetry(
+            "ceeb_high_school", total=self.n_states - self.state_index
+        ) as telemetry:
+            while self.state_index < self.n_states:
+                with telemetry.item(str(self.state_index + 1)) as event:
+                    self.select_dropdown()
+
+                    # state index is iterated in choosing the next state
+                    self.choose_next_state()
 
-            # state index is iterated in choosing the next state
-            self.choose_next_state()
+                    event["state"] = self.state_name
+                    event["results"] = self.pull_json()
 
-            self.pull_json()
+                    # the state was saved by an earlier run, or has no
+                    # results to save.
+                    if event["results"] is None:
+                        telemetry.skip()
 
-            # wait a bit to be safe
-            time.sleep(0.5)
+                # wait a bit to be safe
+                time.sleep(0.5)
 
     def append_to_duckdb(self):
         data = self.data  # type: ignore # noqa: F841
@@ -291,11 +324,11 @@ class CEEBHighSchool:
 class CEEB_NCAA:
     def __init__(self, timeout_limit: int = 20):
         # initial URL of the page
-        self.url = (
-            "https://web3.ncaa.org/"
-            "hsportal/"
-            "exec/"
-            "hsAction?hsActionSubmit=searchHighSchool"
+        self.url = source_url(
+            "ncaa",
+            "hsportal",
+            "exec",
+            "hsAction?hsActionSubmit=searchHighSchool",
         )
 
         self.timeout_limit = timeout_limit
@@ -331,7 +364,9 @@ class CEEB_NCAA:
         self.table_name = "ncaa_school"
 
     def search_ceeb_code(self, ceeb: str):
-        wait = WebDriverWait(
+        web = selenium()
+
+        wait = web.WebDriverWait(
             self.driver,
             timeout=self.timeout_limit,
             poll_frequency=0.25,
@@ -340,22 +375,30 @@ class CEEB_NCAA:
 
         # find the text box
         ceeb_text_box = wait.until(
-            EC.presence_of_element_located((By.ID, "ceebCodeOnCrsDispId"))
+            web.EC.presence_of_element_located(
+                (web.By.ID, "ceebCodeOnCrsDispId")
+            )
         )
 
         # clear any prior input
         ceeb_text_box.clear()
 
         # enter the CEEB code
-        ActionChains(self.driver).send_keys_to_element(
+        web.ActionChains(self.driver).send_keys_to_element(
             ceeb_text_box, ceeb
         ).perform()
 
         # hit "Search"
-        self.driver.find_element(by=By.NAME, value="hsActionSubmit").click()
+        self.driver.find_element(
+            by=web.By.NAME, value="hsActionSubmit"
+        ).click()
 
     def pull_table(self, ceeb: str) -> dict[str, str | None]:
-        wait = WebDriverWait(
+        from bs4 import BeautifulSoup
+
+        web = selenium()
+
+        wait = web.WebDriverWait(
             self.driver,
             timeout=self.timeout_limit,
             poll_frequency=0.25,
@@ -363,15 +406,15 @@ class CEEB_NCAA:
         )
 
         table = wait.until(
-            EC.any_of(
-                EC.presence_of_element_located(
+            web.EC.any_of(
+                web.EC.presence_of_element_located(
                     (
-                        By.CSS_SELECTOR,
+                        web.By.CSS_SELECTOR,
                         "div.panelsStayOpenHsSummary.accordion-collapse.collapse.show",
                     )
                 ),
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, "span.error")
+                web.EC.presence_of_element_located(
+                    (web.By.CSS_SELECTOR, "span.error")
                 ),
             )
         )
@@ -379,7 +422,7 @@ class CEEB_NCAA:
         try:
             # this will intentionally fail if it is not found
             table = table.find_element(  # type: ignore
-                by=By.CSS_SELECTOR,
+                by=web.By.CSS_SELECTOR,
                 value="table.table.table-sm.table-bordered.border-primary",
             )
 
@@ -417,9 +460,11 @@ class CEEB_NCAA:
                 }
             )
 
-        except NoSuchElementException:
+        except web.NoSuchElementException:
             # capture the error message in case it shows anything interesting
-            error = self.driver.find_elements(By.CSS_SELECTOR, "span.error")[0]  # type: ignore
+            error = self.driver.find_elements(
+                web.By.CSS_SELECTOR, "span.error"
+            )[0]  # type: ignore
 
             data: dict[str, str | None] = dict(
                 {
@@ -439,9 +484,8 @@ class CEEB_NCAA:
     def return_to_search(self):
         self.driver.back()
 
-    def process(self, ceeb: str):
+    def process(self, ceeb: str) -> dict[str, str | None]:
         # if the data is not known, download it and append it to the list
-        start = time.time()
         self.search_ceeb_code(ceeb)
 
         data = self.pull_table(ceeb)
@@ -450,28 +494,42 @@ class CEEB_NCAA:
 
         self.return_to_search()
 
-        end = time.time()
-        time_taken = end - start
+        return data
+
+    def iterate(self, ceebs: List[str], telemetry: Telemetry | None = None):
+        """Fetch the CEEB codes that weren't fetched before.
 
-        print(f"CEEB {ceeb} in {time_taken:.02f} seconds.")
+        Args:
+            ceebs (List[str]): The CEEB codes.
+            telemetry (Telemetry | None, optional): For the progress of a
+                sweep over several calls. Defaults to one for these codes.
+        """
 
-    def iterate(self, ceebs: List[str]):
         self.new_data_list: List[dict[str, str | None]] = []
 
         ceebs_needed = list(
             filter(lambda x: x not in self.processed_ceebs, ceebs)
         )
 
-        print(f"This will fetch {len(ceebs_needed)} CEEB codes from the web.")
+        with contextlib.ExitStack() as stack:
+            if telemetry is None:
+                telemetry = stack.enter_context(
+                    Telemetry("ceeb_ncaa", total=len(ceebs))
+                )
+
+            telemetry.skip(len(ceebs) - len(ceebs_needed))
+
+            if len(ceebs_needed) != 0:
+                from seleniumwire import webdriver
 
-        if len(ceebs_needed) != 0:
-            self.driver = webdriver.Chrome()
-            self.driver.get(self.url)
+                self.driver = webdriver.Chrome()
+                self.driver.get(self.url)
 
-            for ceeb in ceebs_needed:
-                self.process(ceeb)
+                for ceeb in ceebs_needed:
+                    with telemetry.item(ceeb) as event:
+                        event["found"] = self.process(ceeb)["message"] is None
 
-            self.driver.close()
+                self.driver.close()
 
         self.new_data = pl.from_dicts(
             self.new_data_list,
@@ -2,6 +2,7 @@ import os
 
 from utils.conditionals import conditional_download, conditional_extract
 from utils.duckdb import DuckDB
+from utils.sources import source_url
 
 
 class Census:
@@ -22,9 +23,8 @@ class Census:
 
         self.base_name = self.file[:-4]
 
-        self.base_url = (
-            "https://www2.census.gov/geo/tiger"
-            f"/TIGER{year}/{source_name.upper()}/"
+        self.base_url = source_url(
+            "census", "geo", "tiger", f"TIGER{year}", source_name.upper(), ""
         )
         self.url = self.base_url + self.file
 
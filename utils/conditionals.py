@@ -4,24 +4,34 @@ import zipfile
 
 import requests
 
+from utils.sources import mirror
+
 
 def conditional_download(url: str, dest: str, sleep: bool = False) -> None:
     """Conditionally download a file from a URL.
 
+    The file is streamed to `<dest>.tmp` and renamed when it is complete, so
+    a failed download isn't mistaken for a finished one the next time.
+
     Args:
         url (str): The URL.
         dest (str): The destination file.
         sleep (bool, optional): Option to include a one second wait after
-            downloading. Defaults to False.
+            downloading, which is skipped when downloading from a mirror.
+            Defaults to False.
     """
 
     if not os.path.exists(dest):
-        resp = requests.get(url)
+        with requests.get(url, stream=True) as resp:
+            resp.raise_for_status()
+
+            with open(dest + ".tmp", mode="wb") as file:
+                for chunk in resp.iter_content(chunk_size=2**20):
+                    file.write(chunk)
 
-        with open(dest, mode="wb") as file:
-            file.write(resp.content)
+        os.replace(dest + ".tmp", dest)
 
-        if sleep:
+        if sleep and not mirror():
             time.sleep(1)
 
     return None
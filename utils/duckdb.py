@@ -1,8 +1,16 @@
+import contextlib
 import os
-from typing import List
+import time
+from typing import TYPE_CHECKING, Callable, List
 
 import duckdb
-import polars as pl
+
+# polars is only needed for the annotations here, and DuckDB imports it
+# itself for `.pl()`.
+if TYPE_CHECKING:
+    import polars as pl
+
+    from utils.memory import MemoryMonitor
 
 
 class DuckDB:
@@ -14,9 +22,62 @@ class DuckDB:
         wrapper. Go directly through `self.duck` to call the method.
     """
 
-    def __init__(self, db_file: str = ":memory:"):
+    def __init__(
+        self, db_file: str = ":memory:", lock_timeout: float | None = None
+    ):
+        """
+        Args:
+            db_file (str, optional): The database file. Defaults to
+                ":memory:".
+            lock_timeout (float | None, optional): Seconds to wait for another
+                process to release a database file before failing. Defaults
+                to the `DUCKDB_LOCK_TIMEOUT` environment variable, or 0.
+
+        When the `CROSSWALK_MEMORY_LOG` environment variable names a file, the
+        memory used while the connection is open is logged to it (see
+        `utils/memory.py`).
+        """
+
         self.db_file = db_file
-        self.duck: duckdb.DuckDBPyConnection = duckdb.connect(self.db_file)  # type: ignore
+        self.lock_timeout = (
+            float(os.environ.get("DUCKDB_LOCK_TIMEOUT", 0))
+            if lock_timeout is None
+            else lock_timeout
+        )
+
+        self.duck: duckdb.DuckDBPyConnection = self.wait_for_lock(
+            lambda: duckdb.connect(self.db_file)  # type: ignore
+        )
+
+        self.monitor: "MemoryMonitor | None" = None
+
+        if os.environ.get("CROSSWALK_MEMORY_LOG"):
+            from utils.memory import MemoryMonitor
+
+            self.monitor = MemoryMonitor(
+                self.duck, os.environ["CROSSWALK_MEMORY_LOG"], self.db_file
+            )
+
+    def wait_for_lock(self, open_file: Callable):
+        """Retry opening a database file while another process holds it.
+
+        DuckDB lets one process write to a file at a time, so the pipeline
+        sets a timeout for stages that take turns writing to the same file.
+        """
+
+        start = time.monotonic()
+
+        while True:
+            try:
+                return open_file()
+            except duckdb.IOException as e:
+                if (
+                    "Could not set lock" not in str(e)
+                    or time.monotonic() - start >= self.lock_timeout
+                ):
+                    raise
+
+                time.sleep(0.5)
 
     def __enter__(self):
         return self
@@ -25,8 +86,25 @@ class DuckDB:
         self.close()
 
     def close(self):
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+
         self.duck.close()
 
+    def step(self, name: str):
+        """Attribute the memory used inside the block to `name`, when it is
+        being logged.
+
+        Args:
+            name (str): The step, such as a SQL file.
+        """
+
+        if self.monitor is None:
+            return contextlib.nullcontext()
+
+        return self.monitor.step(name)
+
     def sql(self, query: str, alias: str = "", params: object = None):
         """Pass the SQL function one level higher.
 
@@ -168,7 +246,7 @@ class DuckDB:
             ).shape[0]
         )
 
-    def attach_db_dir(self, dir: str) -> pl.DataFrame:
+    def attach_db_dir(self, dir: str) -> "pl.DataFrame":
         """Attach all DuckDB files in a directory.
 
         Args:
@@ -187,18 +265,25 @@ class DuckDB:
             "WHERE NOT internal"
         ).pl()
 
-    def attach_db(self, file: str):
+    def attach_db(self, file: str, read_only: bool = False):
         """Attach a DuckDB Database File
 
         The database attaches according to the filename.
 
         Args:
-            duck (duckdb.DuckDBPyConnection): DuckDB connection.
             file (str): Path to the file.
+            read_only (bool, optional): Attach it read-only, which lets other
+                processes read it at the same time. Defaults to False.
         """
 
         if file.endswith(".duckdb"):
-            self.duck.execute(f"ATTACH IF NOT EXISTS '{file}'")
+            options = " (READ_ONLY)" if read_only else ""
+
+            self.wait_for_lock(
+                lambda: self.duck.execute(
+                    f"ATTACH IF NOT EXISTS '{file}'{options}"
+                )
+            )
 
     def create_fts_index(
         self,
@@ -244,11 +329,35 @@ class DuckDB:
             path (str): The path to the SQL file.
         """
 
-        with open(path) as f:
+        with open(path) as f, self.step(path):
             self.duck.sql(
                 f"CREATE OR REPLACE TABLE {table_name} AS ({f.read()})"
             )
 
+    def create_table_arrow(
+        self, table_name: str, data: object, query: str = "from {data}"
+    ):
+        """Create a DuckDB Table From an Arrow Table or Polars DataFrame
+
+        The data is registered under a temporary name, so an existing table
+        with the same name as a Python variable can't shadow it.
+
+        Args:
+            table_name (str): The name of the table to be created.
+            data (object): An Arrow table, Polars or pandas DataFrame.
+            query (str, optional): A SQL query over the data, which is
+                referenced as `{data}`. Defaults to "from {data}".
+        """
+
+        view_name = f"_arrow_{table_name}"
+
+        self.duck.register(view_name, data)
+
+        try:
+            self.create_table_query(table_name, query.format(data=view_name))
+        finally:
+            self.duck.unregister(view_name)
+
     def create_view_file(self, view_name: str, path: str):
         """Create a DuckDB View From a SQL File
 
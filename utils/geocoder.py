@@ -0,0 +1,173 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import shapely
+from shapely import STRtree
+
+from utils.duckdb import DuckDB
+
+# the geography layers, each from its SQL file, with the ID column to return
+# and what it is called in the result.
+LAYERS = {
+    "state": ("state_fips", "state_fips"),
+    "county": ("fips", "county_geoid"),
+    "school_district": ("lea", "lea"),
+    "zcta": ("zcta", "zcta"),
+}
+
+
+class ReverseGeocoder:
+    """
+    Find the state, county, school district, and ZCTA of many points at once.
+
+    Each layer's geometries are loaded once and put in an STRtree. A batch of
+    points is then a single vectorized tree query per layer, where only the
+    polygons whose bounding box holds a point are tested, rather than a
+    spatial join. Repeated locations are only looked up once, and the rest
+    are split into chunks that run on several threads, since the tree
+    queries run in GEOS.
+
+    Where editions overlap, the latest edition that holds the point wins, as
+    in `SchoolCrosswalk.enrich_geography`.
+    """
+
+    def __init__(
+        self,
+        duck: DuckDB,
+        crosswalk_sql_dir: str,
+        layers: Sequence[str] | None = None,
+    ):
+        """
+        Args:
+            duck (DuckDB): A DuckDB object with `geography` attached.
+            crosswalk_sql_dir (str): The directory of the geography SQL files.
+            layers (Sequence[str] | None, optional): The layers to load.
+                Defaults to all of `LAYERS`.
+        """
+
+        duck.install_and_load_extension("spatial", use_https=True)
+
+        self.layers = list(layers or LAYERS)
+
+        self.trees: Dict[str, STRtree] = {}
+        self.ids: Dict[str, pa.Array] = {}
+        self.editions: Dict[str, np.ndarray] = {}
+
+        for layer in self.layers:
+            if layer not in LAYERS:
+                raise ValueError(f"{layer} is not a geography layer.")
+
+            with open(os.path.join(crosswalk_sql_dir, layer + ".sql")) as f:
+                sql = f.read()
+
+            data = duck.sql(
+                f"select id: {LAYERS[layer][0]}, edition, wkb: st_aswkb(geom) "
+                f"from ({sql}) where geom is not null"
+            ).fetch_arrow_table()
+
+            geometries = shapely.from_wkb(
+                data["wkb"].to_numpy(zero_copy_only=False)
+            )
+
+            # prepared polygons answer point-in-polygon tests with an index.
+            shapely.prepare(geometries)
+
+            self.trees[layer] = STRtree(geometries)
+            self.ids[layer] = data["id"].combine_chunks().cast(pa.string())
+            self.editions[layer] = (
+                data["edition"].fill_null(0).to_numpy(zero_copy_only=False)
+            )
+
+    def locate(self, layer: str, points: np.ndarray) -> np.ndarray:
+        """The polygon holding each point in one layer.
+
+        Args:
+            layer (str): The layer.
+            points (np.ndarray): Shapely points.
+
+        Returns:
+            np.ndarray: The position of each point's polygon in the layer,
+                which is -1 for points outside of it.
+        """
+
+        point, polygon = self.trees[layer].query(points, predicate="within")
+
+        result = np.full(len(points), -1, dtype=np.int64)
+
+        if len(point) == 0:
+            return result
+
+        # the latest edition first for each point, then take the first.
+        order = np.lexsort((polygon, -self.editions[layer][polygon], point))
+        point, polygon = point[order], polygon[order]
+
+        first = np.flatnonzero(np.diff(point, prepend=-1))
+
+        result[point[first]] = polygon[first]
+
+        return result
+
+    def geocode(
+        self,
+        latitude: Sequence[float] | np.ndarray,
+        longitude: Sequence[float] | np.ndarray,
+        workers: int | None = None,
+        chunk_size: int = 50_000,
+    ) -> pl.DataFrame:
+        """Reverse geocode a batch of points.
+
+        Args:
+            latitude (Sequence[float] | np.ndarray): Latitudes in degrees.
+            longitude (Sequence[float] | np.ndarray): Longitudes in degrees.
+            workers (int | None, optional): Threads. Defaults to the number
+                of cores.
+            chunk_size (int, optional): Points per task. Defaults to 50,000.
+
+        Returns:
+            pl.DataFrame: One row per point, in order, with the latitude, the
+                longitude, and the ID of each layer.
+        """
+
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+
+        if len(latitude) != len(longitude):
+            raise ValueError("latitude and longitude must be the same length.")
+
+        # records often share a location, so each location is looked up once.
+        location, inverse = np.unique(
+            longitude + 1j * latitude, return_inverse=True
+        )
+
+        points = shapely.points(location.real, location.imag)
+
+        def locate_chunk(start: int) -> List[np.ndarray]:
+            chunk = points[start : start + chunk_size]
+            return [self.locate(layer, chunk) for layer in self.layers]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = list(
+                executor.map(locate_chunk, range(0, len(points), chunk_size))
+            )
+
+        columns = {
+            "latitude": pa.array(latitude),
+            "longitude": pa.array(longitude),
+        }
+
+        for i, layer in enumerate(self.layers):
+            found = (
+                np.concatenate([chunk[i] for chunk in chunks])[inverse]
+                if chunks
+                else np.zeros(0, dtype=np.int64)
+            )
+
+            columns[LAYERS[layer][1]] = self.ids[layer].take(
+                pa.array(np.maximum(found, 0), mask=found < 0)
+            )
+
+        return pl.from_arrow(pa.table(columns))  # type: ignore
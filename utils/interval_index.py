@@ -0,0 +1,177 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def key_codes(
+    keys: Sequence[object] | pa.Array, vocabulary: pa.Array | None = None
+) -> Tuple[pa.Array, np.ndarray]:
+    """Integer codes for keys, by hashing rather than sorting strings.
+
+    Args:
+        keys (Sequence[object] | pa.Array): The keys, which may be missing.
+        vocabulary (pa.Array | None, optional): The known keys. Defaults to
+            None, which uses the distinct keys themselves.
+
+    Returns:
+        Tuple[pa.Array, np.ndarray]: The vocabulary and the code of each key,
+            which is -1 for a missing or unknown key.
+    """
+
+    if isinstance(keys, pa.ChunkedArray):
+        keys = keys.combine_chunks()
+    elif not isinstance(keys, pa.Array):
+        keys = pa.array(np.asarray(keys, dtype=object), from_pandas=True)
+
+    if vocabulary is None:
+        vocabulary = pc.unique(keys.drop_null())
+
+    if pa.types.is_null(keys.type) or len(vocabulary) == 0:
+        return vocabulary, np.full(len(keys), -1, dtype=np.int64)
+
+    if keys.type != vocabulary.type:
+        keys = keys.cast(vocabulary.type)
+
+    codes = pc.index_in(keys, value_set=vocabulary).fill_null(-1)
+
+    return vocabulary, codes.to_numpy().astype(np.int64)
+
+
+class IntervalIndex:
+    """
+    An as-of index over keys that are valid for a range of years.
+
+    The intervals are sorted once by key and start. A batch of (key, year)
+    lookups is sorted the same way and merged against them with
+    `np.searchsorted`, so millions of lookups cost a sort rather than a scan
+    of every interval per row. Only the intervals of the lookup's own key
+    that start by its year are checked, which is a handful per key.
+
+    Intervals of one key may overlap, such as a CEEB code linked to an IPEDS
+    unit and to the unit it was renumbered to, and every one that holds the
+    year is found.
+    """
+
+    def __init__(
+        self,
+        keys: Sequence[object] | pa.Array,
+        starts: Sequence[float | None],
+        ends: Sequence[float | None],
+    ):
+        """
+        Args:
+            keys (Sequence[object] | pa.Array): The key of each interval. Intervals with
+                a missing key are never found.
+            starts (Sequence[float | None]): The first valid year, inclusive.
+                A missing start is open.
+            ends (Sequence[float | None]): The last valid year, inclusive. A
+                missing end is open.
+        """
+
+        self.vocabulary, codes = key_codes(keys)
+
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+
+        if not len(codes) == len(starts) == len(ends):
+            raise ValueError("keys, starts, and ends must be the same length.")
+
+        finite = starts[np.isfinite(starts)]
+
+        # every year before the first start or after the last one compares
+        # the same, so the years fit in a small range and the key and the
+        # start combine into one sortable integer.
+        self.low = int(finite.min()) - 1 if len(finite) else 0
+        self.high = int(finite.max()) + 1 if len(finite) else 0
+        self.span = self.high - self.low + 1
+
+        starts = np.where(np.isnan(starts), self.low, starts)
+        ends = np.where(np.isnan(ends), np.inf, ends)
+
+        keep = np.flatnonzero(codes >= 0)
+        combined = self.combine(codes[keep], starts[keep])
+
+        order = np.argsort(combined, kind="stable")
+
+        self.combined = combined[order]
+        self.codes = codes[keep][order]
+        self.ends = ends[keep][order]
+        self.rows = keep[order]
+
+        # the first position of each interval's key, since the codes are
+        # sorted.
+        self.block = np.searchsorted(self.codes, self.codes, side="left")
+
+    def combine(self, codes: np.ndarray, years: np.ndarray) -> np.ndarray:
+        years = np.clip(years, self.low, self.high).astype(np.int64)
+
+        return codes.astype(np.int64) * self.span + (years - self.low)
+
+    def lookup(
+        self,
+        keys: Sequence[object] | pa.Array,
+        years: Sequence[float | None],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the intervals that hold each (key, year) pair.
+
+        Args:
+            keys (Sequence[object] | pa.Array): The key of each lookup.
+            years (Sequence[float | None]): The year of each lookup. Lookups
+                without a year are never found.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Flat arrays of the lookup position
+                and the interval position of every hit, ordered by lookup.
+                A lookup held by several intervals appears once for each.
+
+        Examples:
+            >>> index = IntervalIndex(
+            ...     ["c1", "c1"], [None, 2012], [2015, None]
+            ... )
+            >>> query, row = index.lookup(["c1"] * 3, [2013, 2010, 2020])
+            >>> query.tolist(), row.tolist()
+            ([0, 0, 1, 2], [0, 1, 0, 1])
+        """
+
+        _, codes = key_codes(keys, self.vocabulary)
+        years = np.asarray(years, dtype=np.float64)
+
+        if len(codes) != len(years):
+            raise ValueError("keys and years must be the same length.")
+
+        query = np.flatnonzero((codes >= 0) & ~np.isnan(years))
+
+        combined = self.combine(codes[query], years[query])
+
+        # sorted lookups let the binary searches resume where the last one
+        # ended, which makes this a merge of the two sorted arrays.
+        order = np.argsort(combined, kind="stable")
+        query, combined = query[order], combined[order]
+
+        last = np.searchsorted(self.combined, combined, side="right") - 1
+
+        # the latest interval of the same key that starts by that year.
+        same_key = last >= 0
+        same_key[same_key] = self.codes[last[same_key]] == codes[query[same_key]]
+
+        query, last = query[same_key], last[same_key]
+
+        # every interval of the key that starts by that year.
+        first = self.block[last]
+        count = last - first + 1
+
+        query = np.repeat(query, count)
+        position = np.repeat(first, count) + (
+            np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        )
+
+        valid = self.ends[position] >= years[query]
+
+        query, position = query[valid], position[valid]
+
+        # the positions of one lookup are already in order.
+        order = np.argsort(query, kind="stable")
+
+        return query[order], self.rows[position[order]]
@@ -2,6 +2,7 @@ import os
 import zipfile
 
 from utils.conditionals import conditional_download
+from utils.sources import source_url
 
 
 class IPEDS:
@@ -13,7 +14,7 @@ class IPEDS:
         self.table_suffix = table_suffix
         self.combined_table_name = self.table_name + self.table_suffix
 
-        self.base_url = "https://nces.ed.gov/ipeds/datacenter/data/"
+        self.base_url = source_url("nces", "ipeds", "datacenter", "data", "")
 
         self.file_name = (
             f"{self.table_name.upper()}{self.year}{self.table_suffix.upper()}.zip"
@@ -0,0 +1,383 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+# there is no resource module on Windows, where the peak isn't reported.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+if TYPE_CHECKING:
+    import subprocess
+
+    import duckdb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# frames in these files are passed over when attributing a sample.
+SKIP = {
+    os.path.join(ROOT, "utils", "duckdb.py"),
+    os.path.join(ROOT, "utils", "memory.py"),
+}
+
+# the measures kept for each step, in MB.
+MEASURES = [
+    "rss_mb",
+    "duckdb_mb",
+    "duckdb_temp_mb",
+    "temp_files_mb",
+    "arrow_mb",
+]
+
+# a step whose peak grows by more than this share, and by at least
+# `REGRESSION_MB`, is flagged in the report.
+REGRESSION = 0.2
+REGRESSION_MB = 50
+
+
+def maxrss_mb(maxrss: float) -> float:
+    """Convert `ru_maxrss`, which macOS reports in bytes and Linux in
+    kilobytes, to MB."""
+
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+
+
+def peak_rss() -> float:
+    """The peak resident memory of this process in MB."""
+
+    if resource is None:
+        return 0
+
+    return maxrss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def wait_for(process: "subprocess.Popen") -> Tuple[int, float | None]:
+    """Wait for a child process.
+
+    Returns:
+        Tuple[int, float | None]: Its return code, and its peak resident
+            memory in MB where the platform reports it.
+    """
+
+    if not hasattr(os, "wait4"):
+        return process.wait(), None
+
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return process.returncode, maxrss_mb(usage.ru_maxrss)
+
+
+def rss() -> float:
+    """The resident memory of this process in MB, or its peak where the
+    current value can't be read."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss()
+
+
+def empty_step() -> Dict:
+    return {"seconds": 0.0, "duckdb_tags": {}, **{m: 0.0 for m in MEASURES}}
+
+
+class MemoryMonitor:
+    """
+    Sample the memory of a process and attribute the peaks to what it was
+    doing.
+
+    A thread samples every `interval` seconds:
+
+    - the resident memory of the process,
+    - DuckDB's memory and temporary storage from `duckdb_memory()`, and the
+      size of its files from `duckdb_temporary_files()`,
+    - the bytes allocated by Arrow, when pyarrow has been imported.
+
+    Polars doesn't report its allocations, so its conversions only show up
+    in the resident memory.
+
+    Each sample is attributed to the step set with `step`, which
+    `DuckDB.create_table_file` sets to its SQL file, or else to the innermost
+    function of this repository on the stack of the thread that started the
+    monitor, such as `crosswalking/universities.py:sparse_searching`. When
+    stopped, the peaks and time of each are appended to `log_file` as JSON
+    lines.
+
+    `DuckDB` starts one for each connection when the `CROSSWALK_MEMORY_LOG`
+    environment variable names a log file.
+    """
+
+    def __init__(
+        self,
+        connection: "duckdb.DuckDBPyConnection",
+        log_file: str,
+        database: str = ":memory:",
+        interval: float = 0.25,
+    ):
+        """
+        Args:
+            connection (duckdb.DuckDBPyConnection): The connection to watch.
+                Its database is sampled through a cursor of its own.
+            log_file (str): The file of JSON lines to append to.
+            database (str, optional): The database file, for the log.
+                Defaults to ":memory:".
+            interval (float, optional): Seconds between samples. Defaults to
+                0.25.
+        """
+
+        self.cursor = connection.cursor()
+        self.log_file = log_file
+        self.database = database
+        self.interval = interval
+
+        self.thread_id = threading.get_ident()
+        self.current: str | None = None
+        self.peaks: Dict[str, Dict] = {}
+
+        self.stopped = threading.Event()
+        self.last = time.perf_counter()
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    @contextlib.contextmanager
+    def step(self, name: str):
+        """Attribute the samples taken inside the block to `name`."""
+
+        previous, self.current = self.current, name
+
+        try:
+            yield
+        finally:
+            self.current = previous
+
+    def location(self) -> str:
+        if self.current is not None:
+            return self.current
+
+        frame = sys._current_frames().get(self.thread_id)
+
+        while frame is not None:
+            file = frame.f_code.co_filename
+
+            if (
+                file.startswith(ROOT)
+                and file not in SKIP
+                and "site-packages" not in file
+            ):
+                return f"{os.path.relpath(file, ROOT)}:{frame.f_code.co_name}"
+
+            frame = frame.f_back
+
+        return "other"
+
+    def watch(self):
+        while not self.stopped.wait(self.interval):
+            self.try_sample()
+
+    def try_sample(self):
+        """Sample, passing over any failure, such as querying the database
+        while it attaches or detaches another or is being closed. Logging
+        memory never breaks what it watches, and a missed sample is only a
+        gap in the log."""
+
+        with contextlib.suppress(Exception):
+            self.sample()
+
+    def sample(self):
+        label = self.location()
+
+        tags = self.cursor.sql(
+            "select tag, memory_usage_bytes, temporary_storage_bytes "
+            "from duckdb_memory()"
+        ).fetchall()
+
+        temp_files = self.cursor.sql(
+            "select coalesce(sum(size), 0) from duckdb_temporary_files()"
+        ).fetchone()[0]  # type: ignore
+
+        arrow = 0
+
+        if "pyarrow" in sys.modules:
+            arrow = sys.modules["pyarrow"].total_allocated_bytes()
+
+        values = {
+            "rss_mb": rss(),
+            "duckdb_mb": sum(t[1] for t in tags) / 2**20,
+            "duckdb_temp_mb": sum(t[2] for t in tags) / 2**20,
+            "temp_files_mb": temp_files / 2**20,
+            "arrow_mb": arrow / 2**20,
+        }
+
+        now = time.perf_counter()
+
+        peak = self.peaks.setdefault(label, empty_step())
+        peak["seconds"] += now - self.last
+        self.last = now
+
+        # the largest DuckDB memory tags at its peak, such as HASH_TABLE.
+        if values["duckdb_mb"] >= peak["duckdb_mb"]:
+            peak["duckdb_tags"] = {
+                tag: round(memory / 2**20, 1)
+                for tag, memory, _ in sorted(tags, key=lambda t: -t[1])[:3]
+                if memory
+            }
+
+        for measure in MEASURES:
+            peak[measure] = max(peak[measure], values[measure])
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+        # so a connection shorter than the interval is still in the log.
+        self.try_sample()
+
+        with contextlib.suppress(Exception):
+            self.cursor.close()
+
+        with contextlib.suppress(OSError):
+            os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+
+            with open(self.log_file, "a") as f:
+                for label, peak in self.peaks.items():
+                    f.write(
+                        json.dumps(
+                            {"database": self.database, "step": label, **peak}
+                        )
+                        + "\n"
+                    )
+
+
+def read_log(log_file: str) -> Dict[str, Dict]:
+    """The peaks and time of each step in a log, over every connection that
+    wrote to it."""
+
+    steps: Dict[str, Dict] = {}
+
+    if not os.path.exists(log_file):
+        return steps
+
+    with open(log_file) as f:
+        for line in f:
+            entry = json.loads(line)
+            step = steps.setdefault(entry["step"], empty_step())
+
+            step["seconds"] += entry["seconds"]
+
+            if entry["duckdb_mb"] >= step["duckdb_mb"]:
+                step["duckdb_tags"] = entry["duckdb_tags"]
+
+            for measure in MEASURES:
+                step[measure] = max(step[measure], entry[measure])
+
+    return steps
+
+
+def update_report(report_file: str, timeline: List[Dict]) -> Dict:
+    """Add the stages that ran to the memory report.
+
+    Each stage keeps its peak resident memory, the peaks of its steps from
+    its memory log, and the same from the time before, which `print_memory`
+    compares them with. Stages that didn't run keep their last entry.
+
+    Args:
+        report_file (str): The JSON report.
+        timeline (List[Dict]): The pipeline's timeline, where each stage that
+            ran has a `memory_log` and `peak_rss_mb`.
+
+    Returns:
+        Dict: The report.
+    """
+
+    report: Dict[str, Dict] = {}
+
+    if os.path.exists(report_file):
+        with open(report_file) as f:
+            report = json.load(f)
+
+    for entry in timeline:
+        if "memory_log" not in entry:
+            continue
+
+        previous = report.get(entry["stage"], {})
+        previous.pop("previous", None)
+
+        report[entry["stage"]] = {
+            "status": entry["status"],
+            "peak_rss_mb": entry.get("peak_rss_mb"),
+            "steps": read_log(entry["memory_log"]),
+            "previous": previous,
+        }
+
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def change(now: float | None, before: float | None) -> str:
+    """The change from before, flagged with "!" past the thresholds."""
+
+    if not now or not before:
+        return ""
+
+    flag = (
+        "!"
+        if now > before * (1 + REGRESSION) and now - before >= REGRESSION_MB
+        else ""
+    )
+
+    return f"{now / before - 1:+.0%}{flag}"
+
+
+def print_memory(report: Dict, stages: List[str], top: int = 5):
+    """Print the peak memory of each stage and its largest steps, with the
+    change from the run before.
+
+    Args:
+        report (Dict): From `update_report`.
+        stages (List[str]): The stages to print.
+        top (int, optional): The steps to print for each. Defaults to 5.
+    """
+
+    stages = [s for s in stages if s in report]
+
+    if not stages:
+        return
+
+    print(
+        f"\n{'stage / step':<56} {'RSS MB':>8} {'change':>7} "
+        f"{'DuckDB':>8} {'spilled':>8} {'Arrow':>8}"
+    )
+
+    for stage in stages:
+        entry = report[stage]
+        before = entry["previous"]
+
+        print(
+            f"{stage:<56} {entry['peak_rss_mb'] or 0:>8.0f} "
+            f"{change(entry['peak_rss_mb'], before.get('peak_rss_mb')):>7}"
+        )
+
+        steps = sorted(entry["steps"].items(), key=lambda s: -s[1]["rss_mb"])
+
+        for name, step in steps[:top]:
+            old = before.get("steps", {}).get(name, {})
+            spilled = max(step["duckdb_temp_mb"], step["temp_files_mb"])
+            tags = ", ".join(step["duckdb_tags"])
+
+            print(
+                f"  {name[-54:]:<54} {step['rss_mb']:>8.0f} "
+                f"{change(step['rss_mb'], old.get('rss_mb')):>7} "
+                f"{step['duckdb_mb']:>8.0f} {spilled:>8.0f} "
+                f"{step['arrow_mb']:>8.0f}" + (f"  {tags}" if tags else "")
+            )
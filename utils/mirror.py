@@ -0,0 +1,434 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from utils.duckdb import DuckDB
+from utils.sources import mirror
+from utils.synthetic import HD_EDITIONS, STATES
+
+# the editions the build scripts download.
+CENSUS_EDITIONS = {
+    "state": 2025,
+    "county": 2025,
+    "zcta520": 2025,
+    "unsd": 2024,
+}
+NCES_YEARS = list(range(2019, 2024))
+NCES_TYPES = ["public", "private", "postsecondary"]
+
+CHUNK = 2**16
+
+
+def archive_sources(state_fips: List[str]) -> Dict[str, List[Any]]:
+    """The objects the build scripts download with, by the database their
+    data goes in.
+
+    Args:
+        state_fips (List[str]): The states with a school district file.
+    """
+
+    from data_collection.hd import HD
+    from data_collection.nsc import NSC
+    from data_collection.us_census.counties import CountyData
+    from data_collection.us_census.school_districts import SchoolData
+    from data_collection.us_census.states import StateData
+    from data_collection.us_census.zip_codes import ZIPCodeData
+    from utils.nces import NCES
+
+    return {
+        "geography": [
+            StateData(CENSUS_EDITIONS["state"]),
+            CountyData(CENSUS_EDITIONS["county"]),
+            ZIPCodeData(CENSUS_EDITIONS["zcta520"]),
+            *[SchoolData(CENSUS_EDITIONS["unsd"], f) for f in state_fips],
+        ],
+        "ipeds": [HD(HD_EDITIONS)],
+        "nces": [NCES(y, t) for y in NCES_YEARS for t in NCES_TYPES],
+        "nsc": [NSC()],
+    }
+
+
+def archive_path(root: str, url: str) -> str:
+    """Where the file at a URL is kept in a mirror, which is under its host
+    and path, like `wget --force-directories` lays it out."""
+
+    mirror_url = mirror()
+
+    if mirror_url and url.startswith(mirror_url):
+        rest = url[len(mirror_url) :]
+    else:
+        rest = url.split("://", 1)[1]
+
+    return os.path.join(root, *rest.strip("/").split("/"))
+
+
+class MirrorHandler(SimpleHTTPRequestHandler):
+    server: "MirrorServer"
+
+    def do_GET(self):
+        self.prepare()
+        super().do_GET()
+
+    def do_HEAD(self):
+        self.prepare()
+        super().do_HEAD()
+
+    def prepare(self):
+        time.sleep(self.server.latency)
+
+        if self.server.record:
+            self.record()
+
+    def record(self):
+        """Download a missing file from its host into the mirror.
+
+        A directory listing is kept as its `index.html`, which is what is
+        served for the directory afterwards.
+        """
+
+        import requests
+
+        path = urllib.parse.urlsplit(self.path).path
+        dest = self.translate_path(self.path)
+
+        if path.endswith("/"):
+            dest = os.path.join(dest, "index.html")
+
+        if os.path.exists(dest):
+            return
+
+        with requests.get("https://" + path.lstrip("/"), stream=True) as resp:
+            # anything else is left to be a 404.
+            if resp.status_code != 200:
+                return
+
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+            temp = f"{dest}.{threading.get_ident()}.tmp"
+
+            with open(temp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=CHUNK):
+                    f.write(chunk)
+
+            os.replace(temp, dest)
+
+    def copyfile(self, source, outputfile):  # type: ignore
+        if not self.server.bandwidth:
+            return super().copyfile(source, outputfile)
+
+        start = time.perf_counter()
+        sent = 0
+
+        while chunk := source.read(CHUNK):
+            outputfile.write(chunk)
+            sent += len(chunk)
+
+            # sleep off however far ahead of the bandwidth this is.
+            elapsed = time.perf_counter() - start
+            ahead = sent / self.server.bandwidth - elapsed
+
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def log_message(self, format: str, *args: Any):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MirrorServer(ThreadingHTTPServer):
+    """
+    Serve a directory of recorded or synthetic source files over HTTP.
+
+    Files are kept under their host and path, so with `CROSSWALK_MIRROR` set
+    to `url` the build scripts download from here instead (see
+    `utils/sources.py`). Each response can be held back by a latency and
+    each connection limited to a bandwidth, to look like the real servers.
+
+    With `record`, a file that isn't in the mirror is downloaded from its
+    host first, so running the builds once through a recording mirror fills
+    it for running offline.
+
+    It runs in a thread while used as a context manager.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        root: str,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        bandwidth: float | None = None,
+        latency: float = 0.0,
+        record: bool = False,
+        verbose: bool = False,
+    ):
+        """
+        Args:
+            root (str): The mirror directory.
+            host (str, optional): Defaults to "127.0.0.1".
+            port (int, optional): 0 picks a free port. Defaults to 0.
+            bandwidth (float | None, optional): Megabytes per second for each
+                connection. Defaults to None, which isn't limited.
+            latency (float, optional): Seconds before each response.
+                Defaults to 0.0.
+            record (bool, optional): Download missing files from their hosts.
+                Defaults to False.
+            verbose (bool, optional): Log each request. Defaults to False.
+        """
+
+        self.root = os.path.abspath(root)
+        self.bandwidth = bandwidth * 2**20 if bandwidth else None
+        self.latency = latency
+        self.record = record
+        self.verbose = verbose
+
+        os.makedirs(self.root, exist_ok=True)
+
+        super().__init__(
+            (host, port), partial(MirrorHandler, directory=self.root)
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):  # type: ignore
+        self.shutdown()
+        self.server_close()
+
+
+class SyntheticArchives:
+    """
+    Write the files the build scripts download, from synthetic data.
+
+    The data written by `SyntheticData` is turned back into the TIGER
+    shapefiles, IPEDS CSVs, NCES EDGE workbooks and NSC workbook it stands
+    for, zipped the way the real ones are, and laid out like a mirror. So
+    ingesting them builds the same tables as the synthetic data.
+
+    The College Board's PDF of college codes and the scraped sources aren't
+    written, so those have to be recorded.
+
+    A year without a synthetic NCES edition repeats the closest edition
+    before it.
+    """
+
+    def __init__(self, data_dir: str):
+        """
+        Args:
+            data_dir (str): Where `SyntheticData` wrote the data.
+        """
+
+        self.data_dir = data_dir
+        self.files: Dict[str, Dict[str, int]] = {}
+
+    def write(self, root: str):
+        """Write every file into a mirror, along with `archives.json`,
+        which has the size and rows of each.
+
+        Args:
+            root (str): The mirror directory.
+        """
+
+        self.root = root
+
+        with DuckDB() as duck:
+            duck.install_and_load_extension("spatial", use_https=True)
+            duck.install_and_load_extension("excel", use_https=True)
+
+            for db in ["geography", "ipeds", "nces", "nsc"]:
+                duck.attach_db(
+                    os.path.join(self.data_dir, db + ".duckdb"),
+                    read_only=True,
+                )
+
+            sources = archive_sources([fips for fips, _, _ in STATES])
+
+            self.write_census(duck, sources["geography"])
+            self.write_ipeds(duck, sources["ipeds"][0])
+            self.write_nces(duck, sources["nces"])
+            self.write_nsc(duck, sources["nsc"][0])
+
+        with open(os.path.join(root, "archives.json"), "w") as f:
+            json.dump({"files": self.files}, f, indent=2)
+
+    def add(self, url: str, staging: str, rows: int):
+        """Zip the files in `staging` into the mirror, at the URL's path,
+        unless the URL is the file itself."""
+
+        dest = archive_path(self.root, url)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+        if dest.endswith(".zip"):
+            with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED) as z:
+                for directory, _, files in os.walk(staging):
+                    for file in sorted(files):
+                        path = os.path.join(directory, file)
+                        z.write(path, os.path.relpath(path, staging))
+        else:
+            (file,) = os.listdir(staging)
+            shutil.copyfile(os.path.join(staging, file), dest)
+
+        self.files[os.path.relpath(dest, self.root)] = {
+            "bytes": os.path.getsize(dest),
+            "rows": rows,
+        }
+
+    def copy(
+        self, duck: DuckDB, url: str, query: str, file: str, options: str
+    ):
+        """Write a query to `file` in a staging directory, then add it."""
+
+        with tempfile.TemporaryDirectory() as staging:
+            path = os.path.join(staging, file)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            duck.execute(f"COPY ({query}) TO '{path}' ({options})")
+
+            rows = duck.sql(f"select count(*) from ({query})").fetchone()
+
+            self.add(url, staging, rows[0])  # type: ignore
+
+    def write_census(self, duck: DuckDB, census: List[Any]):
+        for x in census:
+            query = f"select * exclude (edition) from geography.{x.table_name}"
+
+            if x.state != "us":
+                query += f" where statefp = '{x.state}'"
+
+            self.copy(
+                duck,
+                x.url,
+                query,
+                x.base_name + ".shp",
+                "FORMAT gdal, DRIVER 'ESRI Shapefile', SRS 'EPSG:4269'",
+            )
+
+    def write_ipeds(self, duck: DuckDB, hd: Any):
+        for x in hd.ipeds:
+            self.copy(
+                duck,
+                x.url,
+                "select * exclude (edition) from ipeds.hd "
+                f"where edition = {x.year} order by unitid",
+                x.base_name + ".csv",
+                "HEADER",
+            )
+
+    def write_nces(self, duck: DuckDB, nces: List[Any]):
+        editions = {
+            kind: [
+                e
+                for (e,) in duck.sql(
+                    f"select distinct edition from nces.{kind} order by 1"
+                ).fetchall()
+            ]
+            for kind in ["public", "private"]
+        }
+
+        for x in nces:
+            if x.table_name == "postsecondary":
+                query = (
+                    "select unitid, name: instnm, street: addr, city, "
+                    "state: stabbr, zip, stfip: lpad(fips::VARCHAR, 2, '0'), "
+                    "cnty: countycd::VARCHAR, nmcnty: countynm, "
+                    "lat: latitude::DOUBLE, lon: longitud::DOUBLE "
+                    f"from ipeds.hd where edition = {x.year} order by unitid"
+                )
+            else:
+                available = editions[x.table_name]
+                edition = max(
+                    [e for e in available if e <= x.year] or available[:1]
+                )
+
+                query = (
+                    "select * exclude (edition) "
+                    f"from nces.{x.table_name} where edition = {edition}"
+                )
+
+            self.copy(
+                duck,
+                x.url,
+                query,
+                os.path.relpath(x.excel_file, x.extracted_location),
+                "FORMAT xlsx, HEADER true",
+            )
+
+    def write_nsc(self, duck: DuckDB, nsc: Any):
+        self.copy(
+            duck,
+            nsc.url,
+            "from nsc.nsc_to_ipeds",
+            nsc.file_name,
+            "FORMAT xlsx, HEADER true, SHEET 'NSC_to_IPEDS_UNIT_ID'",
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve the source files from a local mirror."
+    )
+    parser.add_argument("--root", default="mirror", help="(default: mirror)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        help="megabytes per second for each connection (default: no limit)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds before each response (default: 0)",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="download missing files from their hosts into the mirror",
+    )
+    parser.add_argument(
+        "--synthetic",
+        metavar="DATA_DIR",
+        help="first write the files from synthetic data in DATA_DIR "
+        "(see utils/synthetic.py)",
+    )
+    args = parser.parse_args()
+
+    if args.synthetic:
+        SyntheticArchives(args.synthetic).write(args.root)
+
+    with MirrorServer(
+        args.root,
+        host=args.host,
+        port=args.port,
+        bandwidth=args.bandwidth,
+        latency=args.latency,
+        record=args.record,
+        verbose=True,
+    ) as server:
+        print(f"Serving {server.root} on {server.url}")
+        print(f"Build with CROSSWALK_MIRROR={server.url}")
+
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
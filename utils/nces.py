@@ -4,14 +4,13 @@ import time
 from collections import defaultdict
 from typing import List
 
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
-
+# selenium and pandas are imported where they are used, so that importing
+# this module doesn't load them, or need them installed.
+from utils.browser import selenium
 from utils.conditionals import conditional_download, conditional_extract
 from utils.duckdb import DuckDB
+from utils.sources import source_url
+from utils.telemetry import Telemetry
 
 os.environ["DC_STATEHOOD"] = "1"
 import us  # type: ignore
@@ -39,7 +38,7 @@ class NCES:
         self.file_name = f"EDGE_GEOCODE_{self.school_type}_{self.year_abb}.zip"
         self.base_name = self.file_name[:-4]
 
-        self.base_url = "https://nces.ed.gov/programs/edge/data/"
+        self.base_url = source_url("nces", "programs", "edge", "data", "")
         self.url = self.base_url + self.file_name
 
         self.raw_file_loc = os.path.join("raw-data", self.file_name)
@@ -122,18 +121,64 @@ class NCES:
             )
 
             # if not present, insert it.
+            # columns come and go between years, so insert them by name.
             if current_rows_present == 0:
-                duck.execute(f"INSERT INTO {self.table_name} " + sql)
+                self.widen_table(duck, sql)
+                duck.execute(f"INSERT INTO {self.table_name} BY NAME " + sql)
+
+    def widen_table(self, duck: DuckDB, sql: str):
+        """Make room in the table for another edition.
+
+        The table is created from the first edition loaded, so columns that
+        later years add are added to it, and a column whose type changed is
+        cast to the type that holds both, such as VARCHAR for a column that
+        gained letters.
+
+        Args:
+            duck (DuckDB): A DuckDB object.
+            sql (str): The query for the edition.
+        """
+
+        current = dict(
+            duck.sql(
+                "select column_name, column_type "
+                f"from (describe {self.table_name})"
+            ).fetchall()
+        )
+
+        incoming = duck.sql(
+            f"select column_name, column_type from (describe {sql})"
+        ).fetchall()
+
+        for column, column_type in incoming:
+            if column not in current:
+                duck.execute(
+                    f'ALTER TABLE {self.table_name} ADD COLUMN "{column}" '
+                    f"{column_type}"
+                )
+                continue
+
+            # a union takes the type that holds both of its inputs.
+            (common,) = duck.sql(
+                f"select typeof(x) from (select x: null::{current[column]} "
+                f"union all select null::{column_type}) limit 1"
+            ).fetchone()  # type: ignore
+
+            if common != current[column]:
+                duck.execute(
+                    f'ALTER TABLE {self.table_name} ALTER "{column}" '
+                    f"SET DATA TYPE {common}"
+                )
 
 
 class NeoNCES:
     def __init__(self, duck: DuckDB):
-        self.public_url = "https://nces.ed.gov/ccd/schoolsearch/"
-        self.private_url = (
-            "https://nces.ed.gov/surveys/pss/privateschoolsearch/"
+        self.public_url = source_url("nces", "ccd", "schoolsearch", "")
+        self.private_url = source_url(
+            "nces", "surveys", "pss", "privateschoolsearch", ""
         )
 
-        self.driver = webdriver.Chrome()
+        self.driver = selenium().webdriver.Chrome()
 
         self.storage_path = os.path.join("extracted-zips", "nces")
         if not os.path.exists(self.storage_path):
@@ -170,16 +215,18 @@ class NeoNCES:
         extension.
         """
 
+        web = selenium()
+
         # this opens a new window
-        self.driver.find_element(By.CLASS_NAME, "excelclass").click()
+        self.driver.find_element(web.By.CLASS_NAME, "excelclass").click()
 
         time.sleep(1)
 
         # switch to the new window
         self.driver.switch_to.window(self.driver.window_handles[-1])
 
-        buttons = WebDriverWait(self.driver, 10).until(
-            EC.visibility_of_all_elements_located((By.TAG_NAME, "a"))
+        buttons = web.WebDriverWait(self.driver, 10).until(
+            web.EC.visibility_of_all_elements_located((web.By.TAG_NAME, "a"))
         )
 
         time.sleep(1)
@@ -212,19 +259,28 @@ class NeoNCES:
         self.driver.switch_to.window(self.driver.window_handles[0])
 
     def iterate(self, public_private: str):
-        for state in self.state_fips:
-            file = os.path.join(
-                f"extracted-zips/nces/{public_private}_{state}.html"
-            )
-
-            # if it exists, skip it.
-            if not os.path.exists(file):
-                self.go_to_state(str(state), public_private)
-                self.download_excel(public_private, str(state))
+        with Telemetry(
+            f"nces_{public_private}", total=len(self.state_fips)
+        ) as telemetry:
+            for state in self.state_fips:
+                file = os.path.join(
+                    f"extracted-zips/nces/{public_private}_{state}.html"
+                )
+
+                # if it exists, skip it.
+                if os.path.exists(file):
+                    telemetry.skip()
+                    continue
+
+                with telemetry.item(str(state)):
+                    self.go_to_state(str(state), public_private)
+                    self.download_excel(public_private, str(state))
 
                 time.sleep(1)
 
     def gather(self):
+        import pandas as pd
+
         public_tables: List[pd.DataFrame] = []
         private_tables: List[pd.DataFrame] = []
 
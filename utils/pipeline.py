@@ -0,0 +1,517 @@
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Dict, List, Sequence, Set
+
+from utils.duckdb import DuckDB
+from utils.memory import update_report, wait_for
+
+
+class File:
+    """A file or a directory of files, compared by content."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.key = f"file:{os.path.normpath(path)}"
+        self.name = path
+
+    def exists(self, duck: DuckDB) -> bool:
+        return os.path.exists(self.path)
+
+    def fingerprint(self, duck: DuckDB) -> str | None:
+        if not os.path.exists(self.path):
+            return None
+
+        if os.path.isfile(self.path):
+            files = [self.path]
+        else:
+            files = sorted(
+                os.path.join(root, f)
+                for root, _, names in os.walk(self.path)
+                for f in names
+            )
+
+        digest = hashlib.sha1()
+
+        for file in files:
+            digest.update(os.path.relpath(file, self.path).encode())
+
+            with open(file, "rb") as f:
+                digest.update(hashlib.file_digest(f, "sha1").digest())
+
+        return digest.hexdigest()
+
+
+class Table:
+    """A table in a DuckDB file, compared by its row count and row hashes."""
+
+    def __init__(self, db_file: str, table: str):
+        self.db_file = db_file
+        self.table = table
+        self.db = os.path.basename(db_file).removesuffix(".duckdb")
+        self.key = f"table:{os.path.normpath(db_file)}:{table}"
+        self.name = f"{self.db}.{table}"
+
+    def attach(self, duck: DuckDB) -> bool:
+        if not os.path.exists(self.db_file):
+            return False
+
+        duck.attach_db(self.db_file, read_only=True)
+
+        return bool(
+            duck.sql(
+                "select * from duckdb_tables() "
+                "where database_name = ? and table_name = ?",
+                params=[self.db, self.table],
+            ).fetchall()
+        )
+
+    def exists(self, duck: DuckDB) -> bool:
+        try:
+            return self.attach(duck)
+        finally:
+            duck.execute(f"DETACH DATABASE IF EXISTS {self.db}")
+
+    def fingerprint(self, duck: DuckDB) -> str | None:
+        try:
+            if not self.attach(duck):
+                return None
+
+            rows, total = duck.sql(
+                f"select count(*), sum(hash(t)) from {self.name} t"
+            ).fetchone()  # type: ignore
+
+            return f"{rows}:{total}"
+        finally:
+            duck.execute(f"DETACH DATABASE IF EXISTS {self.db}")
+
+
+class Stage:
+    """
+    One step of the pipeline, which runs `python -m <module>`.
+
+    A stage depends on the stages whose outputs are among its inputs. The
+    module's own file is always an input, so editing it reruns the stage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        module: str,
+        inputs: Sequence[File | Table] = (),
+        outputs: Sequence[File | Table] = (),
+        resources: Dict[str, int] | None = None,
+    ):
+        """
+        Args:
+            name (str): The stage name.
+            module (str): The module to run, such as
+                "data_collection.us_census.states".
+            inputs (Sequence[File | Table], optional): What it reads.
+            outputs (Sequence[File | Table], optional): What it writes.
+            resources (Dict[str, int] | None, optional): How much of each
+                limited resource it uses, such as {"network": 1}.
+        """
+
+        spec = importlib.util.find_spec(module)
+
+        if spec is None or spec.origin is None:
+            raise ValueError(f"{module} is not a module.")
+
+        self.name = name
+        self.module = module
+        self.inputs = [File(os.path.relpath(spec.origin))] + list(inputs)
+        self.outputs = list(outputs)
+        self.resources = resources or {}
+
+    def files(self, artifacts: Sequence[File | Table]) -> Set[str]:
+        return {
+            os.path.normpath(a.db_file)
+            for a in artifacts
+            if isinstance(a, Table)
+        }
+
+
+class Pipeline:
+    """
+    Run the stages in dependency order, skipping those that are up to date.
+
+    Before a stage runs, its inputs are fingerprinted, and it is skipped when
+    they match the last successful run and its outputs exist. Since a table's
+    fingerprint is its content, a stage whose upstream reran without changing
+    anything is skipped too.
+
+    Stages that are ready run at the same time, up to `jobs`, as long as the
+    total of each resource stays under its limit. DuckDB lets one process
+    write to a file at a time, so a stage never runs alongside another that
+    writes a database file it reads, or reads one it writes. Stages writing
+    different tables of the same file can run together and take turns at
+    the file, as the geography builds do after downloading.
+
+    Each stage's memory is logged by step to `memory/<stage>.ndjson` (see
+    `utils/memory.py`), and its peak resident memory is read when it exits.
+    Both go into `memory.json`, next to those of the stage's previous run.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        state_dir: str = ".pipeline",
+        jobs: int = 4,
+        limits: Dict[str, int] | None = None,
+        lock_timeout: float = 3600,
+    ):
+        """
+        Args:
+            stages (Sequence[Stage]): Every stage.
+            state_dir (str, optional): Where the fingerprints of the last
+                runs, the logs, and the timeline are kept. Defaults to
+                ".pipeline".
+            jobs (int, optional): Stages running at once. Defaults to 4.
+            limits (Dict[str, int] | None, optional): The amount of each
+                resource. Defaults to a core count of "cpu", and 1 of anything
+                else.
+            lock_timeout (float, optional): Seconds a stage waits for a
+                database file held by another stage. Defaults to 3600.
+        """
+
+        self.stages = {s.name: s for s in stages}
+        self.state_dir = state_dir
+        self.jobs = jobs
+        self.limits = {"cpu": os.cpu_count() or 1, **(limits or {})}
+        self.lock_timeout = lock_timeout
+
+        producers: Dict[str, str] = {}
+
+        for stage in stages:
+            for output in stage.outputs:
+                if output.key in producers:
+                    raise ValueError(
+                        f"{output.name} is written by both "
+                        f"{producers[output.key]} and {stage.name}."
+                    )
+
+                producers[output.key] = stage.name
+
+        self.dependencies: Dict[str, Set[str]] = {
+            s.name: {producers[i.key] for i in s.inputs if i.key in producers}
+            for s in stages
+        }
+
+        self.order = self.sort()
+
+        self.state_file = os.path.join(state_dir, "state.json")
+        self.state: Dict[str, Dict[str, Dict[str, str | None]]] = {}
+
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+
+        self.lock = threading.Lock()
+        self.memory: Dict[str, Dict] = {}
+
+    def sort(self) -> List[str]:
+        """The stages in dependency order, keeping the declared order."""
+
+        order: List[str] = []
+        remaining = list(self.stages)
+
+        while remaining:
+            ready = [
+                s for s in remaining if self.dependencies[s] <= set(order)
+            ]
+
+            if not ready:
+                raise ValueError(
+                    f"The stages {remaining} depend on each other."
+                )
+
+            order += ready
+            remaining = [s for s in remaining if s not in ready]
+
+        return order
+
+    def upstream(self, targets: Sequence[str]) -> List[str]:
+        """The targets and every stage they depend on, in order."""
+
+        needed: Set[str] = set()
+        stack = list(targets)
+
+        while stack:
+            name = stack.pop()
+
+            if name not in self.stages:
+                raise ValueError(f"{name} is not a stage.")
+
+            if name not in needed:
+                needed.add(name)
+                stack += self.dependencies[name]
+
+        return [s for s in self.order if s in needed]
+
+    def fingerprints(self, stage: Stage) -> Dict[str, str | None]:
+        with DuckDB(lock_timeout=self.lock_timeout) as duck:
+            return {i.key: i.fingerprint(duck) for i in stage.inputs}
+
+    def outdated(self, stage: Stage) -> str | None:
+        """Why a stage has to run, or None when it is up to date."""
+
+        last = self.state.get(stage.name)
+
+        if last is None:
+            return "never ran"
+
+        with DuckDB(lock_timeout=self.lock_timeout) as duck:
+            for output in stage.outputs:
+                if not output.exists(duck):
+                    return f"{output.name} is missing"
+
+        current = self.fingerprints(stage)
+
+        changed = [
+            i.name
+            for i in stage.inputs
+            if current[i.key] != last["inputs"].get(i.key)
+        ]
+
+        if changed:
+            return "changed: " + ", ".join(changed)
+
+        return None
+
+    def execute(
+        self,
+        stage: Stage,
+        force: bool,
+        dry_run: bool,
+        stale: Sequence[str] = (),
+    ) -> Dict:
+        """Check and run one stage, returning its timeline entry.
+
+        In a dry run nothing upstream actually reruns, so a stage is also
+        reported as outdated when any of the `stale` stages it depends on
+        would run, since its inputs may then change.
+        """
+
+        start = time.time()
+        reason = "forced" if force else self.outdated(stage)
+
+        if reason is None and dry_run and stale:
+            reason = "upstream would run: " + ", ".join(stale)
+
+        result: Dict = {"stage": stage.name, "start": start, "reason": reason}
+
+        if reason is None or dry_run:
+            result["status"] = "skipped" if reason is None else "outdated"
+            result["end"] = time.time()
+
+            return result
+
+        inputs = self.fingerprints(stage)
+
+        log_dir = os.path.join(self.state_dir, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        result["log"] = os.path.join(log_dir, stage.name + ".log")
+
+        memory_dir = os.path.join(self.state_dir, "memory")
+        os.makedirs(memory_dir, exist_ok=True)
+        result["memory_log"] = os.path.join(memory_dir, stage.name + ".ndjson")
+
+        if os.path.exists(result["memory_log"]):
+            os.remove(result["memory_log"])
+
+        environment = {
+            **os.environ,
+            "DUCKDB_LOCK_TIMEOUT": str(self.lock_timeout),
+            "PYTHONUNBUFFERED": "1",
+            "CROSSWALK_MEMORY_LOG": os.path.abspath(result["memory_log"]),
+        }
+
+        with open(result["log"], "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", stage.module],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                env=environment,
+            )
+
+            returncode, result["peak_rss_mb"] = wait_for(process)
+
+        result["end"] = time.time()
+        result["status"] = "ran" if returncode == 0 else "failed"
+
+        if returncode == 0:
+            with self.lock:
+                self.state[stage.name] = {"inputs": inputs}
+                self.save_state()
+
+        return result
+
+    def save_state(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        with open(self.state_file, "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def fits(self, stage: Stage, running: List[Stage]) -> bool:
+        """Whether a stage can start next to the running ones."""
+
+        if len(running) >= self.jobs:
+            return False
+
+        for resource, amount in stage.resources.items():
+            limit = self.limits.get(resource, 1)
+            used = sum(s.resources.get(resource, 0) for s in running)
+
+            # a stage wanting more than the limit runs alone.
+            if used and used + min(amount, limit) > limit:
+                return False
+
+        reads = stage.files(stage.inputs)
+        writes = stage.files(stage.outputs)
+
+        for other in running:
+            if reads & other.files(other.outputs):
+                return False
+            if writes & other.files(other.inputs):
+                return False
+
+        return True
+
+    def run(
+        self,
+        targets: Sequence[str] | None = None,
+        force: Sequence[str] = (),
+        dry_run: bool = False,
+    ) -> List[Dict]:
+        """Run the targets and what they depend on.
+
+        Args:
+            targets (Sequence[str] | None, optional): The stages to bring up
+                to date. Defaults to all of them.
+            force (Sequence[str], optional): Stages to run even when they are
+                up to date.
+            dry_run (bool, optional): Only report what is out of date.
+                Defaults to False.
+
+        Returns:
+            List[Dict]: The timeline, with the status, reason, start, and end
+                of each stage.
+        """
+
+        pending = self.upstream(targets or self.order)
+        start = time.time()
+
+        results: Dict[str, Dict] = {}
+        running: Dict[Future, Stage] = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    dependencies = self.dependencies[name]
+
+                    failed = [
+                        d
+                        for d in dependencies
+                        if results.get(d, {}).get("status")
+                        in ("failed", "blocked")
+                    ]
+
+                    if failed:
+                        results[name] = {
+                            "stage": name,
+                            "status": "blocked",
+                            "reason": "an upstream stage failed",
+                            "start": time.time(),
+                            "end": time.time(),
+                        }
+                        print(f"{name}: blocked (an upstream stage failed)")
+                        pending.remove(name)
+                        continue
+
+                    if not dependencies <= set(results):
+                        continue
+
+                    if not self.fits(stage, list(running.values())):
+                        continue
+
+                    stale = [
+                        d
+                        for d in sorted(dependencies)
+                        if results[d]["status"] == "outdated"
+                    ]
+
+                    running[
+                        executor.submit(
+                            self.execute, stage, name in force, dry_run, stale
+                        )
+                    ] = stage
+                    pending.remove(name)
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage = running.pop(future)
+                    results[stage.name] = future.result()
+
+                    print(
+                        f"{stage.name}: {results[stage.name]['status']}"
+                        + (
+                            f" ({results[stage.name]['reason']})"
+                            if results[stage.name]["reason"]
+                            else ""
+                        )
+                    )
+
+        timeline = sorted(results.values(), key=lambda r: r["start"])
+
+        for entry in timeline:
+            entry["start"] -= start
+            entry["end"] -= start
+
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        with open(os.path.join(self.state_dir, "timeline.json"), "w") as f:
+            json.dump(timeline, f, indent=2)
+
+        self.memory = update_report(
+            os.path.join(self.state_dir, "memory.json"), timeline
+        )
+
+        return timeline
+
+
+def print_timeline(timeline: List[Dict], width: int = 50):
+    """Draw where the wall time went, one bar per stage."""
+
+    total = max([e["end"] for e in timeline] + [1e-9])
+
+    print(
+        f"\n{'stage':<24} {'status':<8} {'seconds':>8}  "
+        f"wall time {total:.1f} s"
+    )
+
+    for entry in timeline:
+        begin = int(entry["start"] / total * width)
+        length = max(1, round((entry["end"] - entry["start"]) / total * width))
+        bar = " " * begin + "#" * min(length, width - begin)
+
+        print(
+            f"{entry['stage']:<24} {entry['status']:<8} "
+            f"{entry['end'] - entry['start']:>8.1f}  |{bar:<{width}}|"
+        )
@@ -0,0 +1,66 @@
+from typing import Any, Callable, Sequence
+
+import numpy as np
+import polars as pl
+from rapidfuzz import fuzz, process
+
+
+def pairwise_similarity(
+    left: Sequence[str | None],
+    right: Sequence[str | None],
+    scorer: Callable[..., Any] = fuzz.ratio,
+    processor: Callable[..., Any] | None = None,
+    workers: int = -1,
+) -> np.ndarray:
+    """Score aligned pairs of strings in one batch.
+
+    `left[i]` is compared to `right[i]` for every `i`. The comparisons run in
+    native code across all cores, so this replaces a Python loop over rows.
+
+    Args:
+        left (Sequence[str | None]): The first string of each pair.
+        right (Sequence[str | None]): The second string of each pair.
+        scorer (Callable, optional): A `rapidfuzz` scorer. Defaults to
+            `fuzz.ratio`.
+        processor (Callable | None, optional): A `rapidfuzz` processor
+            applied to every string first, such as `default_process`.
+            Defaults to None.
+        workers (int, optional): Number of threads, `-1` for all cores.
+            Defaults to -1.
+
+    Returns:
+        np.ndarray: A score between 0 and 100 for each pair. Pairs with a
+            missing string score 0.
+    """
+
+    if len(left) != len(right):
+        raise ValueError("Both sides must have the same number of strings.")
+
+    if len(left) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    return process.cpdist(
+        left,
+        right,
+        scorer=scorer,
+        processor=processor,
+        workers=workers,
+        dtype=np.float64,
+    )
+
+
+def ascii_only(strings: pl.Expr) -> pl.Expr:
+    """Drop characters 128 to 255, as `thefuzz` does before comparing.
+
+    Together with `default_process` as the processor of
+    `pairwise_similarity`, this gives the same strings that `thefuzz` scorers
+    compare, without a Python call per string.
+
+    Args:
+        strings (pl.Expr): A string column.
+
+    Returns:
+        pl.Expr: The column without those characters.
+    """
+
+    return strings.str.replace_all(r"[\x{80}-\x{ff}]", "")
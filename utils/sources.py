@@ -0,0 +1,50 @@
+import os
+
+# where each source is downloaded from.
+SOURCES = {
+    "census": "https://www2.census.gov",
+    "nces": "https://nces.ed.gov",
+    "nsc": "https://nscresearchcenter.org",
+    "collegeboard": "https://satsuite.collegeboard.org",
+    "ncaa": "https://web3.ncaa.org",
+}
+
+
+def mirror() -> str | None:
+    """The mirror in `CROSSWALK_MIRROR`, if there is one."""
+
+    return os.environ.get("CROSSWALK_MIRROR") or None
+
+
+def source_url(source: str, *path: str) -> str:
+    """Build a URL on one of the `SOURCES`.
+
+    `CROSSWALK_<SOURCE>_URL`, such as `CROSSWALK_CENSUS_URL`, replaces the
+    base URL of one source. Otherwise `CROSSWALK_MIRROR` points every source
+    at a mirror (see `utils/mirror.py`), which keeps the host as the first
+    part of the path, so `https://nces.ed.gov/ipeds/` becomes
+    `<mirror>/nces.ed.gov/ipeds/`.
+
+    The environment is read on every call, so it can be set after import.
+
+    Args:
+        source (str): A key of `SOURCES`.
+        *path (str): The parts of the path, joined with "/".
+
+    Returns:
+        str: The URL.
+    """
+
+    if source not in SOURCES:
+        raise ValueError(f"{source} is not a known source.")
+
+    base = os.environ.get(f"CROSSWALK_{source.upper()}_URL")
+
+    if not base:
+        base = SOURCES[source]
+        mirror_url = mirror()
+
+        if mirror_url:
+            base = mirror_url.rstrip("/") + "/" + base.split("://", 1)[1]
+
+    return "/".join([base.rstrip("/"), *path])
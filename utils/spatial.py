@@ -0,0 +1,105 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# mean Earth radius
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unit_vectors(
+    latitude: Sequence[float] | np.ndarray,
+    longitude: Sequence[float] | np.ndarray,
+) -> np.ndarray:
+    """Convert coordinates in degrees to points on the unit sphere.
+
+    Straight-line distance between these points increases with the
+    great-circle distance, so a KD-tree over them gives true nearest
+    neighbours without any special handling of longitude.
+
+    Args:
+        latitude (Sequence[float] | np.ndarray): Latitudes in degrees.
+        longitude (Sequence[float] | np.ndarray): Longitudes in degrees.
+
+    Returns:
+        np.ndarray: An `(n, 3)` array.
+    """
+
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+def km_to_chord(km: float | np.ndarray) -> float | np.ndarray:
+    return 2 * np.sin(np.asarray(km) / (2 * EARTH_RADIUS_KM))
+
+
+def chord_to_km(chord: float | np.ndarray) -> float | np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+class PointIndex:
+    """
+    A KD-tree over latitude/longitude points for nearest neighbour searches.
+
+    Building the tree is `O(n log n)` and each query only visits nearby
+    points, so there is never a pairwise distance computation.
+    """
+
+    def __init__(
+        self,
+        latitude: Sequence[float] | np.ndarray,
+        longitude: Sequence[float] | np.ndarray,
+    ):
+        self.tree = cKDTree(unit_vectors(latitude, longitude))
+        self.n = self.tree.n
+
+    def query(
+        self,
+        latitude: Sequence[float] | np.ndarray,
+        longitude: Sequence[float] | np.ndarray,
+        k: int = 5,
+        radius_km: float = 1.0,
+        workers: int = -1,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find the `k` nearest indexed points within a radius.
+
+        Args:
+            latitude (Sequence[float] | np.ndarray): Query latitudes.
+            longitude (Sequence[float] | np.ndarray): Query longitudes.
+            k (int, optional): Neighbours per query point. Defaults to 5.
+            radius_km (float, optional): Search radius in kilometers.
+                Defaults to 1.0.
+            workers (int, optional): Threads used, `-1` for all cores.
+                Defaults to -1.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Flat arrays of the
+                query position, the indexed position, and the distance in
+                kilometers for every neighbour that was found, ordered by
+                query and then distance.
+        """
+
+        if self.n == 0 or len(latitude) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float64)
+
+        chord, found = self.tree.query(
+            unit_vectors(latitude, longitude),
+            k=min(k, self.n),
+            distance_upper_bound=float(km_to_chord(radius_km)),
+            workers=workers,
+        )
+
+        chord = np.asarray(chord).reshape(len(latitude), -1)
+        found = np.asarray(found).reshape(len(latitude), -1)
+
+        # misses are padded with an infinite distance.
+        hit = np.isfinite(chord)
+
+        query = np.nonzero(hit)[0]
+
+        return query, found[hit], np.asarray(chord_to_km(chord[hit]))
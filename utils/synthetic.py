@@ -0,0 +1,1125 @@
+import json
+import math
+import os
+from typing import Dict, List
+
+from data_collection.hd import HD
+from utils.duckdb import DuckDB
+
+# the states and DC, with their FIPS codes.
+STATES = [
+    ("01", "AL", "Alabama"),
+    ("02", "AK", "Alaska"),
+    ("04", "AZ", "Arizona"),
+    ("05", "AR", "Arkansas"),
+    ("06", "CA", "California"),
+    ("08", "CO", "Colorado"),
+    ("09", "CT", "Connecticut"),
+    ("10", "DE", "Delaware"),
+    ("11", "DC", "District of Columbia"),
+    ("12", "FL", "Florida"),
+    ("13", "GA", "Georgia"),
+    ("15", "HI", "Hawaii"),
+    ("16", "ID", "Idaho"),
+    ("17", "IL", "Illinois"),
+    ("18", "IN", "Indiana"),
+    ("19", "IA", "Iowa"),
+    ("20", "KS", "Kansas"),
+    ("21", "KY", "Kentucky"),
+    ("22", "LA", "Louisiana"),
+    ("23", "ME", "Maine"),
+    ("24", "MD", "Maryland"),
+    ("25", "MA", "Massachusetts"),
+    ("26", "MI", "Michigan"),
+    ("27", "MN", "Minnesota"),
+    ("28", "MS", "Mississippi"),
+    ("29", "MO", "Missouri"),
+    ("30", "MT", "Montana"),
+    ("31", "NE", "Nebraska"),
+    ("32", "NV", "Nevada"),
+    ("33", "NH", "New Hampshire"),
+    ("34", "NJ", "New Jersey"),
+    ("35", "NM", "New Mexico"),
+    ("36", "NY", "New York"),
+    ("37", "NC", "North Carolina"),
+    ("38", "ND", "North Dakota"),
+    ("39", "OH", "Ohio"),
+    ("40", "OK", "Oklahoma"),
+    ("41", "OR", "Oregon"),
+    ("42", "PA", "Pennsylvania"),
+    ("44", "RI", "Rhode Island"),
+    ("45", "SC", "South Carolina"),
+    ("46", "SD", "South Dakota"),
+    ("47", "TN", "Tennessee"),
+    ("48", "TX", "Texas"),
+    ("49", "UT", "Utah"),
+    ("50", "VT", "Vermont"),
+    ("51", "VA", "Virginia"),
+    ("53", "WA", "Washington"),
+    ("54", "WV", "West Virginia"),
+    ("55", "WI", "Wisconsin"),
+    ("56", "WY", "Wyoming"),
+]
+
+# the states are laid out as a grid of rectangles over the lower 48.
+COLUMNS = 8
+ROWS = 7
+WEST, SOUTH, EAST, NORTH = -124.0, 25.0, -67.0, 49.0
+WIDTH = (EAST - WEST) / COLUMNS
+HEIGHT = (NORTH - SOUTH) / ROWS
+
+# the approximate national counts, which a scale of 1 reproduces.
+COUNTS = {
+    "county": 3_150,
+    "school_district": 10_900,
+    "zcta": 33_800,
+    "public": 100_000,
+    "private": 22_000,
+    "unlisted": 2_000,
+    "institution": 6_500,
+}
+
+PUBLIC_EDITIONS = [2021, 2022, 2023]
+PRIVATE_EDITIONS = [2019, 2021, 2023]
+HD_EDITIONS = list(range(2009, 2024 + 1))
+GEOGRAPHY_EDITION = 2024
+
+NAMESAKES = [
+    "Lincoln",
+    "Washington",
+    "Jefferson",
+    "Roosevelt",
+    "Kennedy",
+    "Franklin",
+    "Madison",
+    "Jackson",
+    "Adams",
+    "Hamilton",
+    "Edison",
+    "Whitman",
+    "Twain",
+    "Hawthorne",
+    "Emerson",
+    "Frost",
+    "Carver",
+    "Douglass",
+    "Tubman",
+    "Parks",
+    "Chavez",
+    "Pioneer",
+    "Central",
+    "North",
+    "South",
+    "East",
+    "West",
+    "Valley",
+    "Ridge",
+    "Lakeview",
+    "Riverside",
+    "Hillcrest",
+    "Oak Grove",
+    "Pine Ridge",
+    "Cedar Creek",
+    "Maple",
+    "Willow",
+    "Sunset",
+    "Meadow",
+    "Prairie",
+    "Mountain View",
+    "Heritage",
+    "Liberty",
+    "Independence",
+    "Freedom",
+    "Patriot",
+    "Eagle",
+    "Summit",
+    "Crestview",
+    "Highland",
+    "Fairview",
+    "Greenwood",
+    "Brookside",
+    "Westwood",
+    "Sacred Heart",
+    "Saint Mary",
+    "Saint Joseph",
+    "Holy Family",
+    "Trinity",
+    "Grace",
+]
+PLACE_START = [
+    "Spring",
+    "Green",
+    "Fair",
+    "Oak",
+    "River",
+    "Lake",
+    "Mill",
+    "Brook",
+    "Ash",
+    "Clear",
+    "Rock",
+    "Bell",
+    "Elm",
+    "Wood",
+    "Glen",
+    "Maple",
+    "Pine",
+    "Cedar",
+    "Stone",
+    "Red",
+    "White",
+    "Silver",
+    "Golden",
+    "Harbor",
+]
+PLACE_END = [
+    "field",
+    "ville",
+    "ton",
+    "wood",
+    "dale",
+    "port",
+    "burg",
+    "view",
+    "land",
+    "ford",
+    "mont",
+    " City",
+    " Springs",
+    " Falls",
+    " Heights",
+]
+STREETS = [
+    "Main",
+    "Oak",
+    "Maple",
+    "Park",
+    "Pine",
+    "Cedar",
+    "Elm",
+    "Washington",
+    "Lake",
+    "Hill",
+    "Church",
+    "School",
+    "College",
+    "Center",
+    "Mill",
+]
+STREET_TYPES = ["Street", "Avenue", "Road", "Drive", "Lane", "Boulevard"]
+
+SCHOOL_TYPES = {
+    "elementary": ["Elementary School", "Elementary", "Primary School"],
+    "middle": ["Middle School", "Junior High School", "Intermediate School"],
+    "high": [
+        "High School",
+        "Senior High School",
+        "Junior Senior High School",
+        "Academy",
+    ],
+    "other": ["Learning Center", "Alternative School", "Charter School"],
+}
+PRIVATE_TYPES = [
+    "Christian Academy",
+    "Catholic School",
+    "Montessori School",
+    "Day School",
+    "Preparatory Academy",
+    "Christian School",
+]
+GRADES = {
+    "elementary": ("PK", "05"),
+    "middle": ("06", "08"),
+    "high": ("09", "12"),
+    "other": ("KG", "12"),
+}
+
+
+def array(words: List[str]) -> str:
+    quoted = ["'" + w.replace("'", "''") + "'" for w in words]
+
+    return "[" + ", ".join(quoted) + "]"
+
+
+class SyntheticData:
+    """
+    Write CEEB, NCES, IPEDS HD, NSC, and census geography files that look
+    like the real ones, at any multiple of the national counts.
+
+    Every table has the columns the `data_collection` modules write, in the
+    same DuckDB files, so the crosswalks run on them unchanged. The states
+    are rectangles, each split into a grid of counties, school districts, and
+    ZCTAs, so a location's geography follows from its coordinates.
+
+    The CEEB, NCAA, and NSC records are copies of the NCES and IPEDS records
+    with a share of them changed the way the real ones differ: abbreviated
+    or misspelled names, rewritten addresses, missing coordinates, and
+    second codes for the same school. The true crosswalks are written to
+    `truth/schools.duckdb` and `truth/universities.duckdb`, in the shape the
+    crosswalk builders write.
+
+    Everything is generated in DuckDB from hashes of the row numbers, so the
+    same arguments give the same files.
+    """
+
+    def __init__(
+        self,
+        scale: float = 1,
+        noise: float = 0.2,
+        duplicates: float = 0.02,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            scale (float, optional): Multiplies the national counts. Defaults
+                to 1.
+            noise (float, optional): The share of copied records with a
+                changed name, address, city, or ZIP code. Defaults to 0.2.
+            duplicates (float, optional): The share of CEEB records with a
+                second code. Defaults to 0.02.
+            seed (int, optional): Defaults to 0.
+        """
+
+        self.scale = scale
+        self.noise = noise
+        self.duplicates = duplicates
+        self.seed = seed
+
+        def count(name: str) -> int:
+            return max(1, round(COUNTS[name] * scale))
+
+        def grid(name: str) -> int:
+            return max(1, math.ceil(math.sqrt(count(name) / len(STATES))))
+
+        self.counts = {name: count(name) for name in COUNTS}
+        self.grids = {
+            name: grid(name) for name in ["county", "school_district", "zcta"]
+        }
+
+    def write(self, output_dir: str):
+        """Write every file, replacing any already there.
+
+        Args:
+            output_dir (str): The directory, which is used like `clean-data`.
+        """
+
+        os.makedirs(os.path.join(output_dir, "truth"), exist_ok=True)
+
+        files = ["ceeb", "geography", "ipeds", "nces", "nsc"]
+        truth = ["schools", "universities"]
+
+        paths = [os.path.join(output_dir, f + ".duckdb") for f in files] + [
+            os.path.join(output_dir, "truth", f + ".duckdb") for f in truth
+        ]
+
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+        with DuckDB() as duck:
+            duck.install_and_load_extension("spatial", use_https=True)
+
+            for path in paths:
+                duck.attach_db(path)
+
+            self.create_macros(duck)
+            self.write_geography(duck)
+            self.create_school_base(duck)
+            self.write_nces(duck)
+            self.write_ceeb_schools(duck)
+            self.create_institution_base(duck)
+            self.write_ipeds(duck)
+            self.write_ceeb_universities(duck)
+            self.write_nsc(duck)
+            self.write_truth(duck)
+
+            counts = {
+                f"{database}.{table}": rows
+                for database, table, rows in duck.sql(
+                    "select database_name, table_name, estimated_size "
+                    "from duckdb_tables() where database_name != 'memory' "
+                    "order by all"
+                ).fetchall()
+            }
+
+        with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+            json.dump(
+                {
+                    "scale": self.scale,
+                    "noise": self.noise,
+                    "duplicates": self.duplicates,
+                    "seed": self.seed,
+                    "rows": counts,
+                },
+                f,
+                indent=2,
+            )
+
+    def create_macros(self, duck: DuckDB):
+        # a uniform number in [0, 1) and a word chosen by the hash of a key.
+        duck.execute(
+            "create or replace temp macro u(key, salt) as "
+            f"(hash(key, salt, {self.seed}) % 1000003) / 1000003.0"
+        )
+        duck.execute(
+            "create or replace temp macro pick(words, key, salt) as "
+            f"words[1 + (hash(key, salt, {self.seed}) % len(words))::INT]"
+        )
+
+        # the cell of a grid over a state holding a point, in row-major order.
+        duck.execute(
+            "create or replace temp macro cell(lon, lat, xmin, ymin, g) as "
+            f"least(floor((lon - xmin) / {WIDTH} * g), g - 1)::INT "
+            f"+ g * least(floor((lat - ymin) / {HEIGHT} * g), g - 1)::INT"
+        )
+
+        # neighboring ZCTAs share a city.
+        duck.execute(
+            "create or replace temp macro city_name(k, zcta_cell) as "
+            f"pick({array(PLACE_START)}, k * 1000003 + zcta_cell // 3, 'a') "
+            f"|| pick({array(PLACE_END)}, k * 1000003 + zcta_cell // 3, 'b')"
+        )
+
+        duck.execute(
+            "create or replace temp macro typo(name, r) as "
+            "left(name, (r * (length(name) - 2))::INT + 1) "
+            "|| substr(name, (r * (length(name) - 2))::INT + 3)"
+        )
+        duck.execute(
+            "create or replace temp macro swap(name, r) as "
+            "left(name, (r * (length(name) - 2))::INT) "
+            "|| substr(name, (r * (length(name) - 2))::INT + 2, 1) "
+            "|| substr(name, (r * (length(name) - 2))::INT + 1, 1) "
+            "|| substr(name, (r * (length(name) - 2))::INT + 3)"
+        )
+
+        duck.execute(
+            f"""
+            create or replace temp macro noisy_school(name, key) as
+            case (u(key, 'school variant') * 8)::INT
+                when 0 then upper(name)
+                when 1 then replace(
+                    replace(name, 'High School', 'HS'),
+                    'Elementary School', 'Elem'
+                )
+                when 2 then replace(name, 'Saint ', 'St. ')
+                when 3 then typo(name, u(key, 'school typo'))
+                when 4 then swap(name, u(key, 'school swap'))
+                when 5 then 'The ' || name
+                when 6 then replace(name, ' School', '')
+                else name || ' ' || pick({array(["Campus", "Main", "Upper"])}, key, 's')
+            end
+            """
+        )
+        duck.execute(
+            """
+            create or replace temp macro noisy_address(address, key) as
+            case (u(key, 'address variant') * 5)::INT
+                when 0 then address
+                    .replace('Street', 'St')
+                    .replace('Avenue', 'Ave')
+                    .replace('Road', 'Rd')
+                    .replace('Drive', 'Dr')
+                when 1 then upper(address)
+                when 2 then (split_part(address, ' ', 1)::INT + 1)::VARCHAR
+                    || substr(address, strpos(address, ' '))
+                when 3 then 'PO Box ' || (hash(key, 'box') % 9000 + 100)
+                else address || ' Suite ' || (hash(key, 'suite') % 400 + 100)
+            end
+            """
+        )
+        duck.execute(
+            """
+            create or replace temp macro noisy_university(name, key) as
+            case (u(key, 'university variant') * 8)::INT
+                when 0 then replace(name, 'Saint ', 'St. ')
+                when 1 then 'The ' || name
+                when 2 then name || ' Main Campus'
+                when 3 then typo(name, u(key, 'university typo'))
+                when 4 then swap(name, u(key, 'university swap'))
+                when 5 then regexp_replace(
+                    name, '^University of (.*)$', '\\1 University'
+                )
+                when 6 then upper(name)
+                else replace(name, ' and ', ' & ')
+            end
+            """
+        )
+
+    def write_geography(self, duck: DuckDB):
+        """Write the state, county, school district, and ZCTA polygons."""
+
+        states = ", ".join(
+            f"({k}, '{fips}', '{abbr}', '{name}', "
+            f"{WEST + (k % COLUMNS) * WIDTH}, "
+            f"{SOUTH + (k // COLUMNS) * HEIGHT})"
+            for k, (fips, abbr, name) in enumerate(STATES)
+        )
+
+        duck.execute(
+            "create or replace temp table states as "
+            "select *, xmax: xmin + "
+            f"{WIDTH}, ymax: ymin + {HEIGHT} "
+            f"from (values {states}) s(k, statefp, stusps, name, xmin, ymin)"
+        )
+
+        def cells(g: int) -> str:
+            # the grid cells of each state with their corners.
+            return (
+                "select\n"
+                "    s.*,\n"
+                "    c,\n"
+                f"    x0: xmin + (c % {g}) * {WIDTH / g},\n"
+                f"    y0: ymin + (c // {g}) * {HEIGHT / g},\n"
+                f"    x1: x0 + {WIDTH / g},\n"
+                f"    y1: y0 + {HEIGHT / g}\n"
+                f"from states s, range({g * g}) r(c)"
+            )
+
+        def center() -> str:
+            return (
+                "intptlat: ((y0 + y1) / 2)::VARCHAR, "
+                "intptlon: ((x0 + x1) / 2)::VARCHAR"
+            )
+
+        edition = GEOGRAPHY_EDITION
+        county = f"pick({array(NAMESAKES)}, k * 1000003 + c, 'county')"
+
+        duck.execute(
+            "create table geography.state as "
+            "select statefp, stusps, name, "
+            "intptlat: ((ymin + ymax) / 2)::VARCHAR, "
+            "intptlon: ((xmin + xmax) / 2)::VARCHAR, "
+            f"edition: {edition}, "
+            "geom: st_makeenvelope(xmin, ymin, xmax, ymax) "
+            "from states"
+        )
+
+        duck.execute(
+            "create table geography.county as "
+            "select statefp, "
+            "countyfp: lpad((2 * c + 1)::VARCHAR, 3, '0'), "
+            "geoid: statefp || countyfp, "
+            f"namelsad: {county} || ' County', "
+            f"name: {county}, "
+            f"{center()}, "
+            f"edition: {edition}, "
+            "geom: st_makeenvelope(x0, y0, x1, y1) "
+            f"from ({cells(self.grids['county'])}) "
+            "order by geoid"
+        )
+
+        duck.execute(
+            "create table geography.school_district as "
+            "select statefp, "
+            "unsdlea: lpad(c::VARCHAR, 5, '0'), "
+            "name: city_name(k, c) || ' School District', "
+            f"{center()}, "
+            f"edition: {edition}, "
+            "geom: st_makeenvelope(x0, y0, x1, y1) "
+            f"from ({cells(self.grids['school_district'])}) "
+            "order by statefp, unsdlea"
+        )
+
+        g = self.grids["zcta"]
+
+        duck.execute(
+            "create table geography.zcta as "
+            "select "
+            f"zcta5ce20: lpad((1001 + k * {g * g} + c)::VARCHAR, 5, '0'), "
+            "intptlat20: ((y0 + y1) / 2)::VARCHAR, "
+            "intptlon20: ((x0 + x1) / 2)::VARCHAR, "
+            f"edition: {edition}, "
+            "geom: st_makeenvelope(x0, y0, x1, y1) "
+            f"from ({cells(g)}) "
+            "order by zcta5ce20"
+        )
+
+    def locate(self, table: str) -> str:
+        """The state, coordinates, and geography of each row of a table.
+
+        The table needs a `key` and a `k`, the state's position.
+        """
+
+        gc = self.grids["county"]
+        gd = self.grids["school_district"]
+        gz = self.grids["zcta"]
+
+        return f"""
+            select
+                t.*,
+                s.statefp,
+                state_abbr: s.stusps,
+                state_name: s.name,
+                longitude: s.xmin + u(key, 'longitude') * {WIDTH},
+                latitude: s.ymin + u(key, 'latitude') * {HEIGHT},
+                county_cell: cell(longitude, latitude, s.xmin, s.ymin, {gc}),
+                district_cell: cell(longitude, latitude, s.xmin, s.ymin, {gd}),
+                zcta_cell: cell(longitude, latitude, s.xmin, s.ymin, {gz}),
+                county: s.statefp || lpad((2 * county_cell + 1)::VARCHAR, 3, '0'),
+                lea: lpad(district_cell::VARCHAR, 5, '0'),
+                zcta: lpad((1001 + k * {gz * gz} + zcta_cell)::VARCHAR, 5, '0'),
+                city: city_name(k, zcta_cell),
+                street: (100 + hash(key, 'number') % 9900)::VARCHAR
+                    || ' ' || pick({array(STREETS)}, key, 'street')
+                    || ' ' || pick({array(STREET_TYPES)}, key, 'street type')
+            from {table} t
+            inner join states s using (k)
+        """
+
+    def create_school_base(self, duck: DuckDB):
+        """
+        Create `school_base`, with every public, private, and unlisted school.
+
+        Unlisted schools only appear in the CEEB data.
+        """
+
+        kinds = " union all ".join(
+            f"select kind: '{kind}', i from range({self.counts[kind]}) r(i)"
+            for kind in ["public", "private", "unlisted"]
+        )
+
+        def by_level(values: Dict[str, str]) -> str:
+            return (
+                "case level "
+                + " ".join(f"when '{k}' then {v}" for k, v in values.items())
+                + " end"
+            )
+
+        types = by_level(
+            {
+                level: f"pick({array(words)}, key, 'type')"
+                for level, words in SCHOOL_TYPES.items()
+            }
+        )
+        low = by_level({level: f"'{g[0]}'" for level, g in GRADES.items()})
+        high = by_level({level: f"'{g[1]}'" for level, g in GRADES.items()})
+
+        duck.execute(
+            "create or replace temp table school_kinds as "
+            "select *, key: hash(kind, i), "
+            f"k: (hash(kind, i, 'state', {self.seed}) % {len(STATES)})::INT "
+            f"from ({kinds})"
+        )
+
+        public = PUBLIC_EDITIONS
+        private = PRIVATE_EDITIONS
+
+        duck.create_table_query(
+            "school_base",
+            f"""
+            with located as ({self.locate("school_kinds")}),
+            leveled as (
+                select
+                    *,
+                    level: case
+                        when u(key, 'level') < 0.55 then 'elementary'
+                        when u(key, 'level') < 0.75 then 'middle'
+                        when u(key, 'level') < 0.97 then 'high'
+                        else 'other'
+                    end,
+                    editions: case kind
+                        when 'private' then {private}
+                        else {public}
+                    end,
+                    -- a few schools open or close between editions.
+                    first_index: case when u(key, 'opened') < 0.05
+                        then 2 + (hash(key, 'first') % (len(editions) - 1))::INT
+                        else 1
+                    end,
+                    last_index: case when u(key, 'closed') < 0.03
+                        then greatest(
+                            first_index,
+                            1 + (hash(key, 'last') % (len(editions) - 1))::INT
+                        )
+                        else len(editions)
+                    end
+                from located
+            )
+            select
+                kind,
+                key,
+                k,
+                statefp,
+                state_abbr,
+                nces: case kind
+                    when 'public' then statefp || lea || lpad(i::VARCHAR, 5, '0')
+                    when 'private' then '0000A' || lpad(i::VARCHAR, 7, '0')
+                end,
+                name: (
+                    case when u(key, 'city named') < 0.2
+                        then city
+                        else pick({array(NAMESAKES)}, key, 'namesake')
+                    end
+                ) || ' ' || case kind
+                    when 'private' then pick({array(PRIVATE_TYPES)}, key, 'type')
+                    else {types}
+                end,
+                level,
+                low_grade: {low},
+                high_grade: {high},
+                street,
+                city,
+                zip: zcta,
+                county,
+                lea,
+                zcta,
+                latitude,
+                longitude,
+                first_edition: editions[first_index],
+                last_edition: editions[last_index],
+                open: last_index = len(editions)
+            from leveled
+            """,
+        )
+
+    def write_nces(self, duck: DuckDB):
+        """Write `public` and `private`, a row per edition, and `school`."""
+
+        def editions(kind: str, years: List[int]) -> str:
+            return f"""
+                select
+                    s.*,
+                    edition: e,
+                    zip4: case when u(key, 'zip4') < 0.3
+                        then zip || '-' || lpad((hash(key, 'plus4') % 10000)::VARCHAR, 4, '0')
+                        else zip
+                    end,
+                    -- a few schools were renamed after the first edition.
+                    edition_name: case
+                        when u(key, 'renamed') < 0.03 and e = first_edition
+                        then replace(name, 'School', 'Schools')
+                        else name
+                    end
+                from school_base s, unnest({years}) t(e)
+                where kind = '{kind}'
+                and e between first_edition and last_edition
+            """
+
+        other_columns = (
+            "street, city, state: state_abbr, zip: zip4, cnty: county, "
+            "lat: latitude, lon: longitude, "
+            "cd: statefp || lpad((hash(key, 'cd') % 12)::VARCHAR, 2, '0'), "
+            "cbsa: (10000 + hash(k, zcta, 'cbsa') % 90000)::VARCHAR, "
+            "sldl: lpad((hash(key, 'sldl') % 150)::VARCHAR, 3, '0'), "
+            "sldu: lpad((hash(key, 'sldu') % 50)::VARCHAR, 3, '0'), "
+        )
+
+        duck.create_table_query(
+            "nces.public",
+            "select ncessch: nces, name: edition_name, "
+            f"{other_columns} edition "
+            f"from ({editions('public', PUBLIC_EDITIONS)}) "
+            "order by edition, ncessch",
+        )
+
+        duck.create_table_query(
+            "nces.private",
+            f"select name: edition_name, {other_columns} "
+            "ppin: nces[5:], edition "
+            f"from ({editions('private', PRIVATE_EDITIONS)}) "
+            "order by edition, ppin",
+        )
+
+        # the search results cover most open schools, with their grades.
+        duck.create_table_query(
+            "nces.school",
+            "select nces, "
+            "state_school_id: case kind when 'public' then state_abbr || '-' "
+            "|| lpad((hash(key, 'state id') % 1000000)::VARCHAR, 6, '0') end, "
+            "nces_name: name, address: street, city, state_abbr, zip, "
+            "fips: county, low_grade, high_grade, public_private: kind "
+            "from school_base "
+            "where kind != 'unlisted' and open and u(key, 'neo') < 0.9 "
+            "order by nces",
+        )
+
+    def write_ceeb_schools(self, duck: DuckDB):
+        """Write `school` and `ncaa_school`.
+
+        Most open high schools have a CEEB code, some have two, and some
+        unlisted schools only have a CEEB code. The NCAA covers a few of
+        them, and a few high schools only it has.
+        """
+
+        duck.create_table_query(
+            "ceeb_base",
+            f"""
+            with picked as (
+                select *, copy: 0, in_ceeb: u(key, 'ceeb') < 0.9
+                from school_base
+                where level in ('high', 'other') and open
+            ),
+            copies as (
+                from picked where in_ceeb or u(key, 'ncaa only') < 0.3
+                union all
+                select * replace (1 as copy)
+                from picked
+                where in_ceeb and u(key, 'duplicate') < {self.duplicates}
+            )
+            select
+                *,
+                copy_key: hash(key, copy),
+                ceeb: lpad((k + 1)::VARCHAR, 2, '0') || lpad(
+                    row_number() over (
+                        partition by k order by hash(key, copy, 'code')
+                    )::VARCHAR,
+                    4,
+                    '0'
+                ),
+                changed: copy = 1 or u(copy_key, 'noise') < {self.noise}
+            from copies
+            """,
+        )
+
+        duck.create_table_query(
+            "ceeb.school",
+            f"""
+            select
+                ceeb,
+                -- the College Board's own match, for some schools.
+                nces: case when copy = 0 and u(key, 'matched') < 0.35
+                    then nces
+                end,
+                full_name: case when changed
+                    then noisy_school(name, copy_key)
+                    else name
+                end,
+                address: case when changed and u(copy_key, 'address') < 0.5
+                    then noisy_address(street, copy_key)
+                    else street
+                end,
+                city: case when changed and u(copy_key, 'city') < 0.3
+                    then upper(city)
+                    else city
+                end,
+                state_abbr,
+                zip: case when changed and u(copy_key, 'zip') < 0.2
+                    then null
+                    else zip
+                end,
+                latitude: case when u(copy_key, 'located') >= 0.15
+                    then latitude + (u(copy_key, 'lat') - 0.5) * 0.002
+                end,
+                longitude: case when u(copy_key, 'located') >= 0.15
+                    then longitude + (u(copy_key, 'lon') - 0.5) * 0.002
+                end
+            from ceeb_base
+            where in_ceeb
+            order by ceeb
+            """,
+        )
+
+        duck.create_table_query(
+            "ceeb.ncaa_school",
+            """
+            select
+                ncaa_code: (100000 + row_number() over (order by ceeb))::VARCHAR,
+                ceeb_code: ceeb,
+                name: upper(
+                    case when changed then noisy_school(name, copy_key) else name end
+                ),
+                address: upper(street),
+                city: upper(city),
+                state: state_abbr,
+                zip,
+                message: NULL::VARCHAR
+            from ceeb_base
+            where not in_ceeb or u(copy_key, 'ncaa') < 0.05
+            order by ceeb
+            """,
+        )
+
+    def create_institution_base(self, duck: DuckDB):
+        """Create `institution_base`, with every institution in any edition."""
+
+        duck.execute(
+            "create or replace temp table institution_kinds as "
+            "select i, key: hash('institution', i), "
+            f"k: (hash('institution', i, 'state', {self.seed}) "
+            f"% {len(STATES)})::INT "
+            f"from range({self.counts['institution']}) r(i)"
+        )
+
+        first, last = HD_EDITIONS[0], HD_EDITIONS[-1]
+        saints = array(["Mary", "Joseph", "John", "Paul", "Francis", "Thomas"])
+
+        duck.create_table_query(
+            "institution_base",
+            f"""
+            with located as ({self.locate("institution_kinds")}),
+            named as (
+                select
+                    *,
+                    sector: case when u(key, 'office') < 0.02
+                        then 0
+                        else 1 + (hash(key, 'sector') % 9)::INT
+                    end,
+                    multicampus: u(key, 'system') < 0.15,
+                    base_name: case (u(key, 'pattern') * 8)::INT
+                        when 0 then 'University of ' || state_name
+                        when 1 then city || ' Community College'
+                        when 2 then pick({array(NAMESAKES)}, key, 'n') || ' College'
+                        when 3 then state_name || ' State University'
+                        when 4 then 'Saint ' || pick({saints}, key, 's') || ' University'
+                        when 5 then city || ' Technical College'
+                        when 6 then pick({array(NAMESAKES)}, key, 'n')
+                            || ' Institute of Technology'
+                        else city || ' School of Nursing'
+                    end,
+                    name: case
+                        when sector = 0 then state_name || ' University System Office'
+                        when multicampus then base_name || '-' || city
+                        else base_name
+                    end,
+                    opened: case when u(key, 'opened') < 0.12
+                        then {first + 1} + (hash(key, 'open year') % {last - first})::INT
+                        else {first}
+                    end,
+                    closed: case when u(key, 'closed') < 0.08
+                        then least({last}, opened + 1 + (hash(key, 'close year') % 8)::INT)
+                        else {last}
+                    end,
+                    -- colleges that became universities.
+                    renamed: case when u(key, 'renamed') < 0.08
+                        and opened < closed and name like '%University%'
+                        then opened + 1 + (hash(key, 'rename year') % (closed - opened))::INT
+                    end
+                from located
+            )
+            select
+                *,
+                unitid: (100000 + i)::INT,
+                open: closed = {last}
+            from named
+            """,
+        )
+
+    def write_ipeds(self, duck: DuckDB):
+        """Write `hd` with an edition per year, then `hd_current` and
+        `hd_history` the same way `data_collection.hd` does."""
+
+        duck.create_table_query(
+            "ipeds.hd",
+            f"""
+            select
+                unitid,
+                opeid: case when u(key, 'opeid') < 0.05
+                    then '"-2"'
+                    else '"' || lpad((10000 + i)::VARCHAR, 6, '0') || '00"'
+                end,
+                edition: e::BIGINT,
+                f1systyp: case when multicampus then 1 else 2 end,
+                instnm: case when e < renamed
+                    then replace(name, 'University', 'College')
+                    else name
+                end,
+                addr: street,
+                city,
+                countynm: pick({array(NAMESAKES)}, hash(county), 'county') || ' County',
+                stabbr: state_abbr,
+                zip: case when u(key, 'zip4') < 0.5
+                    then zcta || '-' || lpad((hash(key, 'plus4') % 10000)::VARCHAR, 4, '0')
+                    else zcta
+                end,
+                fips: statefp::INT,
+                countycd: county::INT,
+                latitude: latitude::VARCHAR,
+                longitud: longitude::VARCHAR,
+                sector
+            from institution_base, range(opened, closed + 1) t(e)
+            order by edition, unitid
+            """,
+        )
+
+        duck.execute("use ipeds")
+        HD(HD_EDITIONS).update_current(duck, rebuild=True)
+        duck.execute("use memory")
+
+    def write_ceeb_universities(self, duck: DuckDB):
+        """Write `university`.
+
+        Most open institutions have a code, some have two, and the rest of
+        the codes are programs and offices, most of which the crosswalk
+        filters out.
+        """
+
+        organizations = array(
+            [
+                "Upward Bound Program",
+                "Educational Talent Search",
+                "Scholars Foundation",
+                "Navy Recruiting District",
+                "Rotary Club",
+                "Booster Association",
+            ]
+        )
+
+        duck.create_table_query(
+            "ceeb_university_base",
+            f"""
+            with picked as (
+                select unitid, key, name, state_name, copy: 0
+                from institution_base
+                where open and sector != 0 and u(key, 'ceeb') < 0.6
+            ),
+            copies as (
+                from picked
+                union all
+                select * replace (1 as copy)
+                from picked
+                where u(key, 'duplicate') < {self.duplicates}
+                union all
+                select
+                    unitid: NULL::INT,
+                    key: hash('organization', i),
+                    name: city_name(hash(i) % 1000, hash(i, 'cell') % 1000)
+                        || ' ' || pick({organizations}, i, 'organization'),
+                    state_name: pick(
+                        {array([s[2] for s in STATES])}, i, 'organization state'
+                    ),
+                    copy: 0
+                from range({round(self.counts["institution"] * 0.08)}) r(i)
+            )
+            select
+                *,
+                copy_key: hash(key, copy),
+                ceeb_code: lpad(
+                    row_number() over (order by hash(key, copy, 'code'))::VARCHAR,
+                    4,
+                    '0'
+                ),
+                changed: copy = 1 or u(copy_key, 'noise') < {self.noise}
+            from copies
+            """,
+        )
+
+        duck.create_table_query(
+            "ceeb.university",
+            "select ceeb_code, "
+            "name: case when copy = 1 and u(copy_key, 'apply') < 0.5 "
+            "then name || ' Apply' "
+            "when changed then noisy_university(name, copy_key) "
+            "else name end, "
+            "state: state_name "
+            "from ceeb_university_base "
+            "order by ceeb_code",
+        )
+
+    def write_nsc(self, duck: DuckDB):
+        """Write `nsc_to_ipeds`, where some institutions have two branches."""
+
+        duck.create_table_query(
+            "nsc_base",
+            f"""
+            with picked as (
+                select
+                    *,
+                    code: lpad(
+                        (1000 + row_number() over (order by unitid))::VARCHAR,
+                        6,
+                        '0'
+                    )
+                from institution_base
+                where open and sector != 0 and u(key, 'nsc') < 0.55
+            )
+            select *, branch: '00' from picked
+            union all
+            select *, branch: '01' from picked where u(key, 'branch') < 0.1
+            """,
+        )
+
+        duck.create_table_query(
+            "nsc.nsc_to_ipeds",
+            "select "
+            "nsc_college_and_branch_code: code || '-' || branch, "
+            "ipeds_unit_id: unitid::VARCHAR, "
+            "nsc_college_name: upper(case "
+            f"when u(hash(key, branch), 'noise') < {self.noise} "
+            "then noisy_university(name, hash(key, branch)) "
+            "else name end) "
+            "|| case branch when '01' then ' - ' || upper(city) else '' end "
+            "from nsc_base "
+            "order by nsc_college_and_branch_code",
+        )
+
+    def write_truth(self, duck: DuckDB):
+        """Write the true crosswalks, with the columns of the real ones."""
+
+        duck.create_table_query(
+            "schools.crosswalk",
+            """
+            select
+                b.ceeb,
+                s.nces,
+                n.state_school_id,
+                ceeb_name: coalesce(c.full_name, a.name),
+                nces_name: s.name,
+                s.low_grade,
+                s.high_grade,
+                address: coalesce(c.address, s.street),
+                city: coalesce(c.city, s.city),
+                s.state_abbr,
+                zip: coalesce(c.zip, s.zip),
+                fips: s.county,
+                latitude: coalesce(c.latitude, s.latitude),
+                longitude: coalesce(c.longitude, s.longitude),
+                public_private: s.kind,
+                congressional_district: p.cd,
+                cbsa: p.cbsa,
+                state_legislature_lower: p.sldl,
+                state_legislature_upper: p.sldu,
+                s.lea,
+                county_geoid: s.county,
+                s.zcta
+            from ceeb_base b
+            inner join school_base s using (key)
+            left join ceeb.school c on c.ceeb = b.ceeb
+            left join ceeb.ncaa_school a on a.ceeb_code = b.ceeb
+            left join nces.school n on n.nces = s.nces
+            left join (
+                (select nces: ncessch, edition, cd, cbsa, sldl, sldu from nces.public)
+                union all
+                (select nces: '0000' || ppin, edition, cd, cbsa, sldl, sldu
+                from nces.private)
+            ) p on p.nces = s.nces and p.edition = s.last_edition
+            where s.kind != 'unlisted'
+            order by b.ceeb
+            """,
+        )
+
+        duck.create_table_query(
+            "universities.university_crosswalk",
+            """
+            select
+                method: 'truth',
+                ceeb: c.ceeb_code,
+                ipeds: h.unitid::VARCHAR,
+                nsc: n.nsc_college_and_branch_code[1:6],
+                nsc_full: n.nsc_college_and_branch_code,
+                ceeb_name: c.name,
+                ipeds_name: h.instnm,
+                nsc_name: n.nsc_college_name,
+                h.edition,
+                multicampus: h.f1systyp = 1,
+                h.city,
+                county_name: h.countynm,
+                zip: h.zip[1:5],
+                state: coalesce(i.state_name, b.state_name),
+                state_abbr: h.stabbr,
+                state_fips: lpad(h.fips::VARCHAR, 2, '0'),
+                fips: lpad(h.countycd::VARCHAR, 5, '0'),
+                latitude: h.latitude::DOUBLE,
+                longitude: h.longitud::DOUBLE
+            from (
+                select * from institution_base where sector != 0
+            ) i
+            inner join ipeds.hd_current h using (unitid)
+            full join ceeb_university_base b using (unitid)
+            left join ceeb.university c using (ceeb_code)
+            left join nsc.nsc_to_ipeds n
+                on n.ipeds_unit_id = h.unitid::VARCHAR
+                and n.nsc_college_and_branch_code like '%-00'
+            order by ipeds, ceeb
+            """,
+        )
@@ -0,0 +1,280 @@
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+
+def percentile(values: List[float], share: float) -> float | None:
+    """The nearest-rank percentile of some values."""
+
+    if not values:
+        return None
+
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def duration(seconds: float) -> str:
+    """Seconds as `[<days>d ]HH:MM:SS`, since a sweep can take days."""
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    clock = f"{hours:02}:{minutes:02}:{seconds:02}"
+
+    return f"{days}d {clock}" if days else clock
+
+
+def is_timeout(error: BaseException) -> bool:
+    # Selenium's TimeoutException is matched by name, so it needn't be
+    # imported here.
+    return isinstance(error, TimeoutError) or (
+        type(error).__name__ == "TimeoutException"
+    )
+
+
+class Telemetry:
+    """
+    Structured progress events for a scraper.
+
+    Each item the scraper fetches is timed with `item`, and an event is
+    appended to an NDJSON log with its latency and status, along with the
+    running figures:
+
+    - items done out of the total, and the ETA,
+    - items per second,
+    - the error and timeout rates,
+    - the 50th, 90th and 99th percentile latencies.
+
+    The rates and percentiles are over the last `window` items, so throttling
+    shows up while a sweep runs. A `start` and `finish` event bracket the
+    run, and the finish event has the totals.
+
+    On a terminal, a progress bar is redrawn on stderr after each item.
+    Otherwise a progress line is printed every `every` seconds, so logs
+    stay short.
+    """
+
+    def __init__(
+        self,
+        scraper: str,
+        total: int | None = None,
+        log_file: str | None = None,
+        window: int = 100,
+        every: float = 30,
+    ):
+        """
+        Args:
+            scraper (str): The scraper's name, for the events.
+            total (int | None, optional): The items to fetch, for the ETA.
+                Defaults to None.
+            log_file (str | None, optional): The NDJSON log. Defaults to the
+                `CROSSWALK_TELEMETRY_LOG` environment variable, or
+                `extracted-zips/telemetry/<scraper>.ndjson`.
+            window (int, optional): The recent items the rates and
+                percentiles are over. Defaults to 100.
+            every (float, optional): Seconds between progress lines when
+                stderr isn't a terminal. Defaults to 30.
+        """
+
+        self.scraper = scraper
+        self.total = total
+        self.log_file = log_file or os.environ.get(
+            "CROSSWALK_TELEMETRY_LOG",
+            os.path.join("extracted-zips", "telemetry", scraper + ".ndjson"),
+        )
+        self.every = every
+        self.live = sys.stderr.isatty()
+
+        self.done = 0
+        self.skipped = 0
+        self.counts = {"ok": 0, "error": 0, "timeout": 0}
+        self.latencies: List[float] = []
+
+        # the start, latency, and status of the recent items.
+        self.recent: deque = deque(maxlen=window)
+
+        self.started = time.time()
+        self.printed = self.started
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+
+        self.log = open(self.log_file, "a")
+        self.started = time.time()
+        self.emit({"event": "start", "total": self.total})
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):  # type: ignore
+        elapsed = time.time() - self.started
+        fetched = self.done - self.skipped
+
+        self.emit(
+            {
+                "event": "finish",
+                "done": self.done,
+                "skipped": self.skipped,
+                "total": self.total,
+                **self.counts,
+                "seconds": elapsed,
+                "items_per_second": fetched / elapsed if elapsed else None,
+                "p50": percentile(self.latencies, 0.5),
+                "p90": percentile(self.latencies, 0.9),
+                "p99": percentile(self.latencies, 0.99),
+                "failed": exc_type is not None,
+            }
+        )
+
+        self.print_line()
+
+        if self.live:
+            sys.stderr.write("\n")
+
+        self.log.close()
+
+    def emit(self, event: Dict[str, Any]):
+        self.log.write(
+            json.dumps(
+                {
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "scraper": self.scraper,
+                    **event,
+                }
+            )
+            + "\n"
+        )
+        self.log.flush()
+
+    @contextlib.contextmanager
+    def item(self, key: str):
+        """Time fetching one item.
+
+        The block can add fields to the item's event through the dictionary
+        it gets, such as the number of results. An exception marks the item
+        as an error, or a timeout for a `TimeoutException`, and is raised
+        again. Calling `skip` in the block counts the item as skipped
+        instead, for when it only turns out to be fetched already once the
+        block has started.
+
+        Args:
+            key (str): The item, such as a CEEB code or a state.
+        """
+
+        fields: Dict[str, Any] = {}
+        start = time.time()
+        skipped = self.skipped
+
+        # an interrupted item isn't recorded.
+        try:
+            yield fields
+        except Exception as e:
+            fields["error"] = repr(e)
+            status = "timeout" if is_timeout(e) else "error"
+            self.record(key, start, time.time() - start, status, fields)
+            raise
+        else:
+            if self.skipped == skipped:
+                self.record(key, start, time.time() - start, "ok", fields)
+
+    def skip(self, count: int = 1):
+        """Count items that were already fetched as done."""
+
+        self.done += count
+        self.skipped += count
+
+    def record(
+        self,
+        key: str,
+        start: float,
+        latency: float,
+        status: str,
+        fields: Dict[str, Any],
+    ):
+        self.done += 1
+        self.counts[status] += 1
+        self.latencies.append(latency)
+        self.recent.append((start, latency, status))
+
+        self.emit(
+            {
+                "event": "item",
+                "key": key,
+                "status": status,
+                "latency": latency,
+                **fields,
+                **self.summary(),
+            }
+        )
+
+        if self.live or time.time() - self.printed >= self.every:
+            self.print_line()
+
+    def summary(self) -> Dict[str, Any]:
+        """The running figures, over the recent items."""
+
+        recent = list(self.recent)
+        latencies = [r[1] for r in recent]
+        statuses = [r[2] for r in recent]
+
+        rate = error_rate = timeout_rate = eta = None
+
+        if recent:
+            elapsed = time.time() - recent[0][0]
+            rate = len(recent) / elapsed if elapsed else None
+
+            error_rate = statuses.count("error") / len(recent)
+            timeout_rate = statuses.count("timeout") / len(recent)
+
+        if rate and self.total is not None:
+            eta = max(self.total - self.done, 0) / rate
+
+        return {
+            "done": self.done,
+            "total": self.total,
+            "items_per_second": rate,
+            "error_rate": error_rate,
+            "timeout_rate": timeout_rate,
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "eta_seconds": eta,
+        }
+
+    def print_line(self, width: int = 30):
+        s = self.summary()
+
+        if self.total:
+            filled = int(width * min(self.done / self.total, 1))
+            progress = (
+                f"[{'#' * filled}{' ' * (width - filled)}] "
+                f"{self.done:,}/{self.total:,} {self.done / self.total:4.0%}"
+            )
+        else:
+            progress = f"{self.done:,}"
+
+        line = f"{self.scraper} {progress}"
+
+        if s["items_per_second"]:
+            line += (
+                f"  {s['items_per_second']:.2f}/s"
+                f"  p50 {s['p50']:.1f}s p90 {s['p90']:.1f}s"
+                f"  errors {s['error_rate']:.0%}"
+                f" timeouts {s['timeout_rate']:.0%}"
+            )
+
+        if s["eta_seconds"] is not None:
+            line += f"  ETA {duration(s['eta_seconds'])}"
+
+        if self.live:
+            sys.stderr.write("\r\033[K" + line)
+            sys.stderr.flush()
+        else:
+            print(line, file=sys.stderr)
+
+        self.printed = time.time()
@@ -0,0 +1,289 @@
+import re
+import unicodedata
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# the same characters the FTS index is built to ignore.
+TOKEN_SEPARATOR = re.compile(r"[^a-z]+")
+
+
+def tokenize(text: str | None) -> List[str]:
+    """Split text into lowercase ASCII words.
+
+    This follows the DuckDB FTS tokenizer with the settings used in this
+    repo: accents are stripped, the text is lowercased, and anything that
+    isn't a letter separates words.
+
+    Args:
+        text (str | None): The text.
+
+    Returns:
+        List[str]: The words, which is empty for missing text.
+    """
+
+    if text is None:
+        return []
+
+    stripped = "".join(
+        c
+        for c in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(c)
+    )
+
+    return [t for t in TOKEN_SEPARATOR.split(stripped.lower()) if t]
+
+
+def top_k_per_row(matrix: csr_matrix, k: int) -> Tuple[np.ndarray, ...]:
+    """The `k` largest stored values in each row of a sparse matrix.
+
+    All rows are ranked at once with one sort, ties going to the lower
+    column.
+
+    Args:
+        matrix (csr_matrix): The scores.
+        k (int): Values per row.
+
+    Returns:
+        Tuple[np.ndarray, ...]: Flat arrays of the row, the column and the
+            value, ordered by row and then descending value.
+    """
+
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+
+    rows = np.repeat(
+        np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr)
+    )
+
+    order = np.lexsort((matrix.indices, -matrix.data, rows))
+
+    # once sorted by row, each entry's rank is its distance from the row start.
+    rank = np.arange(len(order)) - matrix.indptr[rows[order]]
+
+    keep = order[rank < k]
+
+    return rows[keep], matrix.indices[keep].astype(np.int64), matrix.data[keep]
+
+
+class TextIndex:
+    """
+    An in-memory BM25 or TF-IDF index over short texts such as names.
+
+    Documents and queries are tokenized into sparse term matrices, so a whole
+    batch of queries is scored with a single sparse matrix product instead of
+    one query at a time. Documents can be split into partitions, such as
+    states, and each query is only scored against its own partition. Term
+    statistics are taken over all documents, like the DuckDB FTS index.
+
+    Any table of names works, so the same index serves universities and
+    schools.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[Sequence[str | None]],
+        partitions: Sequence[str | None] | None = None,
+        weighting: str = "bm25",
+        k: float = 1.2,
+        b: float = 0.75,
+    ):
+        """
+        Args:
+            fields (Sequence[Sequence[str | None]]): One or more text columns
+                of equal length, such as the name and the city. Their words
+                are pooled into one document per row.
+            partitions (Sequence[str | None] | None, optional): The partition
+                of each document. A document without one is never found.
+                Defaults to None, a single partition.
+            weighting (str, optional): "bm25" or "tfidf". Defaults to "bm25".
+            k (float, optional): BM25 term frequency saturation. Defaults to
+                1.2.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+        """
+
+        if weighting not in ("bm25", "tfidf"):
+            raise ValueError("weighting must be 'bm25' or 'tfidf'.")
+
+        self.weighting = weighting
+        self.k = k
+        self.b = b
+
+        self.n = len(fields[0]) if fields else 0
+        self.vocabulary: Dict[str, int] = {}
+
+        doc_rows: List[int] = []
+        doc_terms: List[int] = []
+
+        for field in fields:
+            if len(field) != self.n:
+                raise ValueError("All fields must have the same length.")
+
+            for row, text in enumerate(field):
+                for token in tokenize(text):
+                    doc_rows.append(row)
+                    doc_terms.append(
+                        self.vocabulary.setdefault(token, len(self.vocabulary))
+                    )
+
+        # duplicate entries are summed, which gives the term frequency.
+        tf = csr_matrix(
+            (np.ones(len(doc_rows)), (doc_rows, doc_terms)),
+            shape=(self.n, len(self.vocabulary)),
+        )
+        tf.sum_duplicates()
+
+        length = np.asarray(tf.sum(axis=1)).ravel()
+        df = np.bincount(tf.indices, minlength=len(self.vocabulary))
+
+        self.avgdl = float(length.mean()) if self.n else 0.0
+
+        if weighting == "bm25":
+            # DuckDB's `log` is base 10, so this keeps the FTS scores.
+            self.idf = np.log10((self.n - df + 0.5) / (df + 0.5) + 1)
+
+            norm = np.repeat(
+                k * (1 - b + b * length / (self.avgdl or 1)), np.diff(tf.indptr)
+            )
+
+            tf.data = tf.data * (k + 1) / (tf.data + norm)
+        else:
+            self.idf = np.log((1 + self.n) / (1 + df)) + 1
+
+            tf.data = tf.data * self.idf[tf.indices]
+            tf = self.normalize(tf)
+
+        self.weights = tf
+
+        self.partition_rows: Dict[str, np.ndarray] = {}
+
+        if partitions is None:
+            self.partition_rows[""] = np.arange(self.n)
+            return
+
+        partitions = list(partitions)
+
+        if len(partitions) != self.n:
+            raise ValueError("There must be one partition per document.")
+
+        # a document without a partition counts toward the term statistics,
+        # but no query searches it.
+        present = np.flatnonzero(np.not_equal(partitions, None))
+
+        labels, codes = np.unique(
+            np.asarray([partitions[i] for i in present], dtype=str),
+            return_inverse=True,
+        )
+
+        for code, label in enumerate(labels):
+            self.partition_rows[str(label)] = present[codes == code]
+
+    @staticmethod
+    def normalize(matrix: csr_matrix) -> csr_matrix:
+        norm = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norm[norm == 0] = 1
+
+        matrix.data = matrix.data / np.repeat(norm, np.diff(matrix.indptr))
+
+        return matrix
+
+    def query_matrix(self, queries: Sequence[str | None]) -> csr_matrix:
+        """Tokenize queries into a sparse matrix over the vocabulary.
+
+        BM25 counts each distinct query word once, as `match_bm25` does. Words
+        that aren't in any document are dropped.
+
+        Args:
+            queries (Sequence[str | None]): The query strings.
+
+        Returns:
+            csr_matrix: One row per query.
+        """
+
+        rows: List[int] = []
+        terms: List[int] = []
+
+        for row, text in enumerate(queries):
+            for token in set(tokenize(text)):
+                term = self.vocabulary.get(token)
+
+                if term is not None:
+                    rows.append(row)
+                    terms.append(term)
+
+        matrix = csr_matrix(
+            (np.ones(len(rows)), (rows, terms)),
+            shape=(len(queries), len(self.vocabulary)),
+        )
+        matrix.sum_duplicates()
+
+        if self.weighting == "bm25":
+            matrix.data = self.idf[matrix.indices]
+        else:
+            matrix.data = matrix.data * self.idf[matrix.indices]
+            matrix = self.normalize(matrix)
+
+        return matrix
+
+    def search(
+        self,
+        queries: Sequence[str | None],
+        partitions: Sequence[str | None] | None = None,
+        k: int = 10,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find the `k` best scoring documents for each query.
+
+        Args:
+            queries (Sequence[str | None]): The query strings.
+            partitions (Sequence[str | None] | None, optional): The partition
+                to search for each query. A query without one finds nothing.
+                Defaults to None, a single partition.
+            k (int, optional): Documents per query. Defaults to 10.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Flat arrays of the
+                query position, the document position, and the score for
+                every document that shares a word with its query, ordered by
+                query and then descending score.
+        """
+
+        if partitions is None:
+            labels = np.full(len(queries), "", dtype=object)
+        else:
+            labels = np.asarray(list(partitions), dtype=object)
+
+        if len(labels) != len(queries):
+            raise ValueError("There must be one partition per query.")
+
+        query_matrix = self.query_matrix(queries)
+
+        found_query: List[np.ndarray] = []
+        found_doc: List[np.ndarray] = []
+        found_score: List[np.ndarray] = []
+
+        for label, docs in self.partition_rows.items():
+            query_rows = np.flatnonzero(labels == label)
+
+            if len(query_rows) == 0:
+                continue
+
+            scores = query_matrix[query_rows] @ self.weights[docs].T
+
+            row, col, score = top_k_per_row(scores, k)
+
+            found_query.append(query_rows[row])
+            found_doc.append(docs[col])
+            found_score.append(score)
+
+        if not found_query:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float64)
+
+        query = np.concatenate(found_query)
+        doc = np.concatenate(found_doc)
+        score = np.concatenate(found_score)
+
+        order = np.lexsort((doc, -score, query))
+
+        return query[order], doc[order], score[order]